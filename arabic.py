@@ -0,0 +1,183 @@
+"""
+Arabic text helpers shared by search indexing and querying, and by the PDF
+reports.
+
+Both sides of a search go through the same normalization, so a query typed
+without diacritics or with a bare alef still finds the stored text.
+
+PDF text is drawn glyph by glyph, left to right, with no shaping engine:
+shape_arabic() picks each letter's contextual form (isolated, final, initial
+or medial, plus the lam-alef ligatures) and visual_word() / visual_line() put
+words and lines in display order.
+"""
+import re
+
+# Tashkeel (fathatan .. sukun), superscript alef and tatweel
+_DIACRITICS = re.compile('[ً-ْٰـ]')
+
+_LETTER_VARIANTS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي',
+    'ة': 'ه',
+})
+
+_WORD = re.compile(r'\w+')
+
+_ARTICLE = 'ال'
+
+
+def normalize_arabic(text):
+    """Strip diacritics and fold alef, ya and ta marbuta variants; lowercases Latin text"""
+    if not text:
+        return ''
+    return _DIACRITICS.sub('', text).translate(_LETTER_VARIANTS).lower()
+
+
+def strip_article(word):
+    """'المدرسه' -> 'مدرسه'; short words such as 'الي' are left alone"""
+    if word.startswith(_ARTICLE) and len(word) > len(_ARTICLE) + 2:
+        return word[len(_ARTICLE):]
+    return word
+
+
+def search_tokens(text):
+    """Normalized words of a query, without the definite article"""
+    return [strip_article(word) for word in _WORD.findall(normalize_arabic(text))]
+
+
+def search_document(*parts):
+    """Normalized text to index; words carrying the article are also indexed without it"""
+    words = _WORD.findall(normalize_arabic(' '.join(part for part in parts if part)))
+    return ' '.join(words + [strip_article(word) for word in words if strip_article(word) != word])
+
+
+# Presentation forms: (isolated, final, initial, medial); letters with two forms only join to the previous letter
+_FORMS = {
+    'ء': ('\ufe80',),
+    'آ': ('\ufe81', '\ufe82'),
+    'أ': ('\ufe83', '\ufe84'),
+    'ؤ': ('\ufe85', '\ufe86'),
+    'إ': ('\ufe87', '\ufe88'),
+    'ئ': ('\ufe89', '\ufe8a', '\ufe8b', '\ufe8c'),
+    'ا': ('\ufe8d', '\ufe8e'),
+    'ب': ('\ufe8f', '\ufe90', '\ufe91', '\ufe92'),
+    'ة': ('\ufe93', '\ufe94'),
+    'ت': ('\ufe95', '\ufe96', '\ufe97', '\ufe98'),
+    'ث': ('\ufe99', '\ufe9a', '\ufe9b', '\ufe9c'),
+    'ج': ('\ufe9d', '\ufe9e', '\ufe9f', '\ufea0'),
+    'ح': ('\ufea1', '\ufea2', '\ufea3', '\ufea4'),
+    'خ': ('\ufea5', '\ufea6', '\ufea7', '\ufea8'),
+    'د': ('\ufea9', '\ufeaa'),
+    'ذ': ('\ufeab', '\ufeac'),
+    'ر': ('\ufead', '\ufeae'),
+    'ز': ('\ufeaf', '\ufeb0'),
+    'س': ('\ufeb1', '\ufeb2', '\ufeb3', '\ufeb4'),
+    'ش': ('\ufeb5', '\ufeb6', '\ufeb7', '\ufeb8'),
+    'ص': ('\ufeb9', '\ufeba', '\ufebb', '\ufebc'),
+    'ض': ('\ufebd', '\ufebe', '\ufebf', '\ufec0'),
+    'ط': ('\ufec1', '\ufec2', '\ufec3', '\ufec4'),
+    'ظ': ('\ufec5', '\ufec6', '\ufec7', '\ufec8'),
+    'ع': ('\ufec9', '\ufeca', '\ufecb', '\ufecc'),
+    'غ': ('\ufecd', '\ufece', '\ufecf', '\ufed0'),
+    'ف': ('\ufed1', '\ufed2', '\ufed3', '\ufed4'),
+    'ق': ('\ufed5', '\ufed6', '\ufed7', '\ufed8'),
+    'ك': ('\ufed9', '\ufeda', '\ufedb', '\ufedc'),
+    'ل': ('\ufedd', '\ufede', '\ufedf', '\ufee0'),
+    'م': ('\ufee1', '\ufee2', '\ufee3', '\ufee4'),
+    'ن': ('\ufee5', '\ufee6', '\ufee7', '\ufee8'),
+    'ه': ('\ufee9', '\ufeea', '\ufeeb', '\ufeec'),
+    'و': ('\ufeed', '\ufeee'),
+    'ى': ('\ufeef', '\ufef0'),
+    'ي': ('\ufef1', '\ufef2', '\ufef3', '\ufef4'),
+}
+# Lam followed by an alef: (isolated, final)
+_LAM_ALEF = {
+    'آ': ('\ufef5', '\ufef6'),
+    'أ': ('\ufef7', '\ufef8'),
+    'إ': ('\ufef9', '\ufefa'),
+    'ا': ('\ufefb', '\ufefc'),
+}
+_TATWEEL = 'ـ'
+_RTL_CHAR = re.compile('[\u0590-\u08ff\ufb1d-\ufdff\ufe70-\ufefc]')
+_LTR_RUN = re.compile('[A-Za-z0-9\u0660-\u0669.,:/%+-]*[A-Za-z0-9\u0660-\u0669]')
+_MIRRORED = str.maketrans('()[]{}<>«»', ')(][}{><»«')
+
+
+def _joins_forward(char):
+    return char == _TATWEEL or len(_FORMS.get(char, ())) == 4
+
+
+def shape_arabic(text):
+    """Replace Arabic letters with their contextual presentation forms; the text stays in logical order"""
+    chars = list(text)
+    shaped = []
+    previous = None  # Last letter, ignoring diacritics
+    i = 0
+    while i < len(chars):
+        char = chars[i]
+        if _DIACRITICS.match(char) and char != _TATWEEL:
+            shaped.append(char)
+            i += 1
+            continue
+        forms = _FORMS.get(char)
+        if forms is None:
+            shaped.append(char)
+            previous = char
+            i += 1
+            continue
+        joins_previous = previous is not None and _joins_forward(previous) and len(forms) > 1
+        if char == 'ل' and i + 1 < len(chars) and chars[i + 1] in _LAM_ALEF:
+            shaped.append(_LAM_ALEF[chars[i + 1]][joins_previous])
+            previous = chars[i + 1]
+            i += 2
+            continue
+        following = next((c for c in chars[i + 1:] if not (_DIACRITICS.match(c) and c != _TATWEEL)), None)
+        joins_next = len(forms) == 4 and following is not None and (following == _TATWEEL or following in _FORMS)
+        if joins_previous and joins_next:
+            shaped.append(forms[3])
+        elif joins_previous:
+            shaped.append(forms[1])
+        elif joins_next:
+            shaped.append(forms[2])
+        else:
+            shaped.append(forms[0])
+        previous = char
+        i += 1
+    return ''.join(shaped)
+
+
+def is_rtl(text):
+    return bool(_RTL_CHAR.search(text))
+
+
+def visual_word(word):
+    """A shaped word in drawing order: Arabic reversed, with diacritics after their letter and
+    numbers or Latin runs inside it left as they are"""
+    if not is_rtl(word):
+        return word
+    clusters = []
+    position = 0
+    while position < len(word):
+        run = _LTR_RUN.match(word, position)
+        if run and run.end() > position:
+            clusters.append(run.group())
+            position = run.end()
+        elif clusters and _DIACRITICS.match(word[position]) and word[position] != _TATWEEL:
+            clusters[-1] += word[position]
+            position += 1
+        else:
+            clusters.append(word[position].translate(_MIRRORED))
+            position += 1
+    return ''.join(reversed(clusters))
+
+
+def visual_line(words):
+    """Words of one right-to-left line in drawing order: runs of left-to-right words keep their order"""
+    runs = []
+    for word in words:
+        ltr = not is_rtl(word) and bool(_LTR_RUN.search(word))
+        if ltr and runs and runs[-1][0]:
+            runs[-1][1].append(word)
+        else:
+            runs.append((ltr, [word]))
+    return [word for ltr, run in reversed(runs) for word in run]
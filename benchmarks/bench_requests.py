@@ -0,0 +1,194 @@
+"""
+Latency percentiles and queries per request for the main pages.
+
+    python benchmarks/bench_requests.py                      # small generated district
+    python benchmarks/bench_requests.py --size district      # 30k teachers, 1M visits
+    DATABASE_URL=postgresql://... python benchmarks/bench_requests.py --no-generate
+    python benchmarks/bench_requests.py --compare benchmarks/results/<earlier>.json
+
+Requests go through the Flask test client, logged in as an admin, against the
+database in DATABASE_URL (by default a SQLite file under instance/, which is
+filled with district_data.py unless it already has visits). Each endpoint is
+called --requests times after a few warm-up calls; visit pages pick random
+visits, so the PDF endpoint mostly measures rendering rather than the cache.
+
+Results are written as JSON to benchmarks/results/ with the dataset size and
+the git commit, so two runs can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+DEFAULT_DATABASE = os.path.join(ROOT, 'instance', 'bench_{size}.db')
+
+SIZES = {
+    'small': {'schools': 20, 'teachers': 500, 'supervisors': 30, 'visits': 20000},
+    'district': {'schools': 300, 'teachers': 30000, 'supervisors': 600, 'visits': 1000000},
+}
+WARMUP = 3
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    return samples[min(len(samples) - 1, max(0, round(fraction * len(samples)) - 1))]
+
+
+def summarize(latencies, queries, statuses):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p90_ms': round(percentile(latencies, 0.90), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'max_ms': round(latencies[-1], 2),
+        'mean_ms': round(statistics.fmean(latencies), 2),
+        'queries_per_request': round(statistics.fmean(queries), 2),
+        'statuses': {str(status): statuses.count(status) for status in sorted(set(statuses))},
+    }
+
+
+class QueryCounter:
+    """Counts the statements sent to every engine of the app"""
+
+    def __init__(self, engines):
+        from sqlalchemy import event
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def measure(name, send, counter, requests):
+    for _ in range(WARMUP):
+        send()
+    latencies, queries, statuses = [], [], []
+    for _ in range(requests):
+        before = counter.count
+        started = time.perf_counter()
+        status = send()
+        latencies.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count - before)
+        statuses.append(status)
+    result = summarize(latencies, queries, statuses)
+    print(f"{name:>16}: p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+          f"p99 {result['p99_ms']:8.2f} ms  {result['queries_per_request']:6.2f} queries/request")
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    from app import create_app
+    from district_data import generate_district, ensure_admin, print_progress
+    from models import db, Visit, Teacher
+
+    app = create_app({'PDF_CACHE_DIR': tempfile.mkdtemp(prefix='bench_pdf_')})
+    with app.app_context():
+        db.create_all()
+        ensure_admin()
+        if not args.no_generate and not db.session.query(Visit.id).first():
+            generate_district(**SIZES[args.size], progress=print_progress)
+        dataset = {
+            'visits': db.session.query(db.func.count(Visit.id)).scalar(),
+            'teachers': db.session.query(db.func.count(Teacher.id)).scalar(),
+        }
+        max_visit_id = db.session.query(db.func.max(Visit.id)).scalar()
+        counter = QueryCounter(db.engines.values())
+    if not max_visit_id:
+        sys.exit('The database has no visits; run without --no-generate')
+
+    rng = random.Random(args.seed)
+    client = app.test_client()
+    assert client.post('/login', data={'username': 'bench', 'password': 'bench'}).status_code == 302
+    login_client = app.test_client()
+
+    def login():
+        # A full login, password hash included; then drop the session for the next one
+        status = login_client.post('/login', data={'username': 'bench', 'password': 'bench'}).status_code
+        login_client.get('/logout')
+        return status
+
+    endpoints = {
+        '/login': login,
+        '/dashboard': lambda: client.get('/dashboard').status_code,
+        '/visits': lambda: client.get('/visits').status_code,
+        '/visit/<id>': lambda: client.get(f'/visit/{rng.randint(1, max_visit_id)}').status_code,
+        '/visit/<id>/pdf': lambda: client.get(f'/visit/{rng.randint(1, max_visit_id)}/pdf').status_code,
+    }
+    selected = args.endpoint or list(endpoints)
+
+    print(f"{dataset['visits']} visits, {dataset['teachers']} teachers; {args.requests} requests per endpoint")
+    results = {name: measure(name, endpoints[name], counter, args.requests) for name in selected}
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+        'dataset': dataset,
+        'requests_per_endpoint': args.requests,
+        'endpoints': results,
+    }
+
+
+def compare(baseline, current):
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('created_at')}):")
+    for name, result in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for key in ('p50_ms', 'p95_ms', 'queries_per_request'):
+            if before[key]:
+                changes.append(f'{key} {(result[key] - before[key]) / before[key] * 100:+.0f}%')
+        print(f"{name:>16}: {', '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--size', choices=SIZES, default='small', help='district to generate into an empty database')
+    parser.add_argument('--no-generate', action='store_true', help='benchmark the existing data as is')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per endpoint')
+    parser.add_argument('--endpoint', action='append', help='only this endpoint (repeatable), e.g. /visits')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='result file (defaults to benchmarks/results/<timestamp>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare with')
+    args = parser.parse_args()
+
+    if 'DATABASE_URL' not in os.environ:
+        os.makedirs(os.path.dirname(DEFAULT_DATABASE), exist_ok=True)
+        os.environ['DATABASE_URL'] = 'sqlite:///' + DEFAULT_DATABASE.format(size=args.size)
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    result = run(args)
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f'Results written to {output}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Queries per authenticated request with and without the user cache.
+
+    python benchmarks/bench_user_loading.py
+
+Logs in through the test client against an in-memory database, then counts
+the SQL statements issued by repeated requests to a cheap authenticated JSON
+endpoint, first with USER_CACHE_TTL=0 (every request loads the user) and then
+with the cache enabled.
+"""
+import os
+import sys
+import time
+
+os.environ['DATABASE_URL'] = 'sqlite://'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from app import create_app
+from models import db, User
+from views import user_cache
+
+REQUESTS = 500
+
+
+def measure(client, engine, ttl):
+    user_cache.ttl = ttl
+    user_cache.clear()
+    
+    statements = []
+    def count(*args):
+        statements.append(1)
+    
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        started = time.perf_counter()
+        for _ in range(REQUESTS):
+            assert client.get('/api/analytics?dimension=school').status_code == 200
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return len(statements) / REQUESTS, elapsed / REQUESTS * 1000
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', name='Bench', role='admin')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+    
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    
+    print(f'{REQUESTS} requests to /api/analytics')
+    with app.app_context():
+        engine = db.engine
+    for label, ttl in (('without user cache', 0), ('with user cache', 30)):
+        queries, latency = measure(client, engine, ttl)
+        print(f'{label:>20}: {queries:.2f} queries/request, {latency:.2f} ms/request')
+
+
+if __name__ == '__main__':
+    main()
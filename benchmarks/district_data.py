@@ -0,0 +1,220 @@
+"""
+Synthetic district data for load tests and benchmarks.
+
+    DATABASE_URL=sqlite:////tmp/district.db python benchmarks/district_data.py \
+        --schools 300 --teachers 30000 --supervisors 600 --visits 1000000
+
+Fills the database that DATABASE_URL points at (creating the tables if
+needed) with schools, teachers, supervisors and visits. Visits carry all 20
+criterion scores as JSON, the normalized visit_score rows, and Arabic lesson
+titles and feedback. The score rollup, the search index and the teacher
+summaries are rebuilt at the end, as after a real import. The same --seed
+always produces the same data.
+
+Rows go in with bulk Core inserts, a few thousand per transaction, so a
+million visits take minutes rather than hours. Ids are assigned here and
+continue after any existing ones.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import (db, User, Teacher, Supervisor, Visit, VisitScore, VISIT_STATUSES, SCORE_SECTIONS,
+                    visit_score_rows, rebuild_score_rollups)
+from search import rebuild_search_index
+from teacher_history import rebuild_teacher_summaries
+
+BATCH_SIZE = 5000
+VISIT_BATCH_SIZE = 1000
+
+FIRST_NAMES = ('أحمد', 'محمد', 'عبدالله', 'خالد', 'سعد', 'فهد', 'عمر', 'يوسف', 'إبراهيم', 'علي', 'حسن',
+               'سلمان', 'ناصر', 'ماجد', 'فيصل', 'طارق', 'فاطمة', 'عائشة', 'مريم', 'نورة', 'سارة', 'هند',
+               'ريم', 'لطيفة', 'منى', 'أسماء', 'خديجة', 'هيفاء', 'جواهر', 'ليلى')
+FAMILY_NAMES = ('العتيبي', 'القحطاني', 'الغامدي', 'الزهراني', 'الشهري', 'الحربي', 'المطيري', 'الدوسري',
+                'السبيعي', 'الشمري', 'العنزي', 'الرشيدي', 'البلوي', 'الجهني', 'السلمي', 'الأنصاري',
+                'المالكي', 'العمري', 'السعدي', 'الخالدي')
+SCHOOL_NAMES = ('منارات', 'الرواد', 'الفيصلية', 'الأندلس', 'النهضة', 'الملك عبدالعزيز', 'ابن خلدون',
+                'الفارابي', 'الخوارزمي', 'طيبة', 'قباء', 'العقيق', 'الحرمين', 'الأمل', 'الإبداع')
+SCHOOL_STAGES = ('الابتدائية', 'المتوسطة', 'الثانوية')
+CITIES = ('المدينة المنورة', 'الرياض', 'جدة', 'مكة المكرمة', 'الدمام', 'تبوك', 'أبها', 'بريدة')
+LESSONS = {
+    'الرياضيات': ('الجمع والطرح', 'الكسور العشرية', 'المعادلات الخطية', 'الهندسة المستوية', 'الاحتمالات'),
+    'اللغة العربية': ('الجملة الاسمية', 'الفعل المضارع', 'قراءة النصوص', 'الإملاء', 'التعبير الكتابي'),
+    'العلوم': ('الخلية', 'الطاقة وتحولاتها', 'المادة وخصائصها', 'النظام الشمسي', 'التكاثر في النبات'),
+    'الدراسات الإسلامية': ('التوحيد', 'الفقه', 'الحديث الشريف', 'التفسير', 'السيرة النبوية'),
+    'اللغة الإنجليزية': ('Present Simple', 'Reading Skills', 'Vocabulary', 'Past Tense', 'Writing'),
+    'الدراسات الاجتماعية': ('خريطة المملكة', 'الدولة السعودية الأولى', 'المناخ', 'الموارد الطبيعية'),
+}
+GRADES = ('الأول', 'الثاني', 'الثالث', 'الرابع', 'الخامس', 'السادس')
+FEEDBACK = ('تفاعل الطلاب مع الدرس بشكل ممتاز', 'إدارة الصف متميزة وتوزيع الوقت مناسب',
+            'يحتاج المعلم إلى تنويع استراتيجيات التدريس', 'استخدام جيد للوسائل التعليمية',
+            'الأسئلة الصفية تراعي الفروق الفردية', 'ينصح بتفعيل التعلم التعاوني',
+            'التقويم الختامي مرتبط بأهداف الدرس', 'التمهيد للدرس مشوق ومرتبط بالواقع')
+SUGGESTIONS = ('حضور دورة في التعلم النشط', 'تبادل الزيارات مع الزملاء', 'توظيف التقنية في العرض',
+               'زيادة أنشطة التقويم التكويني', 'تخصيص وقت أطول للتطبيق')
+SCORE_WEIGHTS = (1, 3, 10, 30, 25)  # Ratings 0-4: most visits score 3 or 4
+SCORE_COUNT = sum(SCORE_SECTIONS.values())
+
+
+def person_name(rng):
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES)} {rng.choice(FAMILY_NAMES)}'
+
+
+def school_names(count, rng):
+    names = []
+    for i in range(count):
+        stage = SCHOOL_STAGES[i % len(SCHOOL_STAGES)]
+        names.append(f'{rng.choice(SCHOOL_NAMES)} {stage} {i + 1} - {rng.choice(CITIES)}')
+    return names
+
+
+def _next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def _insert_batches(model, rows, progress=None, label=None):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(model.__table__.insert(), rows[start:start + BATCH_SIZE])
+        db.session.commit()
+        if progress:
+            progress(label, min(start + BATCH_SIZE, len(rows)), len(rows))
+
+
+def _sync_sequences(*models):
+    # Ids were assigned explicitly; move PostgreSQL's serial sequences past them
+    if db.session.get_bind().dialect.name == 'postgresql':
+        for model in models:
+            table = model.__tablename__
+            db.session.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), (SELECT MAX(id) FROM \"{table}\"))"
+            ))
+        db.session.commit()
+
+
+def generate_district(schools=300, teachers=30000, supervisors=600, visits=1000000, seed=1,
+                      progress=None, rebuild=True):
+    """Insert a synthetic district; returns the row counts created"""
+    rng = random.Random(seed)
+    school_list = school_names(schools, rng)
+    subjects = tuple(LESSONS)
+
+    supervisor_start = _next_id(Supervisor)
+    supervisor_rows = [{
+        'id': supervisor_start + i,
+        'name': person_name(rng),
+        'email': f'supervisor{supervisor_start + i}@district.edu.sa',
+        'specialty': subjects[i % len(subjects)],
+        'phone': f'05{rng.randrange(10 ** 8):08d}'
+    } for i in range(supervisors)]
+    _insert_batches(Supervisor, supervisor_rows, progress, 'supervisors')
+    supervisors_by_subject = {}
+    for row in supervisor_rows:
+        supervisors_by_subject.setdefault(row['specialty'], []).append(row['id'])
+
+    teacher_start = _next_id(Teacher)
+    teacher_rows = [{
+        'id': teacher_start + i,
+        'name': person_name(rng),
+        'email': f'teacher{teacher_start + i}@district.edu.sa',
+        'subject': rng.choice(subjects),
+        'school': rng.choice(school_list),
+        'phone': f'05{rng.randrange(10 ** 8):08d}',
+        'grade': rng.choice(GRADES)
+    } for i in range(teachers)]
+    _insert_batches(Teacher, teacher_rows, progress, 'teachers')
+
+    # Three school years of visits, oldest first, as they would have been entered
+    first_day = datetime(datetime.now().year - 3, 9, 1)
+    span_minutes = int((datetime.now() - first_day).total_seconds() // 60)
+    minutes = sorted(rng.randrange(span_minutes) for _ in range(visits))
+    visit_start = _next_id(Visit)
+
+    # Visits and their 20 score rows go in together, VISIT_BATCH_SIZE visits per transaction
+    for batch_start in range(0, visits, VISIT_BATCH_SIZE):
+        visit_rows = []
+        score_rows = []
+        for i in range(batch_start, min(batch_start + VISIT_BATCH_SIZE, visits)):
+            teacher = rng.choice(teacher_rows)
+            subject_supervisors = supervisors_by_subject.get(teacher['subject']) or [supervisor_start]
+            visit_date = first_day + timedelta(minutes=minutes[i])
+            ratings = iter(rng.choices(range(5), SCORE_WEIGHTS, k=SCORE_COUNT))
+            section_scores = {
+                section: {f'{section}_{n}': next(ratings) for n in range(1, count + 1)}
+                for section, count in SCORE_SECTIONS.items()
+            }
+            score_rows.extend(visit_score_rows(visit_start + i, section_scores))
+            visit_rows.append({
+                'id': visit_start + i,
+                'visit_date': visit_date,
+                'school_name': teacher['school'],
+                'teacher_id': teacher['id'],
+                'supervisor_id': rng.choice(subject_supervisors),
+                'subject': teacher['subject'],
+                'grade': teacher['grade'],
+                'lesson_title': rng.choice(LESSONS[teacher['subject']]),
+                'management_scores': json.dumps(section_scores['management']),
+                'teaching_scores': json.dumps(section_scores['teaching']),
+                'feedback_scores': json.dumps(section_scores['feedback']),
+                'feedback_1': rng.choice(FEEDBACK),
+                'feedback_2': rng.choice(FEEDBACK) if rng.random() < 0.6 else None,
+                'suggestions': rng.choice(SUGGESTIONS) if rng.random() < 0.7 else None,
+                'follow_up_date': visit_date + timedelta(days=rng.randrange(7, 60)) if rng.random() < 0.3 else None,
+                'created_at': visit_date,
+                'status': rng.choices(VISIT_STATUSES, (90, 8, 2))[0],
+                'supervisor_signature': 'توقيع'
+            })
+        # Table inserts: one executemany each, where ORM bulk inserts split on NULL patterns
+        db.session.execute(Visit.__table__.insert(), visit_rows)
+        db.session.execute(VisitScore.__table__.insert(), score_rows)
+        db.session.commit()
+        if progress:
+            progress('visits', batch_start + len(visit_rows), visits)
+    _sync_sequences(Supervisor, Teacher, Visit)
+
+    if rebuild:
+        rebuild_score_rollups(progress=progress and (lambda done, total: progress('rollups', done, total)))
+        rebuild_search_index(progress=progress and (lambda done, total: progress('search index', done, total)))
+        rebuild_teacher_summaries(progress=progress and (lambda done, total: progress('teacher summaries', done, total)))
+    return {'schools': schools, 'teachers': teachers, 'supervisors': supervisors, 'visits': visits}
+
+
+def ensure_admin(username='bench', password='bench'):
+    """The login the benchmarks use; created if missing"""
+    if not User.query.filter_by(username=username).first():
+        user = User(username=username, email=f'{username}@district.edu.sa', name='Benchmark', role='admin')
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+
+
+def print_progress(label, done, total):
+    print(f'\r{label}: {done}/{total}', end='' if done < total else '\n', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--schools', type=int, default=300)
+    parser.add_argument('--teachers', type=int, default=30000)
+    parser.add_argument('--supervisors', type=int, default=600)
+    parser.add_argument('--visits', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        ensure_admin()
+        started = time.perf_counter()
+        generate_district(args.schools, args.teachers, args.supervisors, args.visits, args.seed, print_progress)
+        print(f'Done in {time.perf_counter() - started:.0f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Bulk export of visit report PDFs as a streamed ZIP archive.
+
+PDFs are rendered in a ProcessPoolExecutor (ReportLab is CPU bound and holds
+the GIL) while the archive is written incrementally: only a bounded window of
+rendered documents and the ZIP central directory are ever held in memory.
+"""
+import multiprocessing
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from pdf_reports import render_visit_pdf
+from spreadsheets import ChunkBuffer
+
+
+def _render_pdf_bytes(fields):
+    return render_visit_pdf(fields).getvalue()
+
+
+def archive_name(fields):
+    """File name of a visit's PDF inside the export archive"""
+    school = re.sub(r'[\\/:*?"<>|\s]+', '_', fields['school_name'] or '').strip('_')
+    return f"{fields['visit_date']}_{school}_تقرير_زيارة_{fields['id']}.pdf"
+
+
+def iter_rendered_pdfs(fields_iter, cache=None, max_workers=None, window=None):
+    """Yield (fields, pdf_bytes) in input order, rendering cache misses in parallel.
+    
+    `fields_iter` yields (fields, digest) pairs as built by reports.visit_pdf_fields()
+    and reports.visit_pdf_digest(). At most `window` documents are in flight.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    window = window or max_workers * 4
+    pending = deque()
+    
+    # spawn: forking a threaded web worker can deadlock, and the children only need pdf_reports
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        for fields, digest in fields_iter:
+            data = cache.get(fields['id'], digest) if cache else None
+            pending.append((fields, digest, data if data is not None else executor.submit(_render_pdf_bytes, fields)))
+            
+            while len(pending) >= window:
+                yield _resolve(pending.popleft(), cache)
+        
+        while pending:
+            yield _resolve(pending.popleft(), cache)
+
+
+def _resolve(item, cache):
+    fields, digest, result = item
+    if isinstance(result, bytes):
+        return fields, result
+    data = result.result()
+    if cache:
+        cache.put(fields['id'], digest, data)
+    return fields, data
+
+
+def stream_zip(entries, progress=None, total=None):
+    """Yield the bytes of a ZIP archive built from (name, data) pairs.
+    
+    `progress(done, total)` is called after each entry is written.
+    """
+    sink = ChunkBuffer()
+    # PDFs are already compressed, so store them as-is
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for done, (name, data) in enumerate(entries, start=1):
+            archive.writestr(name, data)
+            if progress:
+                progress(done, total)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()
+
+
+def export_visit_pdfs(fields_iter, total=None, cache=None, max_workers=None, progress=None):
+    """Yield a ZIP archive of the visit PDFs described by `fields_iter`"""
+    entries = (
+        (archive_name(fields), data)
+        for fields, data in iter_rendered_pdfs(fields_iter, cache=cache, max_workers=max_workers)
+    )
+    return stream_zip(entries, progress=progress, total=total)
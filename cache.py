@@ -0,0 +1,54 @@
+"""
+Small in-process caches.
+
+Each gunicorn worker keeps its own copy, so entries carry a TTL that bounds how
+stale a value can get when another worker changed the data; routes that modify
+data invalidate the local copy explicitly.
+"""
+import threading
+import time
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire `ttl` seconds after being set"""
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            return value
+    
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+    
+    def get_or_set(self, key, factory):
+        """Return the cached value, computing and storing it with `factory()` on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+    
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
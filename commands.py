@@ -0,0 +1,119 @@
+"""
+`flask` CLI commands, registered on the application by create_app() in app.py.
+"""
+import click
+from flask.cli import with_appcontext
+from werkzeug.datastructures import MultiDict
+
+from follow_ups import send_follow_up_reminders
+from models import parse_visit_filters, filtered_visits_query, rebuild_score_rollups
+from reports import export_visit_reports_zip
+from roster_import import ROSTERS, import_roster
+from search import rebuild_search_index
+from teacher_history import rebuild_teacher_summaries
+
+
+@click.command('export-reports')
+@click.option('--output', '-o', required=True, type=click.Path(dir_okay=False, writable=True), help='ZIP file to write')
+@click.option('--school')
+@click.option('--supervisor-id')
+@click.option('--date-from', help='YYYY-MM-DD')
+@click.option('--date-to', help='YYYY-MM-DD')
+@click.option('--workers', type=int, help='render processes (defaults to the CPU count)')
+@with_appcontext
+def export_reports_command(output, school, supervisor_id, date_from, date_to, workers):
+    """Export the PDF reports of the matching visits into a ZIP archive"""
+    filters = parse_visit_filters(MultiDict({
+        'school': school or '',
+        'supervisor_id': supervisor_id or '',
+        'date_from': date_from or '',
+        'date_to': date_to or ''
+    }))
+    total = filtered_visits_query(filters).count()
+
+    def show_progress(done, total):
+        click.echo(f'\r{done}/{total} reports', nl=False)
+
+    with open(output, 'wb') as f:
+        for chunk in export_visit_reports_zip(filters, total, max_workers=workers, progress=show_progress):
+            f.write(chunk)
+    click.echo(f'\nWrote {total} reports to {output}')
+
+
+@click.command('rebuild-analytics')
+@click.option('--batch-size', default=5000, show_default=True, help='visits per chunk')
+@with_appcontext
+def rebuild_analytics_command(batch_size):
+    """Recompute the score rollup behind /analytics from scratch"""
+    def show_progress(done, total):
+        click.echo(f'\r{done}/{total} visits', nl=False)
+
+    rebuild_score_rollups(batch_size, progress=show_progress)
+    click.echo('\nAnalytics rebuilt')
+
+
+@click.command('rebuild-search-index')
+@click.option('--batch-size', default=1000, show_default=True, help='visits per chunk')
+@with_appcontext
+def rebuild_search_index_command(batch_size):
+    """Rewrite the full-text search documents of every visit"""
+    def show_progress(done, total):
+        click.echo(f'\r{done}/{total} visits', nl=False)
+
+    rebuild_search_index(batch_size, progress=show_progress)
+    click.echo('\nSearch index rebuilt')
+
+
+@click.command('rebuild-teacher-summaries')
+@click.option('--batch-size', default=500, show_default=True, help='teachers per chunk')
+@with_appcontext
+def rebuild_teacher_summaries_command(batch_size):
+    """Recompute the score history behind the teacher profiles from the visits"""
+    def show_progress(done, total):
+        click.echo(f'\r{done}/{total} teachers', nl=False)
+
+    rebuild_teacher_summaries(batch_size, progress=show_progress)
+    click.echo('\nTeacher summaries rebuilt')
+
+
+@click.command('import-roster')
+@click.argument('kind', type=click.Choice(sorted(ROSTERS)))
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, show_default=True, help='rows per transaction')
+@with_appcontext
+def import_roster_command(kind, csv_path, batch_size):
+    """Create or update teachers or supervisors from a CSV file keyed by email"""
+    try:
+        with open(csv_path, encoding='utf-8-sig', newline='') as csv_file:
+            report = import_roster(kind, csv_file, batch_size)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise click.ClickException(str(e))
+    for error in report['errors']:
+        messages = '; '.join(f'{field}: {message}' for field, message in error['errors'].items())
+        click.echo(f"line {error['line']} ({error['email'] or 'no email'}): {messages}", err=True)
+    click.echo(f"{report['created']} created, {report['updated']} updated, {len(report['errors'])} rejected")
+
+
+@click.command('send-follow-up-reminders')
+@click.option('--days-ahead', type=int, help='remind of follow-ups due up to this many days ahead')
+@with_appcontext
+def send_follow_up_reminders_command(days_ahead):
+    """Email each supervisor a digest of their due follow-ups; meant to run daily"""
+    from mailer import get_mailer
+
+    try:
+        report = send_follow_up_reminders(days_ahead=days_ahead)
+    finally:
+        get_mailer().close()
+    click.echo(f"{report['visits']} follow-ups, {report['sent']} digests sent")
+    if report['failed']:
+        raise click.ClickException(f"{report['failed']} digests could not be sent; they are retried on the next run")
+
+
+def register_commands(app):
+    app.cli.add_command(export_reports_command)
+    app.cli.add_command(rebuild_analytics_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(rebuild_teacher_summaries_command)
+    app.cli.add_command(send_follow_up_reminders_command)
+    app.cli.add_command(import_roster_command)
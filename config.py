@@ -0,0 +1,99 @@
+"""
+Configuration read from the environment, loaded by create_app() in app.py.
+"""
+import os
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS
+
+
+def normalize_database_url(url):
+    """Heroku/Render hand out postgres:// URLs, which SQLAlchemy 1.4+ no longer accepts"""
+    if url and url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(url, config):
+    """Pool and timeout settings for the engine behind `url`"""
+    if url.startswith('sqlite'):
+        # No pool to tune; wait for the writer lock instead of failing with "database is locked"
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+    if url.startswith('postgresql') and config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY') or 'your-super-secret-key-here-change-in-production'
+
+    # Database
+    SQLALCHEMY_DATABASE_URI = normalize_database_url(os.environ.get('DATABASE_URL')) or 'sqlite:///school_visits.db'
+    DATABASE_REPLICA_URL = normalize_database_url(os.environ.get('DATABASE_REPLICA_URL'))
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    # After a write, keep this browser session's reads on the primary while the replica catches up
+    REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+    # Visit list
+    VISITS_PAGE_SIZE = int(os.environ.get('VISITS_PAGE_SIZE', 50))
+    VISITS_MAX_PAGE_SIZE = int(os.environ.get('VISITS_MAX_PAGE_SIZE', 200))
+    # Visits accepted per request by the offline batch API
+    VISIT_BATCH_MAX_SIZE = int(os.environ.get('VISIT_BATCH_MAX_SIZE', 200))
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+    # Teachers/supervisors/schools/months per page of /analytics
+    ANALYTICS_PAGE_SIZE = int(os.environ.get('ANALYTICS_PAGE_SIZE', 50))
+
+    # Email queue (worker.py)
+    EMAIL_JOB_MAX_ATTEMPTS = int(os.environ.get('EMAIL_JOB_MAX_ATTEMPTS', 5))
+    EMAIL_JOB_BACKOFF_SECONDS = int(os.environ.get('EMAIL_JOB_BACKOFF_SECONDS', 30))
+    EMAIL_JOB_BACKOFF_MAX_SECONDS = int(os.environ.get('EMAIL_JOB_BACKOFF_MAX_SECONDS', 3600))
+    EMAIL_JOB_STALE_SECONDS = int(os.environ.get('EMAIL_JOB_STALE_SECONDS', 600))
+    # Follow-up reminders (flask send-follow-up-reminders): follow-ups due up to this many days
+    # ahead, or overdue by at most FOLLOW_UP_LOOKBACK_DAYS, go into the supervisors' digests
+    FOLLOW_UP_DAYS_AHEAD = int(os.environ.get('FOLLOW_UP_DAYS_AHEAD', 2))
+    FOLLOW_UP_LOOKBACK_DAYS = int(os.environ.get('FOLLOW_UP_LOOKBACK_DAYS', 7))
+    FOLLOW_UP_BATCH_SIZE = int(os.environ.get('FOLLOW_UP_BATCH_SIZE', 1000))
+
+    # PDF reports; PDF_CACHE_DIR defaults to instance/pdf_cache. The Arabic font is read by
+    # pdf_reports.py itself from PDF_FONT_PATH / PDF_FONT_BOLD_PATH, so export worker processes see it too
+    PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR')
+    PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+    EXPORT_MAX_WORKERS = int(os.environ.get('EXPORT_MAX_WORKERS', 0)) or None
+    # Visits fetched per round trip by the CSV/XLSX export
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+    # Teacher/supervisor rows upserted per transaction by the CSV import
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+
+    # Per-request SQL/template/PDF timings: Server-Timing headers, JSON logs and /metrics
+    INSTRUMENTATION = os.environ.get('INSTRUMENTATION', '0') == '1'
+    # /metrics requires "Authorization: Bearer <token>"; without a token it is not served at all
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Per-process caches
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 60))
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+    # Typeahead index of teachers/supervisors behind the visit form pickers
+    ROSTER_INDEX_TTL = int(os.environ.get('ROSTER_INDEX_TTL', 300))
+    ROSTER_LOOKUP_MAX_RESULTS = int(os.environ.get('ROSTER_LOOKUP_MAX_RESULTS', 50))
+
+    # Authentication
+    # Werkzeug method string, e.g. 'pbkdf2:sha256:600000' or 'scrypt:32768:8:1'
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}')
+    LOGIN_MAX_ATTEMPTS = int(os.environ.get('LOGIN_MAX_ATTEMPTS', 5))
+    LOGIN_IP_MAX_ATTEMPTS = int(os.environ.get('LOGIN_IP_MAX_ATTEMPTS', 20))
+    LOGIN_THROTTLE_WINDOW = int(os.environ.get('LOGIN_THROTTLE_WINDOW', 300))
+    # Reverse proxies in front of the app (1 on Render). Their X-Forwarded-For gives the client
+    # address the login throttle counts per IP; without it every client shares the proxy's
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
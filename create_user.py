@@ -1,6 +1,8 @@
-from app import app
+from app import create_app
 from models import db, User
 
+app = create_app()
+
 with app.app_context():
     # تحقق إذا المستخدم موجود
     user = User.query.filter_by(email='admin@school.com').first()
@@ -9,10 +11,12 @@ with app.app_context():
     else:
         # أنشئ مستخدم جديد
         new_user = User(
+            username='admin',
             email='admin@school.com',
-            password='admin123',
+            name='مدير النظام',
             role='admin'
         )
+        new_user.set_password('admin123')
         db.session.add(new_user)
         db.session.commit()
         print("✅ تم إنشاء المستخدم: admin@school.com / admin123")
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""
+Follow-up reminders: one digest email per supervisor listing the visits whose
+follow_up_date falls due soon.
+
+Run periodically (`flask send-follow-up-reminders`, e.g. daily from cron).
+A run first claims the due visits not reminded yet, cancelled ones aside, in
+batches, by stamping follow_up_reminded_at with its own start time. The range
+query and the claim both go through ix_visit_follow_up, and the claim is
+conditional, so two overlapping runs never take the same visit. The run then streams the visits
+it claimed, ordered by supervisor, and pushes one digest per supervisor
+through the pooled SMTP session of mailer.get_mailer(). Claims of a digest
+that could not be sent are released for the next run. A run that dies
+between claiming and sending leaves those visits claimed: a reminder is sent
+at most once.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from flask import current_app
+
+from models import db, Visit, Teacher, Supervisor, VISIT_CANCELLED
+
+logger = logging.getLogger(__name__)
+
+
+def due_window(now, days_ahead, lookback_days):
+    """[start, end) of follow_up_date values due for a reminder at `now`"""
+    today = datetime(now.year, now.month, now.day)
+    return today - timedelta(days=lookback_days), today + timedelta(days=days_ahead + 1)
+
+
+def claim_due_follow_ups(run_at, start, end, batch_size=1000):
+    """Mark every unreminded visit due in [start, end) as claimed by the run `run_at`; returns the count.
+    
+    Cancelled visits have nothing to follow up and are never claimed.
+    """
+    claimed = 0
+    while True:
+        ids = db.session.execute(
+            db.select(Visit.id).where(
+                Visit.follow_up_reminded_at.is_(None),
+                Visit.follow_up_date >= start,
+                Visit.follow_up_date < end,
+                Visit.status.is_distinct_from(VISIT_CANCELLED)
+            ).order_by(Visit.follow_up_date).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return claimed
+        # A visit claimed by a concurrent run in the meantime no longer matches
+        claimed += db.session.execute(
+            db.update(Visit).where(Visit.id.in_(ids), Visit.follow_up_reminded_at.is_(None))
+            .values(follow_up_reminded_at=run_at)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+
+
+def build_follow_up_digest(supervisor_name, supervisor_email, visits):
+    """The reminder email listing a supervisor's due follow-ups (rows of follow_up_date, teacher, school, lesson)"""
+    from email.mime.text import MIMEText
+
+    email_user = os.environ.get('EMAIL_USER', '')
+    if not email_user:
+        raise RuntimeError('Email credentials are not configured')
+
+    lines = [
+        f"- {follow_up_date.strftime('%Y-%m-%d')}: {teacher_name} - {school_name} - {lesson_title}"
+        for follow_up_date, teacher_name, school_name, lesson_title in visits
+    ]
+    body = '\n'.join([
+        'السلام عليكم ورحمة الله وبركاته',
+        '',
+        f'سيادة المشرف/ة {supervisor_name}',
+        '',
+        f'لديكم {len(visits)} من مواعيد المتابعة المستحقة للزيارات التالية:',
+        '',
+        *lines,
+        '',
+        'مع خالص التقدير،',
+        'إدارة النظام',
+    ])
+    msg = MIMEText(body, 'plain', 'utf-8')
+    msg['From'] = email_user
+    msg['To'] = supervisor_email
+    msg['Subject'] = f'تذكير بمواعيد المتابعة - {len(visits)} زيارة'
+    return msg
+
+
+def _release(visit_ids, batch_size):
+    for start in range(0, len(visit_ids), batch_size):
+        db.session.execute(
+            db.update(Visit).where(Visit.id.in_(visit_ids[start:start + batch_size]))
+            .values(follow_up_reminded_at=None)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+
+
+def send_follow_up_reminders(now=None, days_ahead=None, lookback_days=None, batch_size=None, mailer=None):
+    """Claim the due follow-ups and email each supervisor a digest of theirs.
+
+    Returns {'visits': claimed, 'sent': digests sent, 'failed': digests not sent}.
+    """
+    from mailer import get_mailer
+
+    config = current_app.config
+    days_ahead = config['FOLLOW_UP_DAYS_AHEAD'] if days_ahead is None else days_ahead
+    lookback_days = config['FOLLOW_UP_LOOKBACK_DAYS'] if lookback_days is None else lookback_days
+    batch_size = batch_size or config['FOLLOW_UP_BATCH_SIZE']
+    mailer = mailer or get_mailer()
+
+    run_at = datetime.utcnow()
+    start, end = due_window(now or datetime.now(), days_ahead, lookback_days)
+    report = {'visits': claim_due_follow_ups(run_at, start, end, batch_size), 'sent': 0, 'failed': 0}
+    if not report['visits']:
+        return report
+
+    supervisor_ids = db.session.execute(
+        db.select(Visit.supervisor_id).where(Visit.follow_up_reminded_at == run_at).distinct()
+    ).scalars().all()
+    supervisors = {row.id: row for row in db.session.execute(
+        db.select(Supervisor.id, Supervisor.name, Supervisor.email).where(Supervisor.id.in_(supervisor_ids))
+    )}
+    rows = db.session.execute(
+        db.select(Visit.supervisor_id, Visit.id, Visit.follow_up_date, Teacher.name, Visit.school_name,
+                  Visit.lesson_title)
+        .join(Teacher, Teacher.id == Visit.teacher_id)
+        .where(Visit.follow_up_reminded_at == run_at)
+        .order_by(Visit.supervisor_id, Visit.follow_up_date, Visit.id)
+        .execution_options(yield_per=batch_size)
+    )
+    failed = []
+    for supervisor_id, visits in groupby(rows, key=lambda row: row[0]):
+        visits = list(visits)
+        supervisor = supervisors[supervisor_id]
+        try:
+            mailer.send_message(build_follow_up_digest(supervisor.name, supervisor.email,
+                                                       [row[2:] for row in visits]))
+        except Exception as e:
+            logger.warning('Follow-up digest to %s failed, released for the next run: %s', supervisor.email, e)
+            failed.extend(row[1] for row in visits)
+            report['failed'] += 1
+        else:
+            report['sent'] += 1
+    rows.close()
+    if failed:
+        _release(failed, batch_size)
+    return report
@@ -1,12 +1,13 @@
-from app import app
+from flask_migrate import upgrade
+
+from app import create_app
 from models import db, User
 
+app = create_app(migrations=True)
+
 with app.app_context():
-    # حذف الجداول القديمة أولاً
-    db.drop_all()
-    
-    # إنشاء جميع الجداول
-    db.create_all()
+    # تطبيق ترحيلات قاعدة البيانات دون حذف البيانات الموجودة
+    upgrade()
     
     # إنشاء مستخدم افتراضي
     try:
@@ -14,10 +15,12 @@ with app.app_context():
         existing_user = User.query.filter_by(email='admin@school.com').first()
         if not existing_user:
             admin_user = User(
+                username='admin',
                 email='admin@school.com',
-                password='admin123',
+                name='مدير النظام',
                 role='admin'
             )
+            admin_user.set_password('admin123')
             db.session.add(admin_user)
             db.session.commit()
             print("✅ تم إنشاء المستخدم الافتراضي: admin@school.com / admin123")
@@ -0,0 +1,245 @@
+"""
+Opt-in per-request instrumentation (INSTRUMENTATION=1).
+
+For every request this records the number of SQL statements and the time
+spent in them, in Jinja rendering and in ReportLab, and then
+- adds them to the response as a Server-Timing header (visible in the
+  browser's network panel),
+- logs them as one JSON line on the `instrumentation` logger,
+- aggregates them per endpoint for /metrics, in the Prometheus text format:
+  request latency histograms plus SQL/template/PDF time and query totals.
+
+Metrics live in the process that served the request: with several gunicorn
+workers each one reports its own, and Prometheus sums them when scraped per
+instance. Streamed responses (exports) are logged and aggregated once their
+last byte has been handed to the server, queries made while streaming
+included; their Server-Timing header, sent ahead of the body, can only
+cover the time until streaming starts.
+/metrics answers only scrapers presenting METRICS_TOKEN, and is a 404 while
+no token is configured.
+
+When disabled nothing is registered, so there is no overhead at all.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from flask import abort, current_app, g, has_request_context, request, before_render_template, template_rendered
+from flask.logging import default_handler
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('instrumentation')
+
+# Request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Timers shown in Server-Timing and logs: key -> description
+TIMERS = {
+    'db': 'SQL',
+    'template': 'Templates',
+    'pdf': 'PDF rendering',
+}
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.seconds = dict.fromkeys(TIMERS, 0.0)
+
+    def add(self, timer, seconds):
+        self.seconds[timer] += seconds
+
+
+def current_stats():
+    """The stats of the request being served, or None outside instrumented requests"""
+    if has_request_context():
+        return g.get('_instrumentation')
+    return None
+
+
+@contextmanager
+def timed(timer):
+    """Add the time spent in the block to `timer` of the current request, if instrumented"""
+    stats = current_stats()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(timer, time.perf_counter() - started)
+
+
+class Metrics:
+    """Per-endpoint aggregates, rendered in the Prometheus text exposition format"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._latency = {}   # (endpoint, method) -> [bucket counts..., sum, count]
+        self._requests = {}  # (endpoint, method, status) -> count
+        self._queries = {}   # endpoint -> count
+        self._seconds = {}   # (endpoint, timer) -> seconds
+
+    def observe(self, endpoint, method, status, duration, stats):
+        with self._lock:
+            latency = self._latency.setdefault((endpoint, method), [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    latency[i] += 1
+            latency[-2] += duration
+            latency[-1] += 1
+            key = (endpoint, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._queries[endpoint] = self._queries.get(endpoint, 0) + stats.queries
+            for timer, seconds in stats.seconds.items():
+                self._seconds[endpoint, timer] = self._seconds.get((endpoint, timer), 0.0) + seconds
+
+    def render(self):
+        with self._lock:
+            lines = [
+                '# HELP http_request_duration_seconds Time to build the response, per endpoint.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (endpoint, method), values in sorted(self._latency.items()):
+                labels = f'endpoint="{_escape(endpoint)}",method="{method}"'
+                # Bucket counts are cumulative: observe() counts a request in every bucket it fits
+                for bound, count in zip(self.buckets, values):
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {values[-1]}')
+                lines.append(f'http_request_duration_seconds_sum{{{labels}}} {values[-2]:.6f}')
+                lines.append(f'http_request_duration_seconds_count{{{labels}}} {values[-1]}')
+
+            lines += ['# HELP http_requests_total Responses, per endpoint and status.',
+                      '# TYPE http_requests_total counter']
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{_escape(endpoint)}",method="{method}",status="{status}"}} {count}')
+
+            lines += ['# HELP db_queries_total SQL statements executed while serving requests.',
+                      '# TYPE db_queries_total counter']
+            for endpoint, count in sorted(self._queries.items()):
+                lines.append(f'db_queries_total{{endpoint="{_escape(endpoint)}"}} {count}')
+
+            for timer in TIMERS:
+                name = f'{timer}_seconds_total'
+                lines += [f'# HELP {name} Time spent in {TIMERS[timer]} while serving requests.',
+                          f'# TYPE {name} counter']
+                for (endpoint, key), seconds in sorted(self._seconds.items()):
+                    if key == timer:
+                        lines.append(f'{name}{{endpoint="{_escape(endpoint)}"}} {seconds:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats() is not None:
+        conn.info.setdefault('_instrumentation_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    started = conn.info.get('_instrumentation_started')
+    if stats is not None and started:
+        stats.queries += 1
+        stats.add('db', time.perf_counter() - started.pop())
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get('_instrumentation_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def _before_render_template(sender, template, context, **extra):
+    stats = current_stats()
+    if stats is not None:
+        g._template_started = time.perf_counter()
+
+
+def _template_rendered(sender, template, context, **extra):
+    stats = current_stats()
+    started = g.pop('_template_started', None)
+    if stats is not None and started is not None:
+        stats.add('template', time.perf_counter() - started)
+
+
+def _start_request():
+    g._instrumentation = RequestStats()
+
+
+def _finish_request(response):
+    stats = g.get('_instrumentation')
+    if stats is None:
+        return response
+    duration = time.perf_counter() - stats.started
+
+    timings = [f'{timer};dur={seconds * 1000:.1f};desc="{TIMERS[timer]}"'
+               for timer, seconds in stats.seconds.items() if seconds]
+    timings.append(f'total;dur={duration * 1000:.1f}')
+    response.headers.add('Server-Timing', ', '.join(timings))
+    response.headers.add('X-Query-Count', str(stats.queries))
+
+    record = partial(_record, current_app.extensions['instrumentation'], request.endpoint or 'unmatched', request.method,
+                     request.path, response.status_code, stats)
+    if response.is_streamed:
+        # The body is produced after this hook; the stats stay on g to count its queries
+        response.call_on_close(record)
+    else:
+        g.pop('_instrumentation')
+        record()
+    return response
+
+
+def _record(metrics, endpoint, method, path, status, stats):
+    """Log a finished request and add it to the metrics, once its response is complete"""
+    duration = time.perf_counter() - stats.started
+    logger.info(json.dumps({
+        'endpoint': endpoint,
+        'method': method,
+        'path': path,
+        'status': status,
+        'duration_ms': round(duration * 1000, 2),
+        'db_queries': stats.queries,
+        **{f'{timer}_ms': round(seconds * 1000, 2) for timer, seconds in stats.seconds.items()},
+    }))
+    if endpoint != 'metrics':
+        metrics.observe(endpoint, method, status, duration, stats)
+
+
+def metrics_view():
+    token = current_app.config['METRICS_TOKEN']
+    # Endpoint names and traffic are not for the public: without a token there is no /metrics
+    if not token:
+        abort(404)
+    if request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return current_app.extensions['instrumentation'].render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+
+def init_instrumentation(app):
+    """Register the hooks and the /metrics endpoint on `app`"""
+    # Engine-wide listeners, shared by every app in the process; they only count
+    # inside instrumented requests
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+    app.extensions['instrumentation'] = Metrics()
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    # Logged to stderr like Flask's own messages unless logging is configured otherwise
+    logger.setLevel(logging.INFO)
+    if not logger.handlers and not logging.getLogger().handlers:
+        logger.addHandler(default_handler)
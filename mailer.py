@@ -0,0 +1,133 @@
+"""
+Reusable SMTP sessions for outgoing report emails.
+
+Opening an SMTP connection costs a TCP connect, a TLS handshake and a login.
+SMTPConnectionManager keeps one authenticated session open and pushes many
+messages through it, checking it with NOOP when it has been idle, reconnecting
+when the server drops it, and rotating it after a fixed number of messages.
+"""
+import logging
+import os
+import smtplib
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the session itself is unusable, as opposed to a rejected message
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+class SMTPConnectionManager:
+    """Thread-safe holder of a single long-lived SMTP session"""
+    
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 timeout=30, max_messages_per_session=100, health_check_interval=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_messages_per_session = max_messages_per_session
+        self.health_check_interval = health_check_interval
+        
+        self._lock = threading.RLock()
+        self._server = None
+        self._messages_sent = 0
+        self._last_used = 0.0
+    
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+        self._messages_sent = 0
+        self._last_used = time.monotonic()
+        logger.debug('Opened SMTP session to %s:%s', self.host, self.port)
+    
+    def _is_healthy(self):
+        if self._server is None:
+            return False
+        if time.monotonic() - self._last_used < self.health_check_interval:
+            return True
+        try:
+            return self._server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+    
+    def _ensure_connection(self):
+        if not self._is_healthy():
+            self._close()
+            self._connect()
+    
+    def _close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            self._server.close()
+        self._server = None
+    
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        """Send an email.message.Message, reconnecting once if the session was lost"""
+        with self._lock:
+            self._ensure_connection()
+            try:
+                self._server.send_message(msg, from_addr, to_addrs)
+            except CONNECTION_ERRORS:
+                logger.info('SMTP session to %s lost, reconnecting', self.host)
+                self._close()
+                self._connect()
+                self._server.send_message(msg, from_addr, to_addrs)
+            
+            self._messages_sent += 1
+            self._last_used = time.monotonic()
+            if self._messages_sent >= self.max_messages_per_session:
+                self._close()
+    
+    def close(self):
+        """Quit the current session, if any"""
+        with self._lock:
+            self._close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+
+def mailer_from_env():
+    """Build a connection manager from the SMTP_* / EMAIL_* environment settings"""
+    return SMTPConnectionManager(
+        host=os.environ.get('SMTP_SERVER', 'smtp.gmail.com'),
+        port=int(os.environ.get('SMTP_PORT', 587)),
+        username=os.environ.get('EMAIL_USER', ''),
+        password=os.environ.get('EMAIL_PASSWORD', ''),
+        use_tls=os.environ.get('SMTP_USE_TLS', '1').lower() not in ('0', 'false', 'no'),
+        timeout=int(os.environ.get('SMTP_TIMEOUT', 30)),
+        max_messages_per_session=int(os.environ.get('SMTP_MAX_MESSAGES_PER_SESSION', 100)),
+        health_check_interval=int(os.environ.get('SMTP_HEALTH_CHECK_INTERVAL', 30))
+    )
+
+
+def get_mailer():
+    """Return the process-wide connection manager, creating it on first use"""
+    global _mailer
+    if _mailer is None:
+        with _mailer_lock:
+            if _mailer is None:
+                _mailer = mailer_from_env()
+    return _mailer
@@ -0,0 +1,90 @@
+"""
+Helpers for migrations that touch large tables.
+
+Alembic runs a migration inside one transaction, so a backfill over a big table
+would hold its locks (and, on SQLite, the whole database) until it finishes.
+These helpers step out of that transaction and work in short batches, each
+committed on its own, so the application only ever waits for one batch.
+"""
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from alembic import op
+
+
+@contextmanager
+def _short_transaction(conn):
+    # The connection is in autocommit mode here, so transactions are explicit
+    conn.exec_driver_sql('BEGIN')
+    try:
+        yield
+    except Exception:
+        conn.exec_driver_sql('ROLLBACK')
+        raise
+    conn.exec_driver_sql('COMMIT')
+
+
+def run_in_batches(step):
+    """Call ``step(conn, state)`` in its own transaction until it returns None.
+    
+    ``state`` is None on the first call and then whatever the previous call
+    returned, typically the last primary key processed.
+    """
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        state = None
+        while True:
+            with _short_transaction(conn):
+                state = step(conn, state)
+            if state is None:
+                break
+
+
+def id_ranges(table_name, batch_size, pk='id'):
+    """Yield (low, high] primary-key ranges covering the rows present right now"""
+    conn = op.get_bind()
+    max_id = conn.execute(sa.text(f'SELECT MAX({pk}) FROM {table_name}')).scalar() or 0
+    for low in range(0, max_id, batch_size):
+        yield low, min(low + batch_size, max_id)
+
+
+def batched_update(table_name, set_clause, where=None, batch_size=5000, pk='id', **params):
+    """``UPDATE table SET ... [WHERE ...]`` one primary-key range per transaction"""
+    condition = f'{pk} > :low AND {pk} <= :high' + (f' AND ({where})' if where else '')
+    statement = sa.text(f'UPDATE {table_name} SET {set_clause} WHERE {condition}')
+    ranges = iter(list(id_ranges(table_name, batch_size, pk)))
+    
+    def step(conn, _):
+        bounds = next(ranges, None)
+        if bounds is None:
+            return None
+        conn.execute(statement, {'low': bounds[0], 'high': bounds[1], **params})
+        return bounds
+    
+    run_in_batches(step)
+
+
+def create_index_online(name, table_name, columns, **kw):
+    """Create an index without blocking writes where the database supports it.
+    
+    PostgreSQL builds it CONCURRENTLY, which must run outside a transaction.
+    SQLite has no online index build; it holds the write lock for the build.
+    """
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index(name, table_name, columns, postgresql_concurrently=True, **kw)
+    else:
+        op.create_index(name, table_name, columns, **kw)
+
+
+def include_name(name, type_, parent_names):
+    """Autogenerate filter: skip objects created by raw DDL that the models cannot express.
+    
+    These are the SQLite FTS5 table behind visit search (with its shadow tables)
+    and the PostgreSQL tsvector index; see models.VisitSearch.
+    """
+    if type_ == 'table':
+        return not name.startswith('visit_search_fts')
+    if type_ == 'index':
+        return name != 'ix_visit_search_document_tsv'
+    return True
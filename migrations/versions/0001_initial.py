@@ -0,0 +1,85 @@
+"""Initial schema: users, teachers, supervisors and visits
+
+Revision ID: 0001
+Revises: 
+Create Date: 2025-01-01 00:00:00
+
+Matches the tables the application used to create with db.create_all().
+A database created that way is adopted with ``flask db stamp 0001`` followed
+by ``flask db upgrade``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=80), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=120), nullable=False),
+    sa.Column('role', sa.String(length=20), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('teacher',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('subject', sa.String(length=100), nullable=False),
+    sa.Column('phone', sa.String(length=20), nullable=True),
+    sa.Column('school', sa.String(length=100), nullable=False),
+    sa.Column('grade', sa.String(length=100), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email')
+    )
+    op.create_table('supervisor',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('specialty', sa.String(length=100), nullable=False),
+    sa.Column('phone', sa.String(length=20), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email')
+    )
+    op.create_table('visit',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('visit_date', sa.DateTime(), nullable=False),
+    sa.Column('school_name', sa.String(length=100), nullable=False),
+    sa.Column('teacher_id', sa.Integer(), nullable=False),
+    sa.Column('supervisor_id', sa.Integer(), nullable=False),
+    sa.Column('subject', sa.String(length=100), nullable=False),
+    sa.Column('grade', sa.String(length=50), nullable=False),
+    sa.Column('lesson_title', sa.String(length=200), nullable=False),
+    sa.Column('management_scores', sa.Text(), nullable=True),
+    sa.Column('teaching_scores', sa.Text(), nullable=True),
+    sa.Column('feedback_scores', sa.Text(), nullable=True),
+    sa.Column('feedback_1', sa.Text(), nullable=True),
+    sa.Column('feedback_2', sa.Text(), nullable=True),
+    sa.Column('suggestions', sa.Text(), nullable=True),
+    sa.Column('follow_up_date', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('supervisor_signature', sa.String(length=100), nullable=True),
+    sa.ForeignKeyConstraint(['supervisor_id'], ['supervisor.id'], ),
+    sa.ForeignKeyConstraint(['teacher_id'], ['teacher.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('visit')
+    op.drop_table('supervisor')
+    op.drop_table('teacher')
+    op.drop_table('user')
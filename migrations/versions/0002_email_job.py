@@ -0,0 +1,45 @@
+"""Email delivery queue
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-01-01 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('email_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('visit_id', sa.Integer(), nullable=False),
+    sa.Column('recipient', sa.String(length=120), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['visit_id'], ['visit.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('email_job', schema=None) as batch_op:
+        batch_op.create_index('ix_email_job_status_next_attempt', ['status', 'next_attempt_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_email_job_visit_id'), ['visit_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('email_job', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_email_job_visit_id'))
+        batch_op.drop_index('ix_email_job_status_next_attempt')
+
+    op.drop_table('email_job')
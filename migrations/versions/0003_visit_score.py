@@ -0,0 +1,83 @@
+"""Normalized visit scores, backfilled from the JSON score columns
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-01-01 00:00:00
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import run_in_batches
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+SCORE_SECTIONS = {'management': 5, 'teaching': 10, 'feedback': 5}
+BATCH_SIZE = 1000
+
+visit = sa.table('visit',
+    sa.column('id', sa.Integer),
+    sa.column('management_scores', sa.Text),
+    sa.column('teaching_scores', sa.Text),
+    sa.column('feedback_scores', sa.Text)
+)
+visit_score = sa.table('visit_score',
+    sa.column('visit_id', sa.Integer),
+    sa.column('section', sa.String),
+    sa.column('criterion_index', sa.Integer),
+    sa.column('score', sa.Integer)
+)
+
+
+def backfill_batch(conn, last_id):
+    batch = conn.execute(
+        sa.select(visit).where(visit.c.id > (last_id or 0)).order_by(visit.c.id).limit(BATCH_SIZE)
+    ).all()
+    if not batch:
+        return None
+    
+    rows = []
+    for row in batch:
+        for section, count in SCORE_SECTIONS.items():
+            raw = getattr(row, f'{section}_scores')
+            scores = json.loads(raw) if raw else {}
+            for i in range(1, count + 1):
+                try:
+                    score = int(scores.get(f'{section}_{i}'))
+                except (TypeError, ValueError):
+                    continue
+                rows.append({'visit_id': row.id, 'section': section, 'criterion_index': i, 'score': score})
+    if rows:
+        conn.execute(visit_score.insert(), rows)
+    return batch[-1].id
+
+
+def upgrade():
+    op.create_table('visit_score',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('visit_id', sa.Integer(), nullable=False),
+    sa.Column('section', sa.String(length=20), nullable=False),
+    sa.Column('criterion_index', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['visit_id'], ['visit.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('visit_id', 'section', 'criterion_index', name='uq_visit_score_criterion')
+    )
+    with op.batch_alter_table('visit_score', schema=None) as batch_op:
+        batch_op.create_index('ix_visit_score_section_criterion', ['section', 'criterion_index', 'score'], unique=False)
+    
+    run_in_batches(backfill_batch)
+
+
+def downgrade():
+    with op.batch_alter_table('visit_score', schema=None) as batch_op:
+        batch_op.drop_index('ix_visit_score_section_criterion')
+
+    op.drop_table('visit_score')
@@ -0,0 +1,112 @@
+"""Score rollup behind /analytics, built from visit_score
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-01-01 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import id_ranges, run_in_batches
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+visit = sa.table('visit',
+    sa.column('id', sa.Integer),
+    sa.column('visit_date', sa.DateTime),
+    sa.column('school_name', sa.String),
+    sa.column('teacher_id', sa.Integer),
+    sa.column('supervisor_id', sa.Integer)
+)
+visit_score = sa.table('visit_score',
+    sa.column('visit_id', sa.Integer),
+    sa.column('section', sa.String),
+    sa.column('score', sa.Integer)
+)
+score_rollup = sa.table('score_rollup',
+    sa.column('dimension', sa.String),
+    sa.column('dimension_key', sa.String),
+    sa.column('section', sa.String),
+    sa.column('visit_count', sa.Integer),
+    sa.column('score_sum', sa.Integer),
+    sa.column('score_count', sa.Integer)
+)
+
+
+def rollup_batches():
+    if op.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        month = sa.func.to_char(visit.c.visit_date, 'YYYY-MM')
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        month = sa.func.strftime('%Y-%m', visit.c.visit_date)
+    
+    dimensions = {
+        'teacher': sa.cast(visit.c.teacher_id, sa.String),
+        'supervisor': sa.cast(visit.c.supervisor_id, sa.String),
+        'school': visit.c.school_name,
+        'month': month
+    }
+    upsert = insert(score_rollup)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=['dimension', 'dimension_key', 'section'],
+        set_={
+            'visit_count': score_rollup.c.visit_count + upsert.excluded.visit_count,
+            'score_sum': score_rollup.c.score_sum + upsert.excluded.score_sum,
+            'score_count': score_rollup.c.score_count + upsert.excluded.score_count
+        }
+    )
+    ranges = iter(list(id_ranges('visit', BATCH_SIZE)))
+    
+    def step(conn, _):
+        bounds = next(ranges, None)
+        if bounds is None:
+            return None
+        rows = []
+        for dimension, key in dimensions.items():
+            result = conn.execute(sa.select(
+                key,
+                visit_score.c.section,
+                sa.func.count(sa.distinct(visit.c.id)),
+                sa.func.sum(visit_score.c.score),
+                sa.func.count(visit_score.c.score)
+            ).select_from(visit.join(visit_score, visit_score.c.visit_id == visit.c.id)).where(
+                visit.c.id > bounds[0], visit.c.id <= bounds[1]
+            ).group_by(key, visit_score.c.section))
+            rows.extend({
+                'dimension': dimension, 'dimension_key': r[0], 'section': r[1],
+                'visit_count': r[2], 'score_sum': r[3], 'score_count': r[4]
+            } for r in result)
+        if rows:
+            conn.execute(upsert, rows)
+        return bounds
+    
+    return step
+
+
+def upgrade():
+    op.create_table('score_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('dimension', sa.String(length=20), nullable=False),
+    sa.Column('dimension_key', sa.String(length=100), nullable=False),
+    sa.Column('section', sa.String(length=20), nullable=False),
+    sa.Column('visit_count', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Integer(), nullable=False),
+    sa.Column('score_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('dimension', 'dimension_key', 'section', name='uq_score_rollup_key')
+    )
+    
+    run_in_batches(rollup_batches())
+
+
+def downgrade():
+    op.drop_table('score_rollup')
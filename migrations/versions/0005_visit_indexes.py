@@ -0,0 +1,34 @@
+"""Indexes for the visit list, dashboard and per-teacher/supervisor lookups
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-01-01 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_index_online
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_index_online('ix_visit_date_id', 'visit', ['visit_date', 'id'])
+    create_index_online('ix_visit_teacher_date', 'visit', ['teacher_id', 'visit_date'])
+    create_index_online('ix_visit_supervisor_date', 'visit', ['supervisor_id', 'visit_date'])
+    create_index_online('ix_visit_school_date', 'visit', ['school_name', 'visit_date'])
+    create_index_online('ix_teacher_school_subject', 'teacher', ['school', 'subject'])
+
+
+def downgrade():
+    op.drop_index('ix_teacher_school_subject', table_name='teacher')
+    op.drop_index('ix_visit_school_date', table_name='visit')
+    op.drop_index('ix_visit_supervisor_date', table_name='visit')
+    op.drop_index('ix_visit_teacher_date', table_name='visit')
+    op.drop_index('ix_visit_date_id', table_name='visit')
@@ -0,0 +1,31 @@
+"""Client-generated UUID on visits, for idempotent batch submission
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-01-01 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_index_online
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A nullable column without default is a metadata-only change on both databases;
+    # the uniqueness lives in an index so SQLite does not have to rebuild the table
+    op.add_column('visit', sa.Column('client_uuid', sa.String(length=36), nullable=True))
+    create_index_online('ix_visit_client_uuid', 'visit', ['client_uuid'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_visit_client_uuid', table_name='visit')
+    with op.batch_alter_table('visit', schema=None) as batch_op:
+        batch_op.drop_column('client_uuid')
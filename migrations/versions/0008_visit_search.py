@@ -0,0 +1,120 @@
+"""Full-text search documents for visits
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-01-01 00:00:00
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import run_in_batches
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# Search normalization of arabic.py, frozen at this revision: `flask rebuild-search-index`
+# rebuilds the documents with the current rules
+DIACRITICS = re.compile('[ً-ْٰـ]')
+LETTER_VARIANTS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي',
+    'ة': 'ه',
+})
+WORD = re.compile(r'\w+')
+ARTICLE = 'ال'
+
+visit = sa.table('visit',
+    sa.column('id', sa.Integer),
+    sa.column('teacher_id', sa.Integer),
+    sa.column('school_name', sa.String),
+    sa.column('lesson_title', sa.String),
+    sa.column('feedback_1', sa.Text),
+    sa.column('feedback_2', sa.Text),
+    sa.column('suggestions', sa.Text)
+)
+teacher = sa.table('teacher',
+    sa.column('id', sa.Integer),
+    sa.column('name', sa.String)
+)
+visit_search = sa.table('visit_search',
+    sa.column('visit_id', sa.Integer),
+    sa.column('document', sa.Text)
+)
+
+# Same statements as models.VISIT_SEARCH_SQLITE_DDL, frozen at this revision
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE visit_search_fts USING fts5("
+    "document, content='visit_search', content_rowid='visit_id', tokenize='unicode61')",
+    "CREATE TRIGGER visit_search_ai AFTER INSERT ON visit_search BEGIN "
+    "INSERT INTO visit_search_fts(rowid, document) VALUES (new.visit_id, new.document); END",
+    "CREATE TRIGGER visit_search_ad AFTER DELETE ON visit_search BEGIN "
+    "INSERT INTO visit_search_fts(visit_search_fts, rowid, document) VALUES ('delete', old.visit_id, old.document); END",
+    "CREATE TRIGGER visit_search_au AFTER UPDATE ON visit_search BEGIN "
+    "INSERT INTO visit_search_fts(visit_search_fts, rowid, document) VALUES ('delete', old.visit_id, old.document); "
+    "INSERT INTO visit_search_fts(rowid, document) VALUES (new.visit_id, new.document); END",
+)
+
+
+def search_document(*parts):
+    """Diacritics stripped, alef/ya/ta marbuta variants folded, lowercased; article-bearing words also without it"""
+    text = DIACRITICS.sub('', ' '.join(part for part in parts if part)).translate(LETTER_VARIANTS).lower()
+    words = WORD.findall(text)
+    bare = [word[len(ARTICLE):] for word in words if word.startswith(ARTICLE) and len(word) > len(ARTICLE) + 2]
+    return ' '.join(words + bare)
+
+
+def backfill_batch(conn, last_id):
+    batch = conn.execute(
+        sa.select(visit.c.id, visit.c.lesson_title, visit.c.feedback_1, visit.c.feedback_2, visit.c.suggestions,
+                  teacher.c.name, visit.c.school_name)
+        .join(teacher, teacher.c.id == visit.c.teacher_id)
+        .where(visit.c.id > (last_id or 0)).order_by(visit.c.id).limit(BATCH_SIZE)
+    ).all()
+    if not batch:
+        return None
+    
+    conn.execute(visit_search.insert(), [
+        {'visit_id': row[0], 'document': search_document(*row[1:])} for row in batch
+    ])
+    return batch[-1][0]
+
+
+def upgrade():
+    op.create_table('visit_search',
+    sa.Column('visit_id', sa.Integer(), nullable=False),
+    sa.Column('document', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['visit_id'], ['visit.id'], ),
+    sa.PrimaryKeyConstraint('visit_id')
+    )
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # The triggers fill the FTS table as the backfill inserts documents
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+    
+    run_in_batches(backfill_batch)
+    
+    if dialect == 'postgresql':
+        # Built after the backfill, in one pass and without blocking writes
+        with op.get_context().autocommit_block():
+            op.execute("CREATE INDEX CONCURRENTLY ix_visit_search_document_tsv "
+                       "ON visit_search USING gin (to_tsvector('simple', document))")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('visit_search_ai', 'visit_search_ad', 'visit_search_au'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS visit_search_fts')
+    else:
+        op.execute('DROP INDEX IF EXISTS ix_visit_search_document_tsv')
+    op.drop_table('visit_search')
@@ -0,0 +1,140 @@
+"""Per-teacher score history behind the teacher profile
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2025-01-01 00:00:00
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import run_in_batches
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+# As in teacher_history.py when this revision was written: 100 visits shown,
+# rolling averages over 5, and the latest 5 recommendations
+STORED_POINTS = 104
+RECOMMENDATIONS_KEPT = 5
+BATCH_SIZE = 500
+
+teacher = sa.table('teacher',
+    sa.column('id', sa.Integer)
+)
+visit = sa.table('visit',
+    sa.column('id', sa.Integer),
+    sa.column('teacher_id', sa.Integer),
+    sa.column('visit_date', sa.DateTime),
+    sa.column('suggestions', sa.Text)
+)
+visit_score = sa.table('visit_score',
+    sa.column('visit_id', sa.Integer),
+    sa.column('section', sa.String),
+    sa.column('score', sa.Integer)
+)
+teacher_summary = sa.table('teacher_summary',
+    sa.column('teacher_id', sa.Integer),
+    sa.column('visit_count', sa.Integer),
+    sa.column('last_visit_date', sa.DateTime),
+    sa.column('history', sa.Text),
+    sa.column('recommendations', sa.Text)
+)
+
+
+def latest_visits(conn, teacher_ids, limit, *conditions):
+    rank = sa.func.row_number().over(partition_by=visit.c.teacher_id, order_by=(visit.c.visit_date.desc(), visit.c.id.desc()))
+    ranked = sa.select(visit.c.id, visit.c.teacher_id, visit.c.visit_date, visit.c.suggestions, rank.label('rank')).where(
+        visit.c.teacher_id.in_(teacher_ids), *conditions
+    ).subquery()
+    return conn.execute(
+        sa.select(ranked.c.id, ranked.c.teacher_id, ranked.c.visit_date, ranked.c.suggestions).where(ranked.c.rank <= limit)
+    ).all()
+
+
+def entry_order(entry):
+    return entry['date'], entry['id']
+
+
+def summarize(visits):
+    """The newest history points and recommendations of a teacher's visits"""
+    history = sorted(
+        ({'id': v['id'], 'date': v['date'], 'sections': v['sections']} for v in visits), key=entry_order
+    )
+    recommendations = sorted((
+        {'id': v['id'], 'date': v['date'], 'text': v['suggestions'].strip()}
+        for v in visits if v['suggestions'] and v['suggestions'].strip()
+    ), key=entry_order)
+    return history[-STORED_POINTS:], recommendations[-RECOMMENDATIONS_KEPT:]
+
+
+def backfill_batch(conn, last_id):
+    teacher_ids = conn.execute(
+        sa.select(teacher.c.id).where(teacher.c.id > (last_id or 0)).order_by(teacher.c.id).limit(BATCH_SIZE)
+    ).scalars().all()
+    if not teacher_ids:
+        return None
+
+    totals = conn.execute(
+        sa.select(visit.c.teacher_id, sa.func.count(visit.c.id), sa.func.max(visit.c.visit_date))
+        .where(visit.c.teacher_id.in_(teacher_ids)).group_by(visit.c.teacher_id)
+    ).all()
+    rows = {row[0]: row for row in latest_visits(conn, teacher_ids, STORED_POINTS)}
+    rows.update((row[0], row) for row in latest_visits(
+        conn, teacher_ids, RECOMMENDATIONS_KEPT, visit.c.suggestions.isnot(None), visit.c.suggestions != ''
+    ) if row[0] not in rows)
+
+    sections = {}
+    if rows:
+        averages = conn.execute(
+            sa.select(visit_score.c.visit_id, visit_score.c.section, sa.func.avg(visit_score.c.score))
+            .where(visit_score.c.visit_id.in_(list(rows))).group_by(visit_score.c.visit_id, visit_score.c.section)
+        )
+        for visit_id, section, average in averages:
+            sections.setdefault(visit_id, {})[section] = round(float(average), 2)
+    entries = {}
+    for visit_id, teacher_id, visit_date, suggestions in rows.values():
+        entries.setdefault(teacher_id, []).append({
+            'id': visit_id,
+            'date': visit_date.isoformat(timespec='minutes'),
+            'sections': sections.get(visit_id, {}),
+            'suggestions': suggestions
+        })
+
+    summaries = []
+    for teacher_id, visit_count, last_visit_date in totals:
+        history, recommendations = summarize(entries.get(teacher_id, []))
+        summaries.append({
+            'teacher_id': teacher_id,
+            'visit_count': visit_count,
+            'last_visit_date': last_visit_date,
+            'history': json.dumps(history, ensure_ascii=False),
+            'recommendations': json.dumps(recommendations, ensure_ascii=False)
+        })
+    if summaries:
+        conn.execute(teacher_summary.insert(), summaries)
+    return teacher_ids[-1]
+
+
+def upgrade():
+    op.create_table('teacher_summary',
+    sa.Column('teacher_id', sa.Integer(), nullable=False),
+    sa.Column('visit_count', sa.Integer(), nullable=False),
+    sa.Column('last_visit_date', sa.DateTime(), nullable=True),
+    sa.Column('history', sa.Text(), nullable=False),
+    sa.Column('recommendations', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['teacher_id'], ['teacher.id'], ),
+    sa.PrimaryKeyConstraint('teacher_id')
+    )
+
+    run_in_batches(backfill_batch)
+
+
+def downgrade():
+    op.drop_table('teacher_summary')
@@ -0,0 +1,30 @@
+"""Follow-up reminder state on visits
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2025-01-01 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_index_online
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nullable without default: a metadata-only change, as for client_uuid in 0007
+    op.add_column('visit', sa.Column('follow_up_reminded_at', sa.DateTime(), nullable=True))
+    create_index_online('ix_visit_follow_up', 'visit', ['follow_up_reminded_at', 'follow_up_date'])
+
+
+def downgrade():
+    op.drop_index('ix_visit_follow_up', table_name='visit')
+    with op.batch_alter_table('visit', schema=None) as batch_op:
+        batch_op.drop_column('follow_up_reminded_at')
@@ -0,0 +1,47 @@
+"""Store teacher and supervisor emails lowercased
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2025-01-01 00:00:00
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import batched_update
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+ROSTER_TABLES = ('teacher', 'supervisor')
+
+
+def upgrade():
+    for table_name in ROSTER_TABLES:
+        # Rows whose email differs only in case from another row's are different
+        # records of one person; they are left as they are and listed for merging
+        unique_lower = (
+            f'NOT EXISTS (SELECT 1 FROM {table_name} AS other '
+            f'WHERE lower(other.email) = lower({table_name}.email) AND other.id != {table_name}.id)'
+        )
+        batched_update(table_name, 'email = lower(email)', where=f'email != lower(email) AND {unique_lower}')
+
+        clashes = op.get_bind().execute(sa.text(
+            f'SELECT lower(email), COUNT(*) FROM {table_name} GROUP BY lower(email) HAVING COUNT(*) > 1'
+        )).all()
+        for email, count in clashes:
+            logger.warning('%s: %d records share the email %s in different case; merge them by hand',
+                           table_name, count, email)
+
+
+def downgrade():
+    # The original case is not kept; lowercased emails are valid either way
+    pass
@@ -1,29 +1,91 @@
-from flask_sqlalchemy import SQLAlchemy
+"""
+Database models and the query helpers shared by the web app, worker.py and the
+CLI commands. `db` is bound to an application by create_app() in app.py.
+"""
+import sqlite3
+from datetime import datetime, timedelta
+
+from flask import current_app, g, has_request_context
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import DDL, and_, or_, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import joinedload, validates
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+@event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """WAL lets gunicorn workers read while another one writes"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
+class RoutingSession(FlaskSession):
+    """Sends reads of @read_only views to the replica bind, everything else to the primary"""
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and has_request_context()
+                and g.get('use_replica') and 'replica' in self._db.engines):
+            return self._db.engines['replica']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
+def password_hash_prefix(method):
+    """The method prefix Werkzeug writes into a hash made with `method`, defaults filled in"""
+    name, *params = method.split(':')
+    if name == 'pbkdf2':
+        defaults = ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    elif name == 'scrypt':
+        defaults = ['32768', '8', '1']
+    else:
+        return method
+    params += defaults[len(params):]
+    return ':'.join([name] + params)
+
+def normalize_email(value):
+    """Teacher and supervisor emails are stored lowercased: the roster import upserts on them"""
+    return value.strip().lower() if isinstance(value, str) else value
+
+# Define Models
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(120), nullable=False)
-    role = db.Column(db.String(20), nullable=False, default='supervisor')  # admin, supervisor, teacher
+    password_hash = db.Column(db.String(255), nullable=False)
+    role = db.Column(db.String(20), nullable=False, default='supervisor')
     name = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    is_active = db.Column(db.Boolean, default=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=current_app.config['PASSWORD_HASH_METHOD'])
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
-    # دالة للبحث عن المستخدم بالبريد الإلكتروني أو اسم المستخدم
+    def password_needs_rehash(self):
+        """True when the stored hash was made with other parameters than PASSWORD_HASH_METHOD"""
+        return self.password_hash.split('$', 1)[0] != password_hash_prefix(current_app.config['PASSWORD_HASH_METHOD'])
+    
     @classmethod
     def find_user(cls, identifier):
         return cls.query.filter((cls.username == identifier) | (cls.email == identifier)).first()
+    
+    # Required properties for Flask-Login
+    def get_id(self):
+        return str(self.id)
+    
+    @property
+    def is_authenticated(self):
+        return True
+    
+    @property
+    def is_anonymous(self):
+        return False
 
 class Teacher(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -32,6 +94,15 @@ class Teacher(db.Model):
     subject = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20))
     school = db.Column(db.String(100), nullable=False)
+    grade = db.Column(db.String(100))
+    
+    __table_args__ = (
+        db.Index('ix_teacher_school_subject', 'school', 'subject'),
+    )
+    
+    @validates('email')
+    def validate_email(self, key, value):
+        return normalize_email(value)
 
 class Supervisor(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -39,6 +110,13 @@ class Supervisor(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     specialty = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20))
+    
+    @validates('email')
+    def validate_email(self, key, value):
+        return normalize_email(value)
+
+VISIT_STATUSES = ('مكتملة', 'معلقة', 'ملغاة')
+VISIT_CANCELLED = VISIT_STATUSES[2]
 
 class Visit(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -50,22 +128,477 @@ class Visit(db.Model):
     grade = db.Column(db.String(50), nullable=False)
     lesson_title = db.Column(db.String(200), nullable=False)
     
-    # Evaluation scores
-    management_scores = db.Column(db.JSON)  # Stores scores for management criteria
-    teaching_scores = db.Column(db.JSON)    # Stores scores for teaching criteria
-    feedback_scores = db.Column(db.JSON)    # Stores scores for feedback criteria
+    # Evaluation scores (stored as JSON strings)
+    management_scores = db.Column(db.Text)
+    teaching_scores = db.Column(db.Text)
+    feedback_scores = db.Column(db.Text)
     
     # Feedback and recommendations
     feedback_1 = db.Column(db.Text)
     feedback_2 = db.Column(db.Text)
     suggestions = db.Column(db.Text)
     follow_up_date = db.Column(db.DateTime)
+    # Set when a run of follow_ups.py claims the visit for its supervisor's reminder digest
+    follow_up_reminded_at = db.Column(db.DateTime)
     
     # Metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='مكتملة')  # مكتملة, معلقة, ملغاة
+    status = db.Column(db.String(20), default='مكتملة')
     supervisor_signature = db.Column(db.String(100))
+    # Set by offline clients of the batch API so a resubmitted visit is stored once
+    client_uuid = db.Column(db.String(36), unique=True, index=True)
     
     # Relationships
     teacher = db.relationship('Teacher', backref=db.backref('visits', lazy=True))
-    supervisor = db.relationship('Supervisor', backref=db.backref('visits', lazy=True))
\ No newline at end of file
+    supervisor = db.relationship('Supervisor', backref=db.backref('visits', lazy=True))
+    
+    # Access paths of the visit list, dashboard and per-teacher/supervisor lookups.
+    # Every index ends with visit_date so filtered lists come back already sorted.
+    __table_args__ = (
+        db.Index('ix_visit_date_id', 'visit_date', 'id'),
+        db.Index('ix_visit_teacher_date', 'teacher_id', 'visit_date'),
+        db.Index('ix_visit_supervisor_date', 'supervisor_id', 'visit_date'),
+        db.Index('ix_visit_school_date', 'school_name', 'visit_date'),
+        # Follow-ups not reminded yet, by due date; and the visits claimed by one reminder run
+        db.Index('ix_visit_follow_up', 'follow_up_reminded_at', 'follow_up_date'),
+    )
+
+# Evaluation sections and their number of criteria, as in visit_form.html
+SCORE_SECTIONS = {
+    'management': 5,
+    'teaching': 10,
+    'feedback': 5
+}
+
+SCORE_SECTION_LABELS = {
+    'management': 'الإدارة الصفية',
+    'teaching': 'الممارسات التدريسية',
+    'feedback': 'الملاحظة والتغذية الراجعة'
+}
+
+class VisitScore(db.Model):
+    """One criterion score of a visit, normalized out of the JSON score columns"""
+    id = db.Column(db.Integer, primary_key=True)
+    visit_id = db.Column(db.Integer, db.ForeignKey('visit.id'), nullable=False)
+    section = db.Column(db.String(20), nullable=False)
+    criterion_index = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+    
+    visit = db.relationship('Visit', backref=db.backref('scores', lazy=True, cascade='all, delete-orphan'))
+    
+    __table_args__ = (
+        db.UniqueConstraint('visit_id', 'section', 'criterion_index', name='uq_visit_score_criterion'),
+        db.Index('ix_visit_score_section_criterion', 'section', 'criterion_index', 'score'),
+    )
+
+def visit_score_rows(visit_id, section_scores):
+    """Turn {'management': {'management_1': '3', ...}, ...} into VisitScore insert rows.
+    
+    Missing or non-numeric values are skipped.
+    """
+    rows = []
+    for section, count in SCORE_SECTIONS.items():
+        scores = section_scores.get(section) or {}
+        for i in range(1, count + 1):
+            try:
+                score = int(scores.get(f'{section}_{i}'))
+            except (TypeError, ValueError):
+                continue
+            rows.append({'visit_id': visit_id, 'section': section, 'criterion_index': i, 'score': score})
+    return rows
+
+def save_visit_scores(rows):
+    """Bulk-insert VisitScore rows in the current transaction"""
+    if rows:
+        db.session.execute(db.insert(VisitScore), rows)
+
+ROLLUP_DIMENSIONS = ('teacher', 'supervisor', 'school', 'month')
+
+class ScoreRollup(db.Model):
+    """Running score totals per teacher, supervisor, school and month, maintained incrementally"""
+    id = db.Column(db.Integer, primary_key=True)
+    dimension = db.Column(db.String(20), nullable=False)
+    dimension_key = db.Column(db.String(100), nullable=False)
+    section = db.Column(db.String(20), nullable=False)
+    visit_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    score_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('dimension', 'dimension_key', 'section', name='uq_score_rollup_key'),
+    )
+    
+    @property
+    def average(self):
+        return self.score_sum / self.score_count if self.score_count else None
+
+def upsert_insert(model):
+    """INSERT construct supporting on_conflict_do_update() for the active database"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+def month_key(column):
+    """SQL expression formatting a datetime column as 'YYYY-MM'"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return db.func.to_char(column, 'YYYY-MM')
+    return db.func.strftime('%Y-%m', column)
+
+def add_to_score_rollups(rows):
+    """Add rows of (dimension, dimension_key, section, visit_count, score_sum, score_count) to the rollup"""
+    if not rows:
+        return
+    stmt = upsert_insert(ScoreRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['dimension', 'dimension_key', 'section'],
+        set_={
+            'visit_count': ScoreRollup.visit_count + stmt.excluded.visit_count,
+            'score_sum': ScoreRollup.score_sum + stmt.excluded.score_sum,
+            'score_count': ScoreRollup.score_count + stmt.excluded.score_count
+        }
+    )
+    db.session.execute(stmt, [
+        dict(zip(('dimension', 'dimension_key', 'section', 'visit_count', 'score_sum', 'score_count'), row))
+        for row in rows
+    ])
+
+def rollup_visits(visits):
+    """Fold newly inserted visits into the rollup, in the caller's transaction.
+    
+    `visits` holds (visit_row, score_rows) pairs, visit_row mapping teacher_id,
+    supervisor_id, school_name and visit_date. Totals are summed per rollup key
+    first, so each key is upserted once however many visits share it.
+    """
+    totals = {}
+    for visit, score_rows in visits:
+        sections = {}
+        for row in score_rows:
+            score_sum, score_count = sections.get(row['section'], (0, 0))
+            sections[row['section']] = (score_sum + row['score'], score_count + 1)
+        
+        keys = {
+            'teacher': str(visit['teacher_id']),
+            'supervisor': str(visit['supervisor_id']),
+            'school': visit['school_name'],
+            'month': visit['visit_date'].strftime('%Y-%m')
+        }
+        for dimension, key in keys.items():
+            for section, (score_sum, score_count) in sections.items():
+                visit_count, total_sum, total_count = totals.get((dimension, key, section), (0, 0, 0))
+                totals[(dimension, key, section)] = (visit_count + 1, total_sum + score_sum, total_count + score_count)
+    
+    add_to_score_rollups([key + total for key, total in totals.items()])
+
+def rollup_visit_scores(visit, score_rows):
+    """Fold a newly inserted visit's scores into the rollup, in the caller's transaction"""
+    rollup_visits([({
+        'teacher_id': visit.teacher_id,
+        'supervisor_id': visit.supervisor_id,
+        'school_name': visit.school_name,
+        'visit_date': visit.visit_date
+    }, score_rows)])
+
+def insert_visits(visits):
+    """Bulk-insert new visits with their scores and rollup, in the caller's transaction.
+    
+    `visits` holds (visit_row, section_scores) pairs: visit_row maps Visit columns
+    to values, the same keys for every visit, including client_uuid;
+    section_scores is shaped as for visit_score_rows(). Returns {client_uuid: id}.
+    """
+    if not visits:
+        return {}
+    result = db.session.execute(
+        db.insert(Visit).returning(Visit.client_uuid, Visit.id),
+        [visit_row for visit_row, _ in visits]
+    )
+    ids = dict(result.all())
+    
+    score_rows = []
+    rollup = []
+    for visit_row, section_scores in visits:
+        rows = visit_score_rows(ids[visit_row['client_uuid']], section_scores)
+        score_rows.extend(rows)
+        rollup.append((visit_row, rows))
+    save_visit_scores(score_rows)
+    rollup_visits(rollup)
+    return ids
+
+def rebuild_score_rollups(batch_size=5000, progress=None):
+    """Recompute the rollup from visit_score in visit-id chunks, committing per chunk.
+    
+    Visits inserted while the rebuild runs get ids above the starting maximum
+    and are counted by the normal incremental path, never twice.
+    """
+    ScoreRollup.query.delete()
+    max_id = db.session.query(db.func.max(Visit.id)).scalar() or 0
+    db.session.commit()
+    
+    dimension_columns = {
+        'teacher': db.cast(Visit.teacher_id, db.String),
+        'supervisor': db.cast(Visit.supervisor_id, db.String),
+        'school': Visit.school_name,
+        'month': month_key(Visit.visit_date)
+    }
+    for start in range(0, max_id, batch_size):
+        end = min(start + batch_size, max_id)
+        rows = []
+        for dimension, key_column in dimension_columns.items():
+            result = db.session.query(
+                key_column,
+                VisitScore.section,
+                db.func.count(db.distinct(Visit.id)),
+                db.func.sum(VisitScore.score),
+                db.func.count(VisitScore.score)
+            ).join(VisitScore, VisitScore.visit_id == Visit.id).filter(
+                Visit.id > start, Visit.id <= end
+            ).group_by(key_column, VisitScore.section)
+            rows.extend((dimension,) + tuple(row) for row in result)
+        add_to_score_rollups(rows)
+        db.session.commit()
+        if progress:
+            progress(end, max_id)
+
+def analytics_page(dimension, page=1, page_size=50):
+    """Return (entries, has_next) for one page of a dimension's section averages, from the rollup only.
+    
+    Months come newest first, teachers and supervisors by name, schools alphabetically.
+    """
+    key = ScoreRollup.dimension_key
+    query = db.session.query(key).filter(ScoreRollup.dimension == dimension).group_by(key)
+    named = {'teacher': Teacher, 'supervisor': Supervisor}.get(dimension)
+    if named is not None:
+        name = db.func.max(named.name)
+        query = query.outerjoin(named, db.cast(named.id, db.String) == key).add_columns(name).order_by(name, key)
+    elif dimension == 'month':
+        query = query.order_by(key.desc())
+    else:
+        query = query.order_by(key)
+    # Fetch one extra key to know whether another page exists
+    rows = query.limit(page_size + 1).offset((page - 1) * page_size).all()
+    
+    entries = {row[0]: {
+        'key': row[0],
+        'name': (row[1] if named is not None else None) or row[0],
+        'visit_count': 0,
+        'sections': {}
+    } for row in rows[:page_size]}
+    for rollup in ScoreRollup.query.filter(ScoreRollup.dimension == dimension, key.in_(list(entries))):
+        entry = entries[rollup.dimension_key]
+        entry['visit_count'] = max(entry['visit_count'], rollup.visit_count)
+        entry['sections'][rollup.section] = round(rollup.average, 2) if rollup.average is not None else None
+    return list(entries.values()), len(rows) > page_size
+
+def load_analytics(dimensions=ROLLUP_DIMENSIONS, page=1, page_size=50):
+    """One page of each dimension: {dimension: {'entries', 'page', 'next_page'}}"""
+    analytics = {}
+    for dimension in dimensions:
+        entries, has_next = analytics_page(dimension, page, page_size)
+        analytics[dimension] = {'entries': entries, 'page': page, 'next_page': page + 1 if has_next else None}
+    return analytics
+
+class TeacherSummary(db.Model):
+    """A teacher's recent per-visit section averages and recommendations behind /teacher/<id>.
+    
+    Updated as visits are added (see teacher_history.py), so the profile page
+    reads one row however many visits the teacher has.
+    """
+    __tablename__ = 'teacher_summary'
+    teacher_id = db.Column(db.Integer, db.ForeignKey('teacher.id'), primary_key=True)
+    visit_count = db.Column(db.Integer, nullable=False, default=0)
+    last_visit_date = db.Column(db.DateTime)
+    # JSON lists, oldest first: [{'id', 'date', 'sections': {section: average}}] and [{'id', 'date', 'text'}]
+    history = db.Column(db.Text, nullable=False, default='[]')
+    recommendations = db.Column(db.Text, nullable=False, default='[]')
+    
+    teacher = db.relationship('Teacher', backref=db.backref('summary', uselist=False, cascade='all, delete-orphan'))
+
+class VisitSearch(db.Model):
+    """Normalized search text of a visit (see search.py), indexed for full-text search.
+    
+    SQLite searches it through the visit_search_fts FTS5 table, which triggers
+    keep in step with this one; PostgreSQL through a GIN tsvector index.
+    """
+    __tablename__ = 'visit_search'
+    visit_id = db.Column(db.Integer, db.ForeignKey('visit.id'), primary_key=True)
+    document = db.Column(db.Text, nullable=False)
+    
+    visit = db.relationship('Visit', backref=db.backref('search_document', uselist=False, cascade='all, delete-orphan'))
+
+# Kept in step with migrations/versions/0008_visit_search.py
+VISIT_SEARCH_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE visit_search_fts USING fts5("
+    "document, content='visit_search', content_rowid='visit_id', tokenize='unicode61')",
+    "CREATE TRIGGER visit_search_ai AFTER INSERT ON visit_search BEGIN "
+    "INSERT INTO visit_search_fts(rowid, document) VALUES (new.visit_id, new.document); END",
+    "CREATE TRIGGER visit_search_ad AFTER DELETE ON visit_search BEGIN "
+    "INSERT INTO visit_search_fts(visit_search_fts, rowid, document) VALUES ('delete', old.visit_id, old.document); END",
+    "CREATE TRIGGER visit_search_au AFTER UPDATE ON visit_search BEGIN "
+    "INSERT INTO visit_search_fts(visit_search_fts, rowid, document) VALUES ('delete', old.visit_id, old.document); "
+    "INSERT INTO visit_search_fts(rowid, document) VALUES (new.visit_id, new.document); END",
+)
+VISIT_SEARCH_POSTGRES_DDL = (
+    "CREATE INDEX ix_visit_search_document_tsv ON visit_search USING gin (to_tsvector('simple', document))",
+)
+
+for statement in VISIT_SEARCH_SQLITE_DDL:
+    event.listen(VisitSearch.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+for statement in VISIT_SEARCH_POSTGRES_DDL:
+    event.listen(VisitSearch.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+event.listen(VisitSearch.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS visit_search_fts').execute_if(dialect='sqlite'))
+
+EMAIL_JOB_STATUSES = {
+    'pending': 'في قائمة الانتظار',
+    'sending': 'جارٍ الإرسال',
+    'sent': 'تم الإرسال',
+    'dead': 'فشل الإرسال'
+}
+
+class EmailJob(db.Model):
+    """Queued delivery of a visit report email, processed by worker.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    visit_id = db.Column(db.Integer, db.ForeignKey('visit.id'), nullable=False, index=True)
+    recipient = db.Column(db.String(120), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    visit = db.relationship('Visit', backref=db.backref('email_jobs', lazy='dynamic'))
+    
+    __table_args__ = (
+        db.Index('ix_email_job_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    @property
+    def status_label(self):
+        return EMAIL_JOB_STATUSES.get(self.status, self.status)
+
+def enqueue_visit_email(visit):
+    """Queue the report email for a visit, reusing an outstanding job if there is one.
+    
+    The job is added to the session; the caller is responsible for committing.
+    """
+    job = visit.email_jobs.filter(EmailJob.status.in_(('pending', 'sending'))).first()
+    if job:
+        return job
+    
+    job = EmailJob(
+        visit=visit,
+        recipient=visit.teacher.email,
+        max_attempts=current_app.config['EMAIL_JOB_MAX_ATTEMPTS']
+    )
+    db.session.add(job)
+    return job
+
+# Visit listing helpers
+VISIT_FILTER_FIELDS = ('school', 'supervisor_id', 'subject', 'status', 'date_from', 'date_to')
+
+def parse_visit_filters(args):
+    """Extract the visit list filters from request args, dropping invalid values"""
+    filters = {}
+    for field in ('school', 'subject', 'status'):
+        value = (args.get(field) or '').strip()
+        if value:
+            filters[field] = value
+    
+    supervisor_id = args.get('supervisor_id', type=int)
+    if supervisor_id:
+        filters['supervisor_id'] = supervisor_id
+    
+    for field in ('date_from', 'date_to'):
+        value = args.get(field)
+        if value:
+            try:
+                filters[field] = datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                continue
+    return filters
+
+def filtered_visits_query(filters):
+    """Build a Visit query restricted by the filters from parse_visit_filters()"""
+    query = Visit.query
+    if 'school' in filters:
+        query = query.filter(Visit.school_name == filters['school'])
+    if 'supervisor_id' in filters:
+        query = query.filter(Visit.supervisor_id == filters['supervisor_id'])
+    if 'subject' in filters:
+        query = query.filter(Visit.subject == filters['subject'])
+    if 'status' in filters:
+        query = query.filter(Visit.status == filters['status'])
+    if 'date_from' in filters:
+        query = query.filter(Visit.visit_date >= filters['date_from'])
+    if 'date_to' in filters:
+        # Inclusive upper bound: everything before the start of the next day
+        query = query.filter(Visit.visit_date < filters['date_to'] + timedelta(days=1))
+    return query
+
+def encode_visit_cursor(visit):
+    """Encode the (visit_date, id) keyset position of a visit as an opaque string.
+    
+    The date keeps its microseconds: a truncated one would skip visits of the
+    same second with a smaller id.
+    """
+    return f"{visit.visit_date.strftime('%Y%m%d%H%M%S%f')}-{visit.id}"
+
+def decode_visit_cursor(cursor):
+    """Decode a cursor from encode_visit_cursor(), returning None if malformed"""
+    if not cursor:
+        return None
+    try:
+        date_part, id_part = cursor.split('-', 1)
+        return datetime.strptime(date_part, '%Y%m%d%H%M%S%f'), int(id_part)
+    except ValueError:
+        return None
+
+def pending_report_visits_query(filters):
+    """Visits matching the filters whose report was neither emailed nor queued yet"""
+    handled = db.session.query(EmailJob.id).filter(
+        EmailJob.visit_id == Visit.id,
+        EmailJob.status.in_(('pending', 'sending', 'sent'))
+    ).exists()
+    return filtered_visits_query(filters).filter(~handled)
+
+def enqueue_pending_reports(filters):
+    """Queue report emails for every pending visit matching the filters.
+    
+    The jobs are bulk-inserted and the worker then pushes the whole batch
+    through one pooled SMTP session. Returns the number of visits queued.
+    """
+    rows = pending_report_visits_query(filters).join(Visit.teacher).with_entities(Visit.id, Teacher.email).all()
+    if rows:
+        max_attempts = current_app.config['EMAIL_JOB_MAX_ATTEMPTS']
+        db.session.execute(db.insert(EmailJob), [
+            {'visit_id': visit_id, 'recipient': email, 'max_attempts': max_attempts}
+            for visit_id, email in rows
+        ])
+    db.session.commit()
+    return len(rows)
+
+def visit_page(filters, cursor, page_size):
+    """Return (visits, next_cursor) for one page of the visit list, newest first"""
+    query = filtered_visits_query(filters).options(
+        joinedload(Visit.teacher),
+        joinedload(Visit.supervisor)
+    )
+    
+    # Keyset pagination: continue strictly after the last (visit_date, id) seen.
+    # The redundant visit_date <= bound lets the database seek the index instead of
+    # walking it from the newest visit.
+    if cursor:
+        cursor_date, cursor_id = cursor
+        query = query.filter(Visit.visit_date <= cursor_date, or_(
+            Visit.visit_date < cursor_date,
+            and_(Visit.visit_date == cursor_date, Visit.id < cursor_id)
+        ))
+    
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(Visit.visit_date.desc(), Visit.id.desc()).limit(page_size + 1).all()
+    visits = rows[:page_size]
+    next_cursor = encode_visit_cursor(visits[-1]) if len(rows) > page_size else None
+    return visits, next_cursor
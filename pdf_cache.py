@@ -0,0 +1,128 @@
+"""
+On-disk cache for generated visit report PDFs.
+
+Entries are stored as ``<visit_id>-<digest>.pdf`` where the digest is a hash of
+every field that ends up in the document, so a stale entry can never be served:
+editing the visit, its teacher or its supervisor changes the digest. Files are
+evicted least-recently-used first once the directory grows past ``max_bytes``.
+
+The directory is scanned once, when the cache is created (ordered by mtime,
+which hits refresh). After that the cache keeps its own index of file sizes in
+LRU order and of the files of each visit, so put() and invalidate() only touch
+the files they add or delete. Each process tracks and evicts the files it knows
+of: those it found at startup, wrote, or served.
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class PDFCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # file name -> size, least recently used first
+        self._entries = OrderedDict()
+        # visit id -> names of its cached files
+        self._visit_files = {}
+        self._total = 0
+        self._scan()
+    
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+    
+    def _scan(self):
+        found = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.pdf'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(found):
+            self._add(name, size)
+        self._evict()
+    
+    def get(self, visit_id, digest):
+        """Return the cached PDF bytes, or None on a miss"""
+        name = f'{visit_id}-{digest}.pdf'
+        path = self._path(name)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(name)
+            return None
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+            else:
+                # Written by another process
+                self._add(name, len(data))
+        try:
+            # Keeps the LRU order across restarts
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+    
+    def put(self, visit_id, digest, data):
+        """Store a PDF, dropping older versions of the same visit and evicting if over budget"""
+        name = f'{visit_id}-{digest}.pdf'
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # Atomic so concurrent readers never see a partially written file
+        os.replace(tmp_path, self._path(name))
+        with self._lock:
+            for old in self._visit_files.get(str(visit_id), set()) - {name}:
+                self._delete(old)
+            self._forget(name)
+            self._add(name, len(data))
+            self._evict(keep=name)
+    
+    def invalidate(self, visit_ids):
+        """Remove every cached version of the given visits' PDFs"""
+        with self._lock:
+            for visit_id in visit_ids:
+                for name in list(self._visit_files.get(str(visit_id), ())):
+                    self._delete(name)
+    
+    def _add(self, name, size):
+        self._entries[name] = size
+        self._visit_files.setdefault(name.split('-', 1)[0], set()).add(name)
+        self._total += size
+    
+    def _forget(self, name):
+        size = self._entries.pop(name, None)
+        if size is None:
+            return
+        self._total -= size
+        visit_id = name.split('-', 1)[0]
+        names = self._visit_files[visit_id]
+        names.discard(name)
+        if not names:
+            del self._visit_files[visit_id]
+    
+    def _delete(self, name):
+        self._forget(name)
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+    
+    def _evict(self, keep=None):
+        while self._total > self.max_bytes and self._entries:
+            name = next(iter(self._entries))
+            if name == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(name)
+                continue
+            self._delete(name)
@@ -0,0 +1,237 @@
+"""
+Visit report PDF rendering.
+
+Kept free of Flask and database imports: it works on the plain dict built by
+reports.visit_pdf_fields(), so bulk exports can render in worker processes.
+
+Everything that does not depend on the visit is set up once per process: the
+Arabic TrueType font is registered on first use (ReportLab embeds only the
+glyphs a document uses), paragraph and table styles are built once, and the
+shaped form of each label is memoized, so a document only pays for its own
+text. The font comes from PDF_FONT_PATH (and PDF_FONT_BOLD_PATH), or else the
+first of FONT_CANDIDATES found, the DejaVu Sans copy shipped in fonts/ coming
+first; without one, Helvetica cannot draw Arabic and a warning is logged.
+create_app() refuses to start when PDF_FONT_PATH names a missing file.
+"""
+import logging
+import os
+import threading
+from functools import lru_cache
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+from arabic import shape_arabic, visual_line, visual_word
+
+# Bump when the layout of render_visit_pdf() changes so cached documents are rebuilt
+PDF_RENDER_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
+
+# (regular, bold) TrueType fonts with Arabic glyphs, in order of preference
+FONT_CANDIDATES = (
+    (os.path.join(FONT_DIR, 'DejaVuSans.ttf'), os.path.join(FONT_DIR, 'DejaVuSans-Bold.ttf')),
+    ('/usr/share/fonts/truetype/noto/NotoNaskhArabic-Regular.ttf', '/usr/share/fonts/truetype/noto/NotoNaskhArabic-Bold.ttf'),
+    ('/usr/share/fonts/truetype/noto/NotoSansArabic-Regular.ttf', '/usr/share/fonts/truetype/noto/NotoSansArabic-Bold.ttf'),
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
+    ('/usr/share/fonts/dejavu/DejaVuSans.ttf', '/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf'),
+    ('C:/Windows/Fonts/arial.ttf', 'C:/Windows/Fonts/arialbd.ttf'),
+)
+
+# Criteria of each score section as worded on the visit form: (text, weight)
+SCORE_CRITERIA = {
+    'management': (
+        ('يتم تحديد التوقعات السلوكية والروتين باتساق كما يتم تعزيز أخلاقيات المدرسة/آدابها وتعزيز الاحترام المتبادل بين الطلاب.', 2.0),
+        ('يتم تطبيق تحمل تبعات العواقب بشكل عادل ومتسق', 1.0),
+        ('وجود علاقة إيجابية مع الطلاب وتعزيز الاحترام المتبادل والتعاون.', 2.0),
+        ('التأكد من تركيز الطلاب على إنجاز المهام والأنشطة بفاعلية.', 2.0),
+        ('الإدارة الفاعلة للوقت كمكون أساس لتنفيذ خطة الدرس.', 1.0),
+    ),
+    'teaching': (
+        ('ظهور إتقان وإلمام المعلم بالموضوع بوضوح من خلال الشرح الدقيق للمادة التعليمية والمناقشات المتعمقة وتصحيح المفاهيم الخاطئة لدى الطلاب.', 1.5),
+        ('بث روح الشغف والحماس أثناء الحصة، بحيث يكون المعلم محفزاً وملهماً للطلاب.', 1.0),
+        ('وضوح اللغة من حيث فصاحتها ومعدل سرعتها وتغيير نبراتها بحسب الموقف التعليمي.', 1.5),
+        ('التسلسل المنطقي ، والمشاركة ، والإلهام ، والتحفيز ، والحماس ، واستخدام النماذج والقواعد لتحديد توقعات التعلم.', 1.0),
+        ('استخدام تقنيات/استراتيجيات التدريس المناسبة/الفعالة وتغييرها عند الضرورة (طرح الأسئلة/المناقشة/المهام العملية وما إلى ذلك) ابتكار تقنيات جديدة.', 1.5),
+        ('يستخدم استراتيجيات مختلفة لتطبيق التمايز في التعلم (حسب مخرجات تعلم كل طالب والدعم المقدم له) لضمان مشاركة جميع المتعلمين في التعلم وفقًا لاحتياجاتهم.', 1.0),
+        ('التركيز على ربط المحتوى بالحياة الواقعية وبالمواد الأخرى.', 0.5),
+        ('دعم عمليتي التعليم والتعلم بتوظيف التكنولوجيا والموارد المناسبة', 1.0),
+        ('خلق بيئة تعليمية محفزة ومفضية لأنشطة تركز على الطالب وتمنحه فرصاً للاختيار والتعاون والابتكار والتعبير عن الآراء ومشاركتها مع الآخرين', 1.0),
+        ('يدمج المهام الصعبة التي تتطلب تفكيرًا عالي المستوى أو مهارات عملية تنمي عقلية الطالب وكفاءته الذاتية', 1.0),
+    ),
+    'feedback': (
+        ('الاستخدام الفعال لأدوات التقويم التكويني المناسبة (لضبط التعليم). التأكد من أن جميع المتعلمين ينتجون أدلة على التعلم', 2.0),
+        ('الاستخدام الفعال للنماذج / القواعد.', 0.5),
+        ('توفير ملاحظات بناءة ومشجعة (مكتوبة أو شفهية أو بوسائل أخرى)', 1.0),
+        ('الاهتمام بالطلاب والترحيب باستفساراتهم وم مشاركاتهم، دون خوف من ردود الفعل السلبية، وإظهار التعاطف تجاه جميع الطلاب', 1.5),
+        ('توفير الدعم للأفراد والمجموعات و/أو الفصل بأكمله وفقًا لاحتياجات الطلاب مع الحفاظ على كرامة المتعلمين', 1.0),
+    ),
+}
+MAX_SCORE = 4
+
+PAGE_WIDTH = A4[0] - 3 * cm
+INFO_COLUMNS = (PAGE_WIDTH - 4 * cm, 4 * cm)
+SCORE_COLUMNS = (1.6 * cm, 1.4 * cm, PAGE_WIDTH - 4 * cm, 1 * cm)
+
+_font_lock = threading.Lock()
+
+
+class RTLParagraph(Paragraph):
+    """A paragraph of visual_word()-ordered words that ReportLab wraps as usual; each line's
+    words are put in right-to-left order only when drawn, so wrapping and splitting see the
+    text in reading order"""
+
+    def drawPara(self, debug=0):
+        blPara = self.blPara
+        if blPara.kind != 0:
+            return super().drawPara(debug)
+        lines = blPara.lines
+        blPara.lines = [(extra, visual_line(words)) for extra, words in lines]
+        try:
+            return super().drawPara(debug)
+        finally:
+            blPara.lines = lines
+
+
+def _font_files():
+    regular = os.environ.get('PDF_FONT_PATH')
+    if regular:
+        return regular, os.environ.get('PDF_FONT_BOLD_PATH') or regular
+    for regular, bold in FONT_CANDIDATES:
+        if os.path.exists(regular):
+            return regular, bold if os.path.exists(bold) else regular
+    return None, None
+
+
+@lru_cache(maxsize=None)
+def _resources():
+    """Fonts, paragraph styles and table styles; built once per process"""
+    with _font_lock:
+        regular, bold = _font_files()
+        if regular:
+            pdfmetrics.registerFont(TTFont('VisitArabic', regular))
+            pdfmetrics.registerFont(TTFont('VisitArabic-Bold', bold))
+            font, bold_font = 'VisitArabic', 'VisitArabic-Bold'
+        else:
+            logger.warning('No Arabic TrueType font found; set PDF_FONT_PATH. Arabic text will not render.')
+            font, bold_font = 'Helvetica', 'Helvetica-Bold'
+
+    body = ParagraphStyle('VisitBody', fontName=font, fontSize=11, leading=17, alignment=TA_RIGHT,
+                          wordWrap='RTL')
+    styles = {
+        'title': ParagraphStyle('VisitTitle', body, fontName=bold_font, fontSize=18, leading=26,
+                                alignment=TA_CENTER, spaceAfter=0.6 * cm),
+        'heading': ParagraphStyle('VisitHeading', body, fontName=bold_font, fontSize=13, leading=20,
+                                  spaceBefore=0.3 * cm, spaceAfter=0.15 * cm),
+        'body': body,
+        'label': ParagraphStyle('VisitLabel', body, fontName=bold_font),
+        'cell': ParagraphStyle('VisitCell', body, fontSize=9, leading=13),
+        'cell_header': ParagraphStyle('VisitCellHeader', body, fontName=bold_font, fontSize=9, leading=13,
+                                      textColor=colors.white, alignment=TA_CENTER),
+        'section': ParagraphStyle('VisitSection', body, fontName=bold_font, fontSize=10, leading=14),
+        'number': ParagraphStyle('VisitNumber', body, fontSize=9, leading=13, alignment=TA_CENTER),
+    }
+    info_table = TableStyle([
+        ('BACKGROUND', (1, 0), (1, -1), colors.HexColor('#e8eef5')),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#9aa5b1')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ])
+    score_table = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#9aa5b1')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ])
+    return styles, info_table, score_table
+
+
+@lru_cache(maxsize=4096)
+def _display(text):
+    # Labels, criteria and names repeat across documents: shape each distinct text once
+    return ' '.join(escape(visual_word(word)) for word in shape_arabic(text).split())
+
+
+def _paragraph(text, style):
+    return RTLParagraph(_display(str(text)) if text not in (None, '') else '', style)
+
+
+def _score_rows(section, styles):
+    """Title, criteria and subtotal rows of one score section"""
+    label, scores = section['label'], section['scores']
+    rows = [[_paragraph(label, styles['section']), '', '', '']]
+    for number, ((criterion, weight), score) in enumerate(zip(SCORE_CRITERIA[section['section']], scores), 1):
+        rows.append([
+            _paragraph('-' if score is None else score, styles['number']),
+            _paragraph(weight, styles['number']),
+            _paragraph(criterion, styles['cell']),
+            _paragraph(number, styles['number']),
+        ])
+    rated = [score for score in scores if score is not None]
+    rows.append([
+        _paragraph(f'{sum(rated)}/{len(scores) * MAX_SCORE}', styles['number']),
+        '',
+        _paragraph('المجموع', styles['label']),
+        '',
+    ])
+    return rows
+
+
+def render_visit_pdf(fields):
+    """Render the visit report PDF from the values collected by visit_pdf_fields()"""
+    styles, info_table_style, score_table_style = _resources()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=1.5 * cm, leftMargin=1.5 * cm,
+                            topMargin=1.5 * cm, bottomMargin=1.5 * cm,
+                            title=f"Visit report {fields['id']}")
+    elements = [_paragraph('تقرير زيارة مدرسية', styles['title'])]
+
+    # Visit information; tables are laid out left to right, so labels go in the last column
+    info = [
+        ('المدرسة', fields['school_name']),
+        ('التاريخ', fields['visit_date']),
+        ('المعلم', fields['teacher_name']),
+        ('المشرف', fields['supervisor_name']),
+        ('المادة', fields['subject']),
+        ('الصف', fields['grade']),
+        ('عنوان الدرس', fields['lesson_title']),
+        ('حالة الزيارة', fields['status']),
+    ]
+    info_table = Table([[_paragraph(value, styles['body']), _paragraph(label, styles['label'])]
+                        for label, value in info], colWidths=INFO_COLUMNS)
+    info_table.setStyle(info_table_style)
+    elements += [info_table, Spacer(1, 0.5 * cm)]
+
+    # The 20 criterion scores, section by section
+    elements.append(_paragraph('نتائج التقييم', styles['heading']))
+    rows = [[_paragraph(header, styles['cell_header']) for header in ('الدرجة', 'الوزن', 'المعيار', 'م')]]
+    section_style = []
+    for section in fields['scores']:
+        section_style += [('SPAN', (0, len(rows)), (-1, len(rows))),
+                          ('BACKGROUND', (0, len(rows)), (-1, len(rows)), colors.HexColor('#e8eef5'))]
+        rows += _score_rows(section, styles)
+        section_style.append(('SPAN', (1, len(rows) - 1), (-1, len(rows) - 1)))
+    score_table = Table(rows, colWidths=SCORE_COLUMNS, repeatRows=1)
+    score_table.setStyle(score_table_style)
+    score_table.setStyle(TableStyle(section_style))
+    elements += [score_table, Spacer(1, 0.5 * cm)]
+
+    for title, key in (('التغذية الراجعة', 'feedback_1'),
+                       ('التغذية الراجعة الإضافية', 'feedback_2'),
+                       ('التوصيات والمقترحات', 'suggestions')):
+        if fields[key]:
+            elements += [_paragraph(title, styles['heading']), _paragraph(fields[key], styles['body'])]
+
+    elements += [Spacer(1, 1 * cm), _paragraph(f"التوقيع: {fields['supervisor_signature'] or ''}", styles['label'])]
+
+    doc.build(elements)
+    buffer.seek(0)
+    return buffer
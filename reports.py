@@ -0,0 +1,251 @@
+"""
+Visit report delivery: the PDF (rendered through a disk cache) and the email
+carrying it, and the bulk exports (a ZIP of PDFs, a CSV/XLSX spreadsheet).
+
+ReportLab, smtplib and the MIME classes are imported on first use, so web
+workers and processes that never render or send a report do not pay for them
+at startup.
+"""
+import hashlib
+import json
+import os
+from io import BytesIO
+
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import joinedload
+
+from instrumentation import timed
+from models import (db, Visit, Teacher, Supervisor, filtered_visits_query, SCORE_SECTIONS,
+                    SCORE_SECTION_LABELS)
+from pdf_cache import PDFCache
+
+# Email sending function
+def build_visit_report_message(teacher_email, teacher_name, visit_date, supervisor_name, visit_id):
+    """
+    Build the visit report email for a teacher, with the PDF attached
+    """
+    from email.mime.application import MIMEApplication
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    
+    email_user = os.environ.get('EMAIL_USER', '')
+    if not email_user:
+        raise RuntimeError('Email credentials are not configured')
+        
+    # Create message
+    msg = MIMEMultipart()
+    msg['From'] = email_user
+    msg['To'] = teacher_email
+    msg['Subject'] = f"تقرير زيارة صفية - {teacher_name} - {visit_date}"
+    
+    # Email content
+    body = f"""
+    السلام عليكم ورحمة الله وبركاته
+    
+    سيادة المعلم/ة {teacher_name}
+    
+    تمت زيارة صفكم بتاريخ {visit_date} من قبل المشرف/ة {supervisor_name}.
+    يرجى الاطلاع على التقرير الكامل المرفق.
+    
+    مع خالص التقدير،
+    إدارة النظام
+    """
+    
+    msg.attach(MIMEText(body, 'plain', 'utf-8'))
+    
+    # Generate PDF and attach it
+    visit = db.session.get(Visit, visit_id)
+    if visit:
+        pdf_buffer = generate_pdf_buffer(visit)
+        attachment = MIMEApplication(pdf_buffer.getvalue(), _subtype="pdf")
+        attachment.add_header('Content-Disposition', 'attachment', filename=f"تقرير_زيارة_{visit_id}.pdf")
+        msg.attach(attachment)
+    return msg
+
+def deliver_visit_report_email(teacher_email, teacher_name, visit_date, supervisor_name, visit_id):
+    """
+    Send visit report email to teacher with PDF attachment, raising on failure.
+    Messages go through the shared SMTP session from mailer.get_mailer().
+    """
+    from mailer import get_mailer
+    
+    msg = build_visit_report_message(teacher_email, teacher_name, visit_date, supervisor_name, visit_id)
+    get_mailer().send_message(msg)
+
+def send_visit_report_email(teacher_email, teacher_name, visit_date, supervisor_name, visit_id):
+    """
+    Send visit report email to teacher with PDF attachment
+    """
+    try:
+        deliver_visit_report_email(teacher_email, teacher_name, visit_date, supervisor_name, visit_id)
+        return True
+    except Exception as e:
+        print(f"Error sending email: {e}")
+        return False
+
+# PDF generation
+_pdf_cache = None
+
+def get_pdf_cache():
+    """Return the process-wide PDF cache, or None when it is disabled"""
+    global _pdf_cache
+    if _pdf_cache is None and current_app.config['PDF_CACHE_MAX_BYTES'] > 0:
+        _pdf_cache = PDFCache(current_app.config['PDF_CACHE_DIR'], current_app.config['PDF_CACHE_MAX_BYTES'])
+    return _pdf_cache
+
+def visit_pdf_fields(visit):
+    """Collect every value rendered into a visit's PDF"""
+    return {
+        'id': visit.id,
+        'school_name': visit.school_name,
+        'visit_date': visit.visit_date.strftime('%Y-%m-%d'),
+        'teacher_name': visit.teacher.name,
+        'supervisor_name': visit.supervisor.name,
+        'subject': visit.subject,
+        'grade': visit.grade,
+        'lesson_title': visit.lesson_title,
+        'status': visit.status,
+        'feedback_1': visit.feedback_1,
+        'feedback_2': visit.feedback_2,
+        'suggestions': visit.suggestions,
+        'supervisor_signature': visit.supervisor_signature,
+        'scores': [{
+            'section': section,
+            'label': SCORE_SECTION_LABELS[section],
+            'scores': _criterion_scores(getattr(visit, f'{section}_scores'), section, count)
+        } for section, count in SCORE_SECTIONS.items()]
+    }
+
+def visit_pdf_digest(fields):
+    """Content hash of a visit's PDF, used as cache key and ETag"""
+    from pdf_reports import PDF_RENDER_VERSION
+    
+    payload = json.dumps([PDF_RENDER_VERSION, fields], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def get_visit_pdf(visit):
+    """Return (pdf_bytes, digest) for a visit, rendering only on a cache miss"""
+    fields = visit_pdf_fields(visit)
+    digest = visit_pdf_digest(fields)
+    cache = get_pdf_cache()
+    
+    data = cache.get(visit.id, digest) if cache else None
+    if data is None:
+        from pdf_reports import render_visit_pdf
+        with timed('pdf'):
+            data = render_visit_pdf(fields).getvalue()
+        if cache:
+            cache.put(visit.id, digest, data)
+    return data, digest
+
+def generate_pdf_buffer(visit):
+    """Generate PDF buffer for email attachment"""
+    return BytesIO(get_visit_pdf(visit)[0])
+
+def iter_visit_pdf_fields(filters, batch_size=200):
+    """Yield (fields, digest) for every visit matching the filters, oldest first"""
+    query = filtered_visits_query(filters).options(
+        joinedload(Visit.teacher),
+        joinedload(Visit.supervisor)
+    ).order_by(Visit.visit_date, Visit.id)
+    for visit in query.yield_per(batch_size):
+        fields = visit_pdf_fields(visit)
+        yield fields, visit_pdf_digest(fields)
+
+def export_visit_reports_zip(filters, total, max_workers=None, progress=None):
+    """Stream the PDFs of every visit matching the filters as ZIP archive chunks"""
+    from bulk_export import export_visit_pdfs
+    
+    return export_visit_pdfs(
+        iter_visit_pdf_fields(filters),
+        total=total,
+        cache=get_pdf_cache(),
+        max_workers=max_workers or current_app.config['EXPORT_MAX_WORKERS'],
+        progress=progress
+    )
+
+# Spreadsheet columns: (header, key) for the visit details, then one column per criterion
+VISIT_EXPORT_COLUMNS = (
+    ('رقم الزيارة', 'id'),
+    ('التاريخ', 'visit_date'),
+    ('المدرسة', 'school_name'),
+    ('المعلم', 'teacher_name'),
+    ('المشرف التربوي', 'supervisor_name'),
+    ('المادة', 'subject'),
+    ('الفصل', 'grade'),
+    ('عنوان الدرس', 'lesson_title'),
+    ('حالة الزيارة', 'status'),
+    ('التغذية الراجعة (1)', 'feedback_1'),
+    ('التغذية الراجعة (2)', 'feedback_2'),
+    ('التوصيات والمقترحات', 'suggestions'),
+    ('موعد المتابعة', 'follow_up_date'),
+) + tuple(
+    (f'{SCORE_SECTION_LABELS[section]} {i}', f'{section}_{i}')
+    for section, count in SCORE_SECTIONS.items() for i in range(1, count + 1)
+)
+
+def _criterion_scores(raw, section, count):
+    scores = json.loads(raw) if raw else {}
+    row = []
+    for i in range(1, count + 1):
+        try:
+            row.append(int(scores.get(f'{section}_{i}')))
+        except (TypeError, ValueError):
+            row.append(None)
+    return row
+
+def iter_visit_export_rows(filters, batch_size=1000):
+    """Yield one row per visit matching the filters, oldest first, in VISIT_EXPORT_COLUMNS order.
+    
+    Only the exported columns are selected, fetched `batch_size` rows at a time
+    (a server-side cursor on PostgreSQL), so memory does not grow with the export.
+    """
+    query = filtered_visits_query(filters).join(Teacher).join(Supervisor).with_entities(
+        Visit.id, Visit.visit_date, Visit.school_name, Teacher.name, Supervisor.name, Visit.subject,
+        Visit.grade, Visit.lesson_title, Visit.status, Visit.feedback_1, Visit.feedback_2,
+        Visit.suggestions, Visit.follow_up_date,
+        Visit.management_scores, Visit.teaching_scores, Visit.feedback_scores
+    ).order_by(Visit.visit_date, Visit.id)
+    
+    for visit in query.yield_per(batch_size):
+        row = list(visit[:13])
+        row[1] = visit.visit_date.strftime('%Y-%m-%d')
+        row[12] = visit.follow_up_date.strftime('%Y-%m-%d') if visit.follow_up_date else None
+        for section, count in SCORE_SECTIONS.items():
+            row.extend(_criterion_scores(getattr(visit, f'{section}_scores'), section, count))
+        yield row
+
+def export_visits_spreadsheet(filters, file_format):
+    """Stream every visit matching the filters with its criterion scores as 'csv' or 'xlsx' chunks"""
+    from spreadsheets import stream_csv, stream_xlsx
+    
+    header = [label for label, key in VISIT_EXPORT_COLUMNS]
+    rows = iter_visit_export_rows(filters, current_app.config['EXPORT_BATCH_SIZE'])
+    if file_format == 'xlsx':
+        return stream_xlsx(header, rows, sheet_name='الزيارات', right_to_left=True)
+    return stream_csv(header, rows)
+
+def _invalidate_cached_pdfs(visit_ids):
+    cache = get_pdf_cache()
+    if cache:
+        cache.invalidate(visit_ids)
+
+# Drop cached PDFs eagerly when anything they render is edited or deleted.
+# The content digest already prevents stale hits; this just frees the disk.
+@event.listens_for(Visit, 'after_update')
+@event.listens_for(Visit, 'after_delete')
+def _visit_changed(mapper, connection, target):
+    _invalidate_cached_pdfs([target.id])
+
+@event.listens_for(Teacher, 'after_update')
+def _teacher_changed(mapper, connection, target):
+    _invalidate_cached_pdfs(connection.execute(
+        select(Visit.id).where(Visit.teacher_id == target.id)
+    ).scalars())
+
+@event.listens_for(Supervisor, 'after_update')
+def _supervisor_changed(mapper, connection, target):
+    _invalidate_cached_pdfs(connection.execute(
+        select(Visit.id).where(Visit.supervisor_id == target.id)
+    ).scalars())
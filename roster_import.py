@@ -0,0 +1,86 @@
+"""
+Bulk import of teachers and supervisors from CSV.
+
+The file is read one row at a time and validated against TEACHER_SCHEMA or
+SUPERVISOR_SCHEMA. Valid rows are upserted on the unique email column in
+batches, one transaction per batch, so 50k rows cost 50 commits rather than
+50k. An email already in the database updates that record; an email repeated
+in the file is reported on the later line. Invalid rows are skipped and
+reported with their line number without stopping the import.
+"""
+import csv
+
+from sqlalchemy import select
+
+from models import db, Teacher, Supervisor, Visit, upsert_insert
+from schemas import TEACHER_SCHEMA, SUPERVISOR_SCHEMA
+from roster_search import invalidate_roster_index
+from search import index_visits
+
+ROSTERS = {
+    'teachers': (Teacher, TEACHER_SCHEMA),
+    'supervisors': (Supervisor, SUPERVISOR_SCHEMA),
+}
+
+
+def _upsert_batch(kind, model, rows, columns, report):
+    existing = dict(db.session.execute(
+        select(model.email, model.name).where(model.email.in_([row['email'] for row in rows]))
+    ).all())
+    
+    # Only the columns present in the file are overwritten on existing records
+    stmt = upsert_insert(model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['email'],
+        set_={column: stmt.excluded[column] for column in columns if column != 'email'}
+    )
+    db.session.execute(stmt, rows)
+    
+    if model is Teacher:
+        # A bulk upsert bypasses the ORM events that keep visit search documents current
+        renamed = [row['email'] for row in rows if row['email'] in existing and existing[row['email']] != row['name']]
+        if renamed:
+            index_visits(db.session.execute(
+                select(Visit.id).join(Teacher).where(Teacher.email.in_(renamed))
+            ).scalars().all())
+    db.session.commit()
+    # ... and the typeahead index
+    invalidate_roster_index(kind)
+    
+    report['updated'] += len(existing)
+    report['created'] += len(rows) - len(existing)
+
+
+def import_roster(kind, lines, batch_size=1000):
+    """Import teachers or supervisors from CSV text (a file object or any iterable of lines).
+    
+    Returns {'created': n, 'updated': n, 'errors': [{'line', 'email', 'errors'}]}.
+    Raises ValueError when the header lacks a required column.
+    """
+    model, schema = ROSTERS[kind]
+    reader = csv.DictReader(lines)
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+    missing = [name for name in schema.required if name not in reader.fieldnames]
+    if missing:
+        raise ValueError('missing columns: ' + ', '.join(missing))
+    columns = [name for name in schema.names if name in reader.fieldnames]
+    
+    report = {'created': 0, 'updated': 0, 'errors': []}
+    first_line = {}
+    batch = []
+    for record in reader:
+        clean, errors = schema.validate(record)
+        if not errors and clean['email'] in first_line:
+            errors = {'email': f'duplicate of line {first_line[clean["email"]]}'}
+        if errors:
+            report['errors'].append({'line': reader.line_num, 'email': (record.get('email') or '').strip(), 'errors': errors})
+            continue
+        
+        first_line[clean['email']] = reader.line_num
+        batch.append(clean)
+        if len(batch) >= batch_size:
+            _upsert_batch(kind, model, batch, columns, report)
+            batch = []
+    if batch:
+        _upsert_batch(kind, model, batch, columns, report)
+    return report
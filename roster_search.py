@@ -0,0 +1,127 @@
+"""
+Typeahead lookup of teachers and supervisors for the visit form.
+
+Each process keeps an in-memory index per roster, built with one query on
+first use and rebuilt after a teacher or supervisor changes (immediately in
+this process, within ROSTER_INDEX_TTL seconds in the others). A lookup is a
+binary search for the first word typed over the sorted name words, then a
+filter of that narrow range, so it stays fast with tens of thousands of
+teachers and never touches the database.
+"""
+from bisect import bisect_left
+
+from sqlalchemy import event
+
+from arabic import normalize_arabic, search_tokens
+from cache import TTLCache
+from models import db, Teacher, Supervisor
+
+roster_index_cache = TTLCache(ttl=0)
+
+
+class RosterIndex:
+    """Prefix index over the words of people's names and their email address; people are kept sorted by name"""
+
+    def __init__(self, people):
+        # people: dicts with id, name, email, school and subject
+        entries = []
+        for person in people:
+            words = search_tokens(person['name'])
+            entries.append((' '.join(words), person['id'], words, person))
+        entries.sort(key=lambda entry: entry[:2])
+
+        self.people = [entry[3] for entry in entries]
+        self._words = []
+        self._filters = []
+        keys = []
+        # Schools and subjects repeat across the roster: normalize each distinct value once
+        normalized = {}
+        for position, (_, _, words, person) in enumerate(entries):
+            words = set(words)
+            words.add(person['email'].lower())
+            self._words.append(words)
+            for value in (person['school'] or '', person['subject'] or ''):
+                if value not in normalized:
+                    normalized[value] = normalize_arabic(value)
+            self._filters.append((normalized[person['school'] or ''], normalized[person['subject'] or '']))
+            for word in words:
+                keys.append((word, position))
+        keys.sort()
+        self._keys = [word for word, position in keys]
+        self._positions = [position for word, position in keys]
+
+    def _candidates(self, prefix):
+        start = bisect_left(self._keys, prefix)
+        positions = set()
+        for i in range(start, len(self._keys)):
+            if not self._keys[i].startswith(prefix):
+                break
+            positions.add(self._positions[i])
+        return sorted(positions)
+
+    def search(self, query='', school=None, subject=None, limit=20):
+        """People whose name words (or email) start with every word of `query`, by name.
+
+        `school` and `subject` restrict the results to exact matches after
+        normalization. An empty query lists everyone matching the filters.
+        """
+        tokens = search_tokens(query)
+        positions = self._candidates(tokens[0]) if tokens else range(len(self.people))
+        school = normalize_arabic(school) if school else None
+        subject = normalize_arabic(subject) if subject else None
+
+        results = []
+        for position in positions:
+            person_school, person_subject = self._filters[position]
+            if (school and person_school != school) or (subject and person_subject != subject):
+                continue
+            words = self._words[position]
+            if all(any(word.startswith(token) for word in words) for token in tokens[1:]):
+                results.append(self.people[position])
+                if len(results) == limit:
+                    break
+        return results
+
+
+def _load_teachers():
+    rows = db.session.query(Teacher.id, Teacher.name, Teacher.email, Teacher.school, Teacher.subject)
+    return RosterIndex([dict(row._mapping) for row in rows])
+
+
+def _load_supervisors():
+    # A supervisor's specialty is the subject they follow; they are not tied to a school
+    rows = db.session.query(Supervisor.id, Supervisor.name, Supervisor.email, Supervisor.specialty)
+    return RosterIndex([
+        {'id': row.id, 'name': row.name, 'email': row.email, 'school': None, 'subject': row.specialty}
+        for row in rows
+    ])
+
+
+ROSTER_LOADERS = {
+    'teachers': _load_teachers,
+    'supervisors': _load_supervisors,
+}
+
+
+def roster_index(kind):
+    """The cached RosterIndex of 'teachers' or 'supervisors'"""
+    return roster_index_cache.get_or_set(kind, ROSTER_LOADERS[kind])
+
+
+def invalidate_roster_index(*kinds):
+    """Drop this process's indexes, e.g. after bulk writes that bypass the ORM events"""
+    roster_index_cache.invalidate(*(kinds or ROSTER_LOADERS))
+
+
+@event.listens_for(Teacher, 'after_insert')
+@event.listens_for(Teacher, 'after_update')
+@event.listens_for(Teacher, 'after_delete')
+def _teacher_changed(mapper, connection, target):
+    invalidate_roster_index('teachers')
+
+
+@event.listens_for(Supervisor, 'after_insert')
+@event.listens_for(Supervisor, 'after_update')
+@event.listens_for(Supervisor, 'after_delete')
+def _supervisor_changed(mapper, connection, target):
+    invalidate_roster_index('supervisors')
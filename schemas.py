@@ -0,0 +1,193 @@
+"""
+Validation schemas for incoming visit payloads and imported teacher and
+supervisor records.
+
+A schema is compiled once, at import time, into a tuple of (name, field)
+converters, so validating a request is a single pass over plain functions:
+no per-request setup and no database access. Every field is checked and all
+errors are reported together, as {field: message} (nested for sub-schemas).
+
+Checks that need the database, such as whether a teacher id exists, are left
+to the caller, which can batch them into one query per table.
+"""
+import re
+import uuid
+from collections.abc import Mapping
+from datetime import datetime
+
+from models import SCORE_SECTIONS, VISIT_STATUSES, normalize_email
+
+
+class Field:
+    """A converter plus presence rules; `convert` raises ValueError(message) on bad input"""
+    def __init__(self, convert, required=False, default=None):
+        self.convert = convert
+        self.required = required
+        self.default = default
+
+
+class Schema:
+    def __init__(self, **fields):
+        self._fields = tuple(fields.items())
+
+    @property
+    def names(self):
+        return tuple(name for name, field in self._fields)
+
+    @property
+    def required(self):
+        return tuple(name for name, field in self._fields if field.required)
+
+    def extend(self, **fields):
+        """A new schema with extra or replaced fields"""
+        return Schema(**dict(self._fields, **fields))
+
+    def validate(self, data):
+        """Return (clean, errors); clean is only complete when errors is empty"""
+        if not isinstance(data, Mapping):
+            return {}, {'_schema': 'must be an object'}
+        clean = {}
+        errors = {}
+        for name, field in self._fields:
+            value = data.get(name)
+            if isinstance(value, str):
+                value = value.strip()
+            if value is None or value == '':
+                if field.required:
+                    errors[name] = 'required'
+                else:
+                    clean[name] = field.default
+                continue
+            try:
+                clean[name] = field.convert(value)
+            except ValueError as e:
+                errors[name] = e.args[0]
+        return clean, errors
+
+
+# Converters
+
+def text(max_length):
+    def convert(value):
+        if not isinstance(value, str):
+            raise ValueError('must be a string')
+        if len(value) > max_length:
+            raise ValueError(f'must be at most {max_length} characters')
+        return value
+    return convert
+
+
+def integer(min_value, max_value=None):
+    message = (f'must be an integer from {min_value} to {max_value}' if max_value is not None
+               else f'must be an integer of at least {min_value}')
+    def convert(value):
+        # Form posts send digit strings, JSON sends numbers; bools are not numbers here
+        if isinstance(value, str) and value.isdigit():
+            value = int(value)
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(message)
+        if value < min_value or (max_value is not None and value > max_value):
+            raise ValueError(message)
+        return value
+    return convert
+
+
+def date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise ValueError('must be a YYYY-MM-DD date')
+
+
+def choice(values):
+    allowed = frozenset(values)
+    message = 'must be one of: ' + ', '.join(values)
+    def convert(value):
+        if value not in allowed:
+            raise ValueError(message)
+        return value
+    return convert
+
+
+def uuid_string(value):
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        raise ValueError('must be a UUID')
+
+
+def boolean(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ('1', 'true', 'on', 'yes'):
+        return True
+    if isinstance(value, str) and value.lower() in ('0', 'false', 'off', 'no'):
+        return False
+    raise ValueError('must be true or false')
+
+
+_EMAIL = re.compile(r'[^@\s]+@[^@\s]+\.[^@\s]+')
+
+def email(value):
+    """Lowercased, so addresses differing only in case are one person"""
+    if not isinstance(value, str) or len(value) > 120 or not _EMAIL.fullmatch(value):
+        raise ValueError('must be an email address')
+    return normalize_email(value)
+
+
+def nested(schema):
+    def convert(value):
+        clean, errors = schema.validate(value)
+        if errors:
+            raise ValueError(errors)
+        return clean
+    return convert
+
+
+# Visit payloads
+
+SCORE_FIELD_NAMES = tuple(f'{section}_{i}' for section, count in SCORE_SECTIONS.items() for i in range(1, count + 1))
+
+# Every criterion of the evaluation is a required 0-4 rating, as in visit_form.html
+SCORES_SCHEMA = Schema(**{name: Field(integer(0, 4), required=True) for name in SCORE_FIELD_NAMES})
+
+VISIT_SCHEMA = Schema(
+    visit_date=Field(date, required=True),
+    school_name=Field(text(100), required=True),
+    teacher_id=Field(integer(1), required=True),
+    supervisor_id=Field(integer(1), required=True),
+    subject=Field(text(100), required=True),
+    grade=Field(text(50), required=True),
+    lesson_title=Field(text(200), required=True),
+    scores=Field(nested(SCORES_SCHEMA), required=True),
+    feedback_1=Field(text(10000), required=True),
+    feedback_2=Field(text(10000)),
+    suggestions=Field(text(10000)),
+    follow_up_date=Field(date),
+    supervisor_signature=Field(text(100), required=True),
+    status=Field(choice(VISIT_STATUSES), default=VISIT_STATUSES[0]),
+    send_email=Field(boolean, default=False),
+    client_uuid=Field(uuid_string)
+)
+
+# Offline clients must tag every visit so a resent batch is recognized
+BATCH_VISIT_SCHEMA = VISIT_SCHEMA.extend(client_uuid=Field(uuid_string, required=True))
+
+
+# Teacher and supervisor records, as in add_teacher.html and add_supervisor.html
+
+TEACHER_SCHEMA = Schema(
+    name=Field(text(100), required=True),
+    email=Field(email, required=True),
+    subject=Field(text(100), required=True),
+    school=Field(text(100), required=True),
+    phone=Field(text(20)),
+    grade=Field(text(100))
+)
+
+SUPERVISOR_SCHEMA = Schema(
+    name=Field(text(100), required=True),
+    email=Field(email, required=True),
+    specialty=Field(text(100), required=True),
+    phone=Field(text(20))
+)
@@ -0,0 +1,105 @@
+"""
+Full-text search over visits.
+
+Each visit has one row in visit_search holding the normalized text of its
+lesson title, feedback, suggestions, teacher name and school (see arabic.py).
+The row is written in the same transaction as the visit: index_visits() is
+called by the code paths that insert visits, and mapper events below refresh
+it when a visit or a teacher's name changes. `flask rebuild-search-index`
+rebuilds everything.
+
+SQLite matches through the FTS5 table visit_search_fts, ranked by bm25;
+PostgreSQL through a GIN index on to_tsvector('simple', document), ranked by
+ts_rank.
+"""
+from sqlalchemy import event, select
+from sqlalchemy.orm import joinedload
+
+from arabic import search_document, search_tokens
+from models import db, Visit, Teacher, VisitSearch, upsert_insert
+
+
+def _documents(connection, visit_ids):
+    rows = connection.execute(
+        select(Visit.id, Visit.lesson_title, Visit.feedback_1, Visit.feedback_2, Visit.suggestions,
+               Teacher.name, Visit.school_name)
+        .join(Teacher, Teacher.id == Visit.teacher_id)
+        .where(Visit.id.in_(visit_ids))
+    )
+    return [{'visit_id': row[0], 'document': search_document(*row[1:])} for row in rows]
+
+
+def index_visits(visit_ids, connection=None):
+    """Write the search documents of the given visits, in the current transaction"""
+    visit_ids = list(visit_ids)
+    if not visit_ids:
+        return
+    connection = connection or db.session.connection()
+    documents = _documents(connection, visit_ids)
+    if documents:
+        stmt = upsert_insert(VisitSearch)
+        stmt = stmt.on_conflict_do_update(index_elements=['visit_id'], set_={'document': stmt.excluded.document})
+        connection.execute(stmt, documents)
+
+
+def rebuild_search_index(batch_size=1000, progress=None):
+    """Rewrite every search document in visit-id chunks, committing per chunk"""
+    max_id = db.session.query(db.func.max(Visit.id)).scalar() or 0
+    for start in range(0, max_id, batch_size):
+        end = min(start + batch_size, max_id)
+        index_visits(range(start + 1, end + 1))
+        db.session.commit()
+        if progress:
+            progress(end, max_id)
+
+
+def _ranked_ids(tokens, limit, offset):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        query = db.text(
+            "SELECT visit_id FROM visit_search, to_tsquery('simple', :query) query "
+            "WHERE to_tsvector('simple', document) @@ query "
+            "ORDER BY ts_rank(to_tsvector('simple', document), query) DESC, visit_id DESC "
+            "LIMIT :limit OFFSET :offset"
+        )
+        match = ' & '.join(f'{token}:*' for token in tokens)
+    else:
+        query = db.text(
+            "SELECT rowid FROM visit_search_fts WHERE visit_search_fts MATCH :query "
+            "ORDER BY bm25(visit_search_fts), rowid DESC LIMIT :limit OFFSET :offset"
+        )
+        match = ' '.join(f'"{token}"*' for token in tokens)
+    return db.session.execute(query, {'query': match, 'limit': limit, 'offset': offset}).scalars().all()
+
+
+def search_visits(text, page=1, page_size=20):
+    """Return (visits, has_next) for one page of visits matching every word of `text`, best first.
+
+    Words match as prefixes, after the same Arabic normalization as the index.
+    """
+    tokens = search_tokens(text)
+    if not tokens:
+        return [], False
+
+    # One extra id tells whether another page exists, without counting all matches
+    ids = _ranked_ids(tokens, page_size + 1, (page - 1) * page_size)
+    has_next = len(ids) > page_size
+    ids = ids[:page_size]
+
+    visits = {visit.id: visit for visit in Visit.query.options(
+        joinedload(Visit.teacher),
+        joinedload(Visit.supervisor)
+    ).filter(Visit.id.in_(ids))}
+    return [visits[i] for i in ids if i in visits], has_next
+
+
+# Keep documents current when indexed text changes after the insert.
+# Deleted visits lose their document through the Visit.search_document cascade.
+@event.listens_for(Visit, 'after_update')
+def _visit_changed(mapper, connection, target):
+    index_visits([target.id], connection)
+
+
+@event.listens_for(Teacher, 'after_update')
+def _teacher_changed(mapper, connection, target):
+    if db.inspect(target).attrs.name.history.has_changes():
+        index_visits(connection.execute(select(Visit.id).where(Visit.teacher_id == target.id)).scalars(), connection)
@@ -0,0 +1,151 @@
+"""
+Streamed CSV and XLSX writers for large tabular exports.
+
+Both take a header and an iterator of rows and yield the file as byte chunks,
+so a response can start downloading before the last row is read and memory
+stays flat however many rows there are. The XLSX workbook is written by hand
+(a single worksheet of inline strings inside a deflated ZIP) because the
+usual libraries only produce the file once the whole workbook is built.
+
+Text that Excel would read as a formula (starting with =, +, -, @, a tab or a
+carriage return) is written with a leading apostrophe by safe_cell(), so free
+text typed by a user can never run as a formula in the exported file.
+"""
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ChunkBuffer:
+    """Write-only file object collecting what ZipFile writes until it is drained.
+
+    Shared by the streamed XLSX writer and the bulk PDF export (bulk_export.py).
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def safe_cell(value):
+    """The value to write in a cell: text that would start a formula is prefixed with an apostrophe"""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(header, rows):
+    """Yield a UTF-8 CSV file; the BOM makes Excel read Arabic text correctly"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow([safe_cell(value) for value in header])
+    for row in rows:
+        writer.writerow([safe_cell(value) for value in row])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="xl/workbook.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+    '</Relationships>'
+)
+_SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0"{rtl}/></sheetViews>'
+    '<sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+# Control characters are not allowed in XML 1.0 documents
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _cell(value):
+    if value is None or value == '':
+        return '<c/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_INVALID_XML.sub('', safe_cell(str(value))))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _row(values):
+    return '<row>' + ''.join(_cell(value) for value in values) + '</row>'
+
+
+def stream_xlsx(header, rows, sheet_name='Sheet1', right_to_left=False):
+    """Yield an XLSX workbook with one worksheet: the header row, then `rows`.
+
+    Numbers are stored as numbers, everything else as text.
+    """
+    buffer = ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(name=escape(sheet_name, {'"': '&quot;'})))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+
+        # force_zip64: the sheet size is unknown until the last row is written
+        with archive.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            sheet.write(_SHEET_START.format(rtl=' rightToLeft="1"' if right_to_left else '').encode('utf-8'))
+            sheet.write(_row(header).encode('utf-8'))
+            for row in rows:
+                sheet.write(_row(row).encode('utf-8'))
+                if buffer.size >= CHUNK_SIZE:
+                    yield buffer.drain()
+            sheet.write(_SHEET_END.encode('utf-8'))
+    yield buffer.drain()
@@ -0,0 +1,189 @@
+"""
+Per-teacher score history behind the /teacher/<id> profile.
+
+Each teacher has one teacher_summary row with the section averages of their
+latest visits and the latest recommendations, as JSON. record_teacher_visits()
+is called by the code paths that insert visits and folds the new visits into
+that row in the same transaction, so the cost of a visit does not grow with
+the teacher's history and the profile reads a single row. Lifetime averages
+come from the score rollup. `flask rebuild-teacher-summaries` rebuilds every
+row from the visits.
+"""
+import json
+
+from models import db, Teacher, TeacherSummary, Visit, VisitScore, ScoreRollup, SCORE_SECTIONS, upsert_insert
+
+# Visits shown on the profile, and the number of visits in each rolling average
+HISTORY_SIZE = 100
+ROLLING_WINDOW = 5
+# Points kept so the oldest shown visit still has a full rolling window
+STORED_POINTS = HISTORY_SIZE + ROLLING_WINDOW - 1
+RECOMMENDATIONS_KEPT = 5
+
+
+def _order(entry):
+    return entry['date'], entry['id']
+
+
+def fold_visits(history, recommendations, visits):
+    """Add visits to a summary's history and recommendations; returns both, trimmed to the newest.
+
+    `visits` are dicts with id, date (ISO string), sections ({section: average})
+    and suggestions. Visits may arrive in any order, e.g. from offline batches.
+    """
+    history = history + [{'id': v['id'], 'date': v['date'], 'sections': v['sections']} for v in visits]
+    history.sort(key=_order)
+    recommendations = recommendations + [
+        {'id': v['id'], 'date': v['date'], 'text': v['suggestions'].strip()}
+        for v in visits if v['suggestions'] and v['suggestions'].strip()
+    ]
+    recommendations.sort(key=_order)
+    return history[-STORED_POINTS:], recommendations[-RECOMMENDATIONS_KEPT:]
+
+
+def _visit_entries(rows):
+    """History entries for (id, teacher_id, visit_date, suggestions) rows, grouped by teacher"""
+    ids = [row[0] for row in rows]
+    sections = {}
+    for start in range(0, len(ids), 1000):
+        averages = db.session.query(
+            VisitScore.visit_id, VisitScore.section, db.func.avg(VisitScore.score)
+        ).filter(VisitScore.visit_id.in_(ids[start:start + 1000])).group_by(VisitScore.visit_id, VisitScore.section)
+        for visit_id, section, average in averages:
+            sections.setdefault(visit_id, {})[section] = round(float(average), 2)
+
+    entries = {}
+    for visit_id, teacher_id, visit_date, suggestions in rows:
+        entries.setdefault(teacher_id, []).append({
+            'id': visit_id,
+            'date': visit_date.isoformat(timespec='minutes'),
+            'sections': sections.get(visit_id, {}),
+            'suggestions': suggestions
+        })
+    return entries
+
+
+def record_teacher_visits(visit_ids):
+    """Fold newly inserted visits into their teachers' summaries, in the current transaction"""
+    visit_ids = list(visit_ids)
+    if not visit_ids:
+        return
+    rows = db.session.query(Visit.id, Visit.teacher_id, Visit.visit_date, Visit.suggestions).filter(
+        Visit.id.in_(visit_ids)
+    ).all()
+    entries = _visit_entries(rows)
+
+    db.session.execute(upsert_insert(TeacherSummary).on_conflict_do_nothing(index_elements=['teacher_id']), [
+        {'teacher_id': teacher_id, 'visit_count': 0, 'history': '[]', 'recommendations': '[]'}
+        for teacher_id in entries
+    ])
+    # Locked so concurrent visits of the same teacher are folded one after the other
+    summaries = TeacherSummary.query.filter(TeacherSummary.teacher_id.in_(entries)).with_for_update().populate_existing()
+    for summary in summaries:
+        visits = entries[summary.teacher_id]
+        history, recommendations = fold_visits(json.loads(summary.history), json.loads(summary.recommendations), visits)
+        summary.history = json.dumps(history, ensure_ascii=False)
+        summary.recommendations = json.dumps(recommendations, ensure_ascii=False)
+        summary.visit_count += len(visits)
+        latest = max(row[2] for row in rows if row[1] == summary.teacher_id)
+        if summary.last_visit_date is None or latest > summary.last_visit_date:
+            summary.last_visit_date = latest
+    db.session.flush()
+
+
+def _latest(teacher_ids, limit, *conditions):
+    # The `limit` newest visits of each teacher
+    rank = db.func.row_number().over(partition_by=Visit.teacher_id, order_by=(Visit.visit_date.desc(), Visit.id.desc()))
+    ranked = db.select(Visit.id, Visit.teacher_id, Visit.visit_date, Visit.suggestions, rank.label('rank')).where(
+        Visit.teacher_id.in_(teacher_ids), *conditions
+    ).subquery()
+    return db.session.execute(
+        db.select(ranked.c.id, ranked.c.teacher_id, ranked.c.visit_date, ranked.c.suggestions).where(ranked.c.rank <= limit)
+    ).all()
+
+
+def rebuild_teacher_summaries(batch_size=500, progress=None):
+    """Recompute every summary from the visits, `batch_size` teachers per transaction"""
+    teacher_ids = [row[0] for row in db.session.query(Teacher.id).order_by(Teacher.id)]
+    for start in range(0, len(teacher_ids), batch_size):
+        chunk = teacher_ids[start:start + batch_size]
+        totals = db.session.query(Visit.teacher_id, db.func.count(Visit.id), db.func.max(Visit.visit_date)).filter(
+            Visit.teacher_id.in_(chunk)
+        ).group_by(Visit.teacher_id).all()
+        # Visits older than the stored window only matter for their recommendations
+        rows = {row[0]: row for row in _latest(chunk, STORED_POINTS)}
+        rows.update((row[0], row) for row in _latest(
+            chunk, RECOMMENDATIONS_KEPT, Visit.suggestions.isnot(None), Visit.suggestions != ''
+        ) if row[0] not in rows)
+        entries = _visit_entries(list(rows.values()))
+
+        TeacherSummary.query.filter(TeacherSummary.teacher_id.in_(chunk)).delete(synchronize_session=False)
+        summaries = []
+        for teacher_id, visit_count, last_visit_date in totals:
+            history, recommendations = fold_visits([], [], entries.get(teacher_id, []))
+            summaries.append({
+                'teacher_id': teacher_id,
+                'visit_count': visit_count,
+                'last_visit_date': last_visit_date,
+                'history': json.dumps(history, ensure_ascii=False),
+                'recommendations': json.dumps(recommendations, ensure_ascii=False)
+            })
+        if summaries:
+            db.session.execute(db.insert(TeacherSummary), summaries)
+        db.session.commit()
+        if progress:
+            progress(min(start + batch_size, len(teacher_ids)), len(teacher_ids))
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    return round(sum(values) / len(values), 2) if values else None
+
+
+def load_teacher_profile(teacher):
+    """Everything the profile shows, from the teacher's summary and rollup rows only"""
+    summary = db.session.get(TeacherSummary, teacher.id)
+    stored = json.loads(summary.history) if summary else []
+    rollups = ScoreRollup.query.filter_by(dimension='teacher', dimension_key=str(teacher.id))
+    averages = dict.fromkeys(SCORE_SECTIONS)
+    averages.update((r.section, round(r.average, 2) if r.average is not None else None) for r in rollups)
+
+    history = []
+    for i, point in enumerate(stored):
+        window = stored[max(0, i - ROLLING_WINDOW + 1):i + 1]
+        history.append({
+            'visit_id': point['id'],
+            'date': point['date'][:10],
+            'sections': {section: point['sections'].get(section) for section in SCORE_SECTIONS},
+            'rolling': {section: _mean([p['sections'].get(section) for p in window]) for section in SCORE_SECTIONS}
+        })
+    history = history[-HISTORY_SIZE:]
+
+    # Change of the rolling average over the last ROLLING_WINDOW visits
+    trend = dict.fromkeys(SCORE_SECTIONS)
+    if len(history) > ROLLING_WINDOW:
+        latest, earlier = history[-1]['rolling'], history[-1 - ROLLING_WINDOW]['rolling']
+        for section in SCORE_SECTIONS:
+            if latest[section] is not None and earlier[section] is not None:
+                trend[section] = round(latest[section] - earlier[section], 2)
+
+    return {
+        'teacher': {
+            'id': teacher.id,
+            'name': teacher.name,
+            'email': teacher.email,
+            'subject': teacher.subject,
+            'school': teacher.school,
+            'grade': teacher.grade
+        },
+        'visit_count': summary.visit_count if summary else 0,
+        'last_visit_date': summary.last_visit_date.strftime('%Y-%m-%d') if summary and summary.last_visit_date else None,
+        'averages': averages,
+        'trend': trend,
+        'rolling_window': ROLLING_WINDOW,
+        'history': history,
+        'recommendations': [
+            {'visit_id': r['id'], 'date': r['date'][:10], 'text': r['text']}
+            for r in reversed(json.loads(summary.recommendations))
+        ] if summary else []
+    }
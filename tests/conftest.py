@@ -0,0 +1,71 @@
+import os
+import sys
+import uuid
+
+# Config reads the environment at import time: point it at an in-memory database
+os.environ['DATABASE_URL'] = 'sqlite://'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pytest
+from jinja2 import FileSystemLoader
+
+from app import create_app
+from models import db, User, Teacher, Supervisor
+from schemas import SCORE_FIELD_NAMES
+
+
+@pytest.fixture
+def app_config():
+    """Config overrides for the app; a test module redefines this fixture to change them"""
+    return {}
+
+
+@pytest.fixture
+def app(app_config):
+    flask_app = create_app({'TESTING': True, **app_config}, migrations=True)
+    # The templates sit next to the modules
+    flask_app.jinja_loader = FileSystemLoader(ROOT)
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """A logged-in admin, with teacher 1 and supervisor 1 to attach visits to"""
+    teacher = Teacher(id=1, name='أحمد محمد', email='ahmed@school.com', subject='الرياضيات', school='منارات المدينة المنورة')
+    supervisor = Supervisor(id=1, name='محمد علي', email='mohamed@edu.sa', specialty='الرياضيات')
+    user = User(username='admin', email='admin@school.com', name='مدير النظام', role='admin')
+    user.set_password('secret')
+    db.session.add_all([teacher, supervisor, user])
+    db.session.commit()
+
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'secret'})
+    return client
+
+
+@pytest.fixture
+def make_visit():
+    """Builds a valid visit payload for teacher 1 and supervisor 1; keyword arguments override fields"""
+    def make(**overrides):
+        visit = {
+            'client_uuid': str(uuid.uuid4()),
+            'visit_date': '2024-03-10',
+            'school_name': 'منارات المدينة المنورة',
+            'teacher_id': 1,
+            'supervisor_id': 1,
+            'subject': 'الرياضيات',
+            'grade': 'الأول',
+            'lesson_title': 'الجمع',
+            'feedback_1': 'تفاعل جيد',
+            'supervisor_signature': 'محمد علي',
+            'scores': dict.fromkeys(SCORE_FIELD_NAMES, 2)
+        }
+        visit['scores'].update(management_1=4, management_2=0)
+        visit.update(overrides)
+        return visit
+    return make
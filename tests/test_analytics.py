@@ -0,0 +1,34 @@
+"""
+/analytics reads section averages from the score rollup, one page of
+teachers, supervisors, schools or months at a time.
+"""
+from models import db, Teacher
+
+
+def test_rollup_averages_are_paged_by_name(client, make_visit):
+    db.session.add_all([
+        Teacher(id=2, name='بدر سالم', email='badr@school.com', subject='العلوم', school='الرواد'),
+        Teacher(id=3, name='تامر حسن', email='tamer@school.com', subject='العلوم', school='الرواد'),
+    ])
+    db.session.commit()
+    visits = [make_visit(teacher_id=teacher_id, visit_date=date)
+              for teacher_id, date in ((1, '2024-03-10'), (1, '2024-04-02'), (2, '2024-04-03'), (3, '2024-05-01'))]
+    assert client.post('/api/visits/batch', json={'visits': visits}).status_code == 201
+
+    first = client.get('/api/analytics', query_string={'dimension': 'teacher', 'page_size': 2}).json['teacher']
+    assert [entry['name'] for entry in first['entries']] == ['أحمد محمد', 'بدر سالم']
+    assert first['entries'][0]['visit_count'] == 2
+    assert first['entries'][0]['sections']['management'] == round((4 + 0 + 2 + 2 + 2) / 5, 2)
+    assert first['next_page'] == 2
+
+    second = client.get('/api/analytics', query_string={'dimension': 'teacher', 'page_size': 2, 'page': 2}).json
+    assert [entry['name'] for entry in second['teacher']['entries']] == ['تامر حسن']
+    assert second['teacher']['next_page'] is None
+
+    months = client.get('/api/analytics', query_string={'page_size': 2}).json['month']
+    assert [entry['key'] for entry in months['entries']] == ['2024-05', '2024-04']
+
+    page = client.get('/analytics', query_string={'dimension': 'teacher', 'page_size': 2})
+    assert page.status_code == 200
+    assert 'page=2' in page.get_data(as_text=True)
+    assert client.get('/api/analytics', query_string={'dimension': 'district'}).status_code == 400
@@ -0,0 +1,61 @@
+"""
+The bulk export streams a ZIP of the visit PDFs in visit order, rendering them
+in worker processes; a failed render ends the stream and no worker is left
+behind.
+"""
+import io
+import multiprocessing
+import zipfile
+
+import pytest
+
+import reports
+from bulk_export import archive_name, iter_rendered_pdfs
+from pdf_cache import PDFCache
+from reports import iter_visit_pdf_fields
+
+
+@pytest.fixture
+def visits(client, make_visit, tmp_path, monkeypatch):
+    monkeypatch.setattr(reports, '_pdf_cache', PDFCache(str(tmp_path), 10 * 1024 * 1024))
+    batch = [make_visit(visit_date='2024-03-12'), make_visit(visit_date='2024-03-10'), make_visit(visit_date='2024-03-11')]
+    assert client.post('/api/visits/batch', json={'visits': batch}).status_code == 201
+
+
+def test_zip_holds_one_pdf_per_visit_in_date_order(client, visits):
+    response = client.get('/visits/export.zip')
+    assert response.status_code == 200
+    assert response.is_streamed
+
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        assert archive.testzip() is None
+        names = archive.namelist()
+        documents = [archive.read(name) for name in names]
+
+    expected = [fields for fields, digest in iter_visit_pdf_fields({})]
+    assert [fields['visit_date'] for fields in expected] == ['2024-03-10', '2024-03-11', '2024-03-12']
+    assert names == [archive_name(fields) for fields in expected]
+    assert all(document.startswith(b'%PDF') for document in documents)
+    # Rendered documents went into the cache for the next export
+    for fields, digest in iter_visit_pdf_fields({}):
+        assert reports.get_pdf_cache().get(fields['id'], digest) is not None
+
+
+def test_failed_render_stops_the_stream_and_its_workers(visits):
+    items = list(iter_visit_pdf_fields({}))
+    broken = dict(items[1][0])
+    del broken['scores']
+    items[1] = (broken, items[1][1])
+
+    rendered = iter_rendered_pdfs(iter(items), max_workers=2, window=2)
+    assert next(rendered)[0]['id'] == items[0][0]['id']
+    with pytest.raises(KeyError):
+        next(rendered)
+    assert multiprocessing.active_children() == []
+
+
+def test_abandoned_download_shuts_the_workers_down(visits):
+    rendered = iter_rendered_pdfs(iter_visit_pdf_fields({}), max_workers=2, window=2)
+    next(rendered)
+    rendered.close()
+    assert multiprocessing.active_children() == []
@@ -0,0 +1,49 @@
+"""
+The dashboard counters are computed once per DASHBOARD_CACHE_TTL and worker,
+and recomputed right away after a route that changes them.
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import cache
+import views
+from views import dashboard_cache
+
+
+@pytest.fixture
+def computed(client, monkeypatch):
+    dashboard_cache.clear()
+    calls = []
+    dashboard_stats = views.dashboard_stats
+
+    def counting_stats():
+        calls.append(1)
+        return dashboard_stats()
+    monkeypatch.setattr(views, 'dashboard_stats', counting_stats)
+    yield calls
+    dashboard_cache.clear()
+
+
+def test_counters_are_cached_until_invalidated(client, computed, make_visit):
+    assert client.get('/dashboard').status_code == 200
+    assert client.get('/dashboard').status_code == 200
+    assert len(computed) == 1
+    assert dashboard_cache.get('stats')['total_visits'] == 0
+
+    client.post('/api/visits/batch', json={'visits': [make_visit(school_name='مدرسة الرواد')]})
+    client.get('/dashboard')
+    assert len(computed) == 2
+    stats = dashboard_cache.get('stats')
+    assert stats['total_visits'] == 1
+    # The teacher's school and the visit's school
+    assert stats['schools_count'] == 2
+
+
+def test_counters_expire_after_the_ttl(client, computed, app, monkeypatch):
+    client.get('/dashboard')
+    later = time.monotonic() + app.config['DASHBOARD_CACHE_TTL'] + 1
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(monotonic=lambda: later))
+    client.get('/dashboard')
+    assert len(computed) == 2
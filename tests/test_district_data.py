@@ -0,0 +1,25 @@
+"""
+The synthetic district used by the benchmarks is complete and consistent:
+every visit has its 20 scores, the rollup and the search index.
+"""
+import os
+import sys
+
+from models import db, Teacher, Visit, VisitScore, ScoreRollup
+from search import search_visits
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from district_data import generate_district
+
+
+def test_generated_district_is_consistent(app):
+    generate_district(schools=3, teachers=20, supervisors=6, visits=250, seed=7)
+
+    assert Teacher.query.count() == 20
+    assert Visit.query.count() == 250
+    assert VisitScore.query.count() == 250 * 20
+    assert db.session.query(db.func.count(db.distinct(Visit.school_name))).scalar() <= 3
+    months = ScoreRollup.query.filter_by(dimension='month', section='teaching').all()
+    assert sum(rollup.visit_count for rollup in months) == 250
+    assert search_visits(Visit.query.first().lesson_title, page_size=250)[0]
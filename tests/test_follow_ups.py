@@ -0,0 +1,68 @@
+"""
+Follow-up reminders go out as one digest per supervisor, once per visit,
+however often the scheduler runs, and never for a cancelled visit.
+"""
+from datetime import datetime
+
+import pytest
+
+from follow_ups import send_follow_up_reminders
+from models import db, Supervisor, Visit
+
+NOW = datetime(2024, 3, 10, 6, 0)
+
+
+class RecordingMailer:
+    def __init__(self, fail_for=()):
+        self.sent = []
+        self.fail_for = set(fail_for)
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        if msg['To'] in self.fail_for:
+            raise ConnectionError('connection refused')
+        self.sent.append(msg)
+
+
+@pytest.fixture
+def follow_ups(client, monkeypatch, make_visit):
+    monkeypatch.setenv('EMAIL_USER', 'reports@school.com')
+    db.session.add(Supervisor(id=2, name='سارة أحمد', email='sara@edu.sa', specialty='العلوم'))
+    db.session.commit()
+    visits = [
+        make_visit(follow_up_date='2024-03-10', lesson_title='الكسور'),
+        make_visit(follow_up_date='2024-03-12', lesson_title='الجمع'),
+        make_visit(follow_up_date='2024-03-11', supervisor_id=2, lesson_title='الخلية'),
+        # Not reminded: too far ahead, cancelled, too long overdue, no follow-up
+        make_visit(follow_up_date='2024-03-20'),
+        make_visit(follow_up_date='2024-03-11', status='ملغاة', lesson_title='الطرح'),
+        make_visit(follow_up_date='2024-01-01'),
+        make_visit(),
+    ]
+    assert client.post('/api/visits/batch', json={'visits': visits}).status_code == 201
+
+
+def test_one_digest_per_supervisor_and_never_twice(follow_ups):
+    mailer = RecordingMailer()
+    report = send_follow_up_reminders(now=NOW, days_ahead=2, lookback_days=7, mailer=mailer)
+
+    assert report == {'visits': 3, 'sent': 2, 'failed': 0}
+    digests = {msg['To']: msg.get_payload(decode=True).decode('utf-8') for msg in mailer.sent}
+    assert set(digests) == {'mohamed@edu.sa', 'sara@edu.sa'}
+    assert digests['mohamed@edu.sa'].index('الكسور') < digests['mohamed@edu.sa'].index('الجمع')
+    assert 'الخلية' in digests['sara@edu.sa']
+    assert 'الطرح' not in digests['mohamed@edu.sa']
+    assert Visit.query.filter_by(status='ملغاة').one().follow_up_reminded_at is None
+
+    assert send_follow_up_reminders(now=NOW, days_ahead=2, lookback_days=7, mailer=mailer)['visits'] == 0
+    assert len(mailer.sent) == 2
+
+
+def test_failed_digest_is_retried_on_the_next_run(follow_ups):
+    report = send_follow_up_reminders(now=NOW, days_ahead=2, lookback_days=7,
+                                      mailer=RecordingMailer(fail_for={'sara@edu.sa'}))
+    assert report == {'visits': 3, 'sent': 1, 'failed': 1}
+    assert Visit.query.filter(Visit.follow_up_reminded_at.is_(None), Visit.supervisor_id == 2).count() == 1
+
+    mailer = RecordingMailer()
+    assert send_follow_up_reminders(now=NOW, days_ahead=2, lookback_days=7, mailer=mailer)['sent'] == 1
+    assert [msg['To'] for msg in mailer.sent] == ['sara@edu.sa']
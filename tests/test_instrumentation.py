@@ -0,0 +1,57 @@
+"""
+With INSTRUMENTATION on, every response reports its SQL work in Server-Timing
+and /metrics aggregates latency per endpoint in the Prometheus format for
+scrapers holding the metrics token.
+"""
+import re
+
+import pytest
+
+
+@pytest.fixture
+def app_config():
+    return {'INSTRUMENTATION': True, 'METRICS_TOKEN': 'scrape'}
+
+
+def test_response_carries_server_timing(client):
+    response = client.get('/api/teachers', query_string={'q': 'احمد'})
+
+    assert response.status_code == 200
+    assert int(response.headers['X-Query-Count']) >= 1
+    timings = response.headers['Server-Timing']
+    assert 'db;dur=' in timings and 'total;dur=' in timings
+
+
+def test_metrics_export_per_endpoint_histograms(client):
+    for _ in range(3):
+        client.get('/api/teachers', query_string={'q': 'احمد'})
+
+    assert client.get('/metrics').status_code == 401
+    body = client.get('/metrics', headers={'Authorization': 'Bearer scrape'}).get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="main.roster_lookup",method="GET"} 3' in body
+    assert 'http_request_duration_seconds_bucket{endpoint="main.roster_lookup",method="GET",le="+Inf"} 3' in body
+    assert 'http_requests_total{endpoint="main.roster_lookup",method="GET",status="200"} 3' in body
+    assert 'db_queries_total{endpoint="main.roster_lookup"}' in body
+
+
+def test_metrics_are_not_served_without_a_token(app, client):
+    app.config['METRICS_TOKEN'] = None
+
+    assert client.get('/metrics').status_code == 404
+    assert client.get('/metrics', headers={'Authorization': 'Bearer '}).status_code == 404
+
+
+def test_streamed_export_is_measured_to_its_last_byte(client, make_visit):
+    client.post('/api/visits/batch', json={'visits': [make_visit(), make_visit()]})
+
+    response = client.get('/visits/export.csv')
+    assert response.is_streamed
+    # Sent ahead of the body: the export's own queries are not in it yet
+    header_queries = int(response.headers['X-Query-Count'])
+    assert len(response.get_data(as_text=True).splitlines()) == 3
+    response.close()
+
+    body = client.get('/metrics', headers={'Authorization': 'Bearer scrape'}).get_data(as_text=True)
+    assert 'http_requests_total{endpoint="main.export_visits",method="GET",status="200"} 1' in body
+    queries = re.search(r'db_queries_total\{endpoint="main.export_visits"\} (\d+)', body)
+    assert int(queries.group(1)) > header_queries
@@ -0,0 +1,28 @@
+"""
+Failed logins are throttled per account and per client address; behind the
+proxy the address comes from X-Forwarded-For, so one client's failures do not
+lock out everyone else.
+"""
+import pytest
+
+
+@pytest.fixture
+def app_config():
+    return {'PROXY_FIX_X_FOR': 1, 'LOGIN_IP_MAX_ATTEMPTS': 2, 'LOGIN_MAX_ATTEMPTS': 10}
+
+
+def login(client, client_ip, username='admin', password='secret'):
+    return client.post('/login', data={'username': username, 'password': password},
+                       headers={'X-Forwarded-For': client_ip})
+
+
+def test_ip_throttle_counts_the_forwarded_client(client):
+    client.get('/logout')
+    for username in ('admin', 'nobody'):
+        assert login(client, '203.0.113.7', username, 'wrong').status_code == 200
+
+    assert login(client, '203.0.113.7').status_code == 429
+    # Same proxy, another client
+    response = login(client, '203.0.113.8')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/dashboard')
@@ -0,0 +1,186 @@
+"""
+Report emails go through one pooled SMTP session, exercised here against a
+local SMTP server: the session is reused, health-checked, rotated and
+reopened when the server drops it, and the worker retries failed jobs with
+backoff until they are dead.
+"""
+import socket
+import socketserver
+import threading
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+
+import pytest
+
+import mailer
+from mailer import SMTPConnectionManager
+from models import db, EmailJob, enqueue_pending_reports
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            server.open_sockets.add(self.connection)
+        self.reply('220 localhost ESMTP')
+        try:
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                command = line.decode().strip().split(' ', 1)[0].upper()
+                if command == 'DATA':
+                    self.reply('354 end with <CRLF>.<CRLF>')
+                    data = []
+                    for line in iter(self.rfile.readline, b''):
+                        if line == b'.\r\n':
+                            break
+                        data.append(line)
+                    server.messages.append(b''.join(data))
+                    self.reply('250 OK')
+                elif command == 'NOOP':
+                    server.noops += 1
+                    self.reply('250 OK')
+                elif command == 'QUIT':
+                    self.reply('221 bye')
+                    return
+                elif command in ('EHLO', 'HELO', 'MAIL', 'RCPT', 'RSET'):
+                    self.reply('250 OK')
+                else:
+                    self.reply('502 not implemented')
+        except OSError:
+            pass
+        finally:
+            with server.lock:
+                server.open_sockets.discard(self.connection)
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.noops = 0
+        self.messages = []
+        self.open_sockets = set()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def hang_up(self):
+        """Drop every open session, as a server does on an idle timeout"""
+        with self.lock:
+            for sock in self.open_sockets:
+                sock.shutdown(socket.SHUT_RDWR)
+
+
+@pytest.fixture
+def smtp_server():
+    server = LocalSMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def local_mailer(server, **options):
+    return SMTPConnectionManager('127.0.0.1', server.port, use_tls=False, timeout=5, **options)
+
+
+def message(number):
+    msg = MIMEText(f'رسالة {number}', 'plain', 'utf-8')
+    msg['From'] = 'reports@school.com'
+    msg['To'] = f'teacher{number}@school.com'
+    msg['Subject'] = f'تقرير {number}'
+    return msg
+
+
+def test_session_is_reused_and_rotated(smtp_server):
+    with local_mailer(smtp_server, max_messages_per_session=2) as manager:
+        for number in range(5):
+            manager.send_message(message(number))
+
+    assert len(smtp_server.messages) == 5
+    assert smtp_server.connections == 3
+
+
+def test_dropped_session_is_reopened(smtp_server):
+    with local_mailer(smtp_server) as manager:
+        manager.send_message(message(1))
+        smtp_server.hang_up()
+        manager.send_message(message(2))
+
+    assert len(smtp_server.messages) == 2
+    assert smtp_server.connections == 2
+
+
+def test_idle_session_is_checked_with_noop(smtp_server):
+    with local_mailer(smtp_server, health_check_interval=0) as manager:
+        manager.send_message(message(1))
+        manager.send_message(message(2))
+        assert smtp_server.noops == 1
+        assert smtp_server.connections == 1
+
+        # A failed NOOP opens a new session before the message is sent
+        smtp_server.hang_up()
+        manager.send_message(message(3))
+
+    assert len(smtp_server.messages) == 3
+    assert smtp_server.connections == 2
+
+
+@pytest.fixture
+def worker(client, make_visit, monkeypatch):
+    import worker
+
+    monkeypatch.setenv('EMAIL_USER', 'reports@school.com')
+    visits = [make_visit(), make_visit(visit_date='2024-03-11')]
+    assert client.post('/api/visits/batch', json={'visits': visits}).status_code == 201
+    return worker
+
+
+def test_pending_reports_are_sent_through_one_session(worker, smtp_server, monkeypatch):
+    monkeypatch.setattr(mailer, '_mailer', local_mailer(smtp_server))
+
+    assert enqueue_pending_reports({}) == 2
+    assert worker.run_once() == 2
+    mailer.get_mailer().close()
+
+    assert [job.status for job in EmailJob.query] == ['sent', 'sent']
+    assert len(smtp_server.messages) == 2
+    assert smtp_server.connections == 1
+    # Already queued or sent: nothing left to queue
+    assert enqueue_pending_reports({}) == 0
+
+
+def test_failed_job_is_retried_then_dead(worker, app, monkeypatch):
+    # Nothing listens on a port that was just released
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setattr(mailer, '_mailer', SMTPConnectionManager('127.0.0.1', port, use_tls=False, timeout=5))
+    app.config['EMAIL_JOB_MAX_ATTEMPTS'] = 2
+    enqueue_pending_reports({'date_from': datetime(2024, 3, 11)})
+
+    assert worker.run_once() == 1
+    job = EmailJob.query.one()
+    assert (job.status, job.attempts) == ('pending', 1)
+    assert job.last_error
+    assert job.next_attempt_at > datetime.utcnow() + timedelta(seconds=worker.backoff_delay(1) - 5)
+    # Not due yet
+    assert worker.run_once() == 0
+
+    job.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    assert worker.run_once() == 1
+    db.session.refresh(job)
+    assert (job.status, job.attempts) == ('dead', 2)
@@ -0,0 +1,98 @@
+"""
+The migrations must produce exactly the schema declared by the models, and
+the data migrations must carry existing rows over.
+"""
+import json
+import os
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import upgrade
+
+from arabic import search_document
+from migrations.helpers import include_name
+from models import db, VisitScore, ScoreRollup, TeacherSummary, VisitSearch
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+@pytest.fixture
+def empty_db(app):
+    db.drop_all()
+    yield
+    db.session.remove()
+    db.session.execute(db.text('DROP TABLE IF EXISTS alembic_version'))
+    db.session.commit()
+
+
+def test_migrations_match_models(empty_db):
+    upgrade(directory=MIGRATIONS_DIR)
+    
+    with db.engine.connect() as conn:
+        diff = compare_metadata(MigrationContext.configure(conn, opts={'include_name': include_name}), db.metadata)
+    assert diff == []
+
+
+def test_scores_and_rollups_are_backfilled(empty_db):
+    upgrade(directory=MIGRATIONS_DIR, revision='0002')
+    db.session.execute(db.text("INSERT INTO teacher (id, name, email, subject, school) VALUES (1, 'T', 't@x', 's', 'Sch')"))
+    db.session.execute(db.text("INSERT INTO supervisor (id, name, email, specialty) VALUES (1, 'S', 's@x', 's')"))
+    for visit_id in (1, 2):
+        db.session.execute(db.text(
+            "INSERT INTO visit (id, visit_date, school_name, teacher_id, supervisor_id, subject, grade, lesson_title, "
+            "management_scores, teaching_scores, feedback_scores) "
+            "VALUES (:id, '2024-03-01 00:00:00', 'Sch', 1, 1, 's', 'g', 'l', :management, :teaching, :feedback)"
+        ), {
+            'id': visit_id,
+            'management': json.dumps({f'management_{i}': str(visit_id) for i in range(1, 6)}),
+            'teaching': json.dumps({f'teaching_{i}': '4' for i in range(1, 11)}),
+            'feedback': json.dumps({f'feedback_{i}': None for i in range(1, 6)})
+        })
+    db.session.commit()
+    
+    upgrade(directory=MIGRATIONS_DIR)
+    
+    assert VisitScore.query.count() == 30
+    management = ScoreRollup.query.filter_by(dimension='teacher', dimension_key='1', section='management').one()
+    assert (management.visit_count, management.score_sum, management.score_count) == (2, 15, 10)
+    assert ScoreRollup.query.filter_by(dimension='month', dimension_key='2024-03', section='teaching').one().average == 4
+    summary = db.session.get(TeacherSummary, 1)
+    assert summary.visit_count == 2
+    assert [point['sections'] for point in json.loads(summary.history)] == [
+        {'management': 1, 'teaching': 4}, {'management': 2, 'teaching': 4}
+    ]
+
+
+def test_search_documents_are_backfilled(empty_db):
+    upgrade(directory=MIGRATIONS_DIR, revision='0007')
+    db.session.execute(db.text("INSERT INTO teacher (id, name, email, subject, school) VALUES (1, 'أحمد محمد', 't@x', 's', 'Sch')"))
+    db.session.execute(db.text("INSERT INTO supervisor (id, name, email, specialty) VALUES (1, 'S', 's@x', 's')"))
+    db.session.execute(db.text(
+        "INSERT INTO visit (id, visit_date, school_name, teacher_id, supervisor_id, subject, grade, lesson_title, "
+        "feedback_1, suggestions) VALUES (1, '2024-03-01 00:00:00', 'منارات المدينة', 1, 1, 's', 'g', 'الْجَمْعُ', "
+        "'إدارة الصف', 'Present Simple')"
+    ))
+    db.session.commit()
+    
+    upgrade(directory=MIGRATIONS_DIR)
+    
+    # Frozen in the revision, the rules still match arabic.py
+    assert db.session.get(VisitSearch, 1).document == search_document(
+        'الْجَمْعُ', 'إدارة الصف', None, 'Present Simple', 'أحمد محمد', 'منارات المدينة'
+    )
+
+
+def test_roster_emails_are_lowercased(empty_db):
+    upgrade(directory=MIGRATIONS_DIR, revision='0010')
+    for teacher_id, email in ((1, 'Ahmed@School.com'), (2, 'Khaled@School.com'), (3, 'KHALED@school.com')):
+        db.session.execute(db.text(
+            "INSERT INTO teacher (id, name, email, subject, school) VALUES (:id, 'T', :email, 's', 'Sch')"
+        ), {'id': teacher_id, 'email': email})
+    db.session.commit()
+    
+    upgrade(directory=MIGRATIONS_DIR)
+    
+    emails = db.session.execute(db.text('SELECT email FROM teacher ORDER BY id')).scalars().all()
+    # Records that would collide are left for an administrator to merge
+    assert emails == ['ahmed@school.com', 'Khaled@School.com', 'KHALED@school.com']
@@ -0,0 +1,83 @@
+"""
+The PDF cache keeps one version per visit and stays within its byte budget,
+evicting the least recently used files, without rescanning the directory. A
+visit's PDF is rendered once and revalidated by its content digest as ETag.
+"""
+import os
+
+import pdf_reports
+import reports
+from models import db, Teacher
+from pdf_cache import PDFCache
+
+
+def cached_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.pdf'))
+
+
+def test_hit_miss_and_new_version_replaces_old(tmp_path):
+    cache = PDFCache(str(tmp_path), max_bytes=1000)
+    assert cache.get(1, 'a') is None
+
+    cache.put(1, 'a', b'old')
+    assert cache.get(1, 'a') == b'old'
+    cache.put(1, 'b', b'new')
+    assert cache.get(1, 'a') is None
+    assert cache.get(1, 'b') == b'new'
+    assert cached_files(tmp_path) == ['1-b.pdf']
+
+    cache.invalidate([1, 2])
+    assert cached_files(tmp_path) == []
+
+
+def test_least_recently_used_files_are_evicted(tmp_path, monkeypatch):
+    cache = PDFCache(str(tmp_path), max_bytes=300)
+    for visit_id in (1, 2, 3):
+        cache.put(visit_id, 'd', b'x' * 100)
+    cache.get(1, 'd')
+
+    def no_scan(*args):
+        raise AssertionError('the cache directory was scanned')
+    monkeypatch.setattr(os, 'scandir', no_scan)
+    cache.put(4, 'd', b'x' * 100)
+    cache.invalidate([3])
+    monkeypatch.undo()
+
+    assert cached_files(tmp_path) == ['1-d.pdf', '4-d.pdf']
+
+
+def test_existing_files_are_indexed_at_startup(tmp_path):
+    PDFCache(str(tmp_path), max_bytes=1000).put(1, 'a', b'x' * 100)
+    cache = PDFCache(str(tmp_path), max_bytes=150)
+    assert cache.get(1, 'a') == b'x' * 100
+
+    cache.put(2, 'a', b'y' * 100)
+    assert cached_files(tmp_path) == ['2-a.pdf']
+    cache.invalidate([2])
+    assert cached_files(tmp_path) == []
+
+
+def test_visit_pdf_is_rendered_once_and_revalidated_by_etag(client, make_visit, tmp_path, monkeypatch):
+    monkeypatch.setattr(reports, '_pdf_cache', PDFCache(str(tmp_path), max_bytes=10 * 1024 * 1024))
+    visit_id = client.post('/api/visits/batch', json={'visits': [make_visit()]}).json['visits'][0]['id']
+
+    first = client.get(f'/visit/{visit_id}/pdf')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert cached_files(tmp_path) == [f'{visit_id}-{etag.strip(chr(34))}.pdf']
+
+    def no_render(fields):
+        raise AssertionError('rendered on a cache hit')
+    with monkeypatch.context() as patched:
+        patched.setattr(pdf_reports, 'render_visit_pdf', no_render)
+        assert client.get(f'/visit/{visit_id}/pdf').get_data() == first.get_data()
+        unchanged = client.get(f'/visit/{visit_id}/pdf', headers={'If-None-Match': etag})
+        assert (unchanged.status_code, unchanged.get_data()) == (304, b'')
+
+    # Renaming the teacher changes the document: new ETag, old file dropped
+    db.session.get(Teacher, 1).name = 'أحمد محمد علي'
+    db.session.commit()
+    changed = client.get(f'/visit/{visit_id}/pdf', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert cached_files(tmp_path) == [f'{visit_id}-{changed.headers["ETag"].strip(chr(34))}.pdf']
@@ -0,0 +1,59 @@
+"""
+Visit PDFs: Arabic is shaped and laid out right to left by the app itself in
+the font shipped with it, and the report carries every criterion score.
+"""
+import os
+
+import pytest
+
+import pdf_reports
+from app import create_app
+from arabic import shape_arabic, visual_line, visual_word
+from models import db, Visit
+from reports import visit_pdf_fields, get_visit_pdf
+
+
+def test_letters_take_their_contextual_forms():
+    # ba initial, ya medial, ta final; lam-alef ligature after a joining letter
+    assert shape_arabic('بيت') == 'ﺑﻴﺖ'
+    assert shape_arabic('لا') == 'ﻻ'
+    assert shape_arabic('سلام') == 'ﺳﻼﻡ'
+    # Diacritics do not break the joining
+    assert shape_arabic('بَيت') == 'ﺑَﻴﺖ'
+
+
+def test_words_and_lines_are_put_in_drawing_order():
+    assert visual_word('(بيت)') == '(تيب)'
+    assert visual_word('2024') == '2024'
+    assert visual_line(['الدرس', 'Present', 'Simple', 'اليوم']) == ['اليوم', 'Present', 'Simple', 'الدرس']
+
+
+def test_pdf_covers_every_criterion_score(client, make_visit):
+    assert client.post('/api/visits/batch', json={'visits': [make_visit()]}).status_code == 201
+    visit = db.session.get(Visit, 1)
+
+    fields = visit_pdf_fields(visit)
+    scores = {section['section']: section['scores'] for section in fields['scores']}
+    assert scores['management'] == [4, 0, 2, 2, 2]
+    assert sum(len(section) for section in scores.values()) == 20
+
+    data, digest = get_visit_pdf(visit)
+    assert data.startswith(b'%PDF')
+    assert get_visit_pdf(visit) == (data, digest)
+
+
+def test_bundled_font_draws_the_arabic_text(client, make_visit, monkeypatch):
+    monkeypatch.delenv('PDF_FONT_PATH', raising=False)
+    monkeypatch.delenv('PDF_FONT_BOLD_PATH', raising=False)
+    assert pdf_reports._font_files() == pdf_reports.FONT_CANDIDATES[0]
+    assert all(os.path.isfile(path) for path in pdf_reports.FONT_CANDIDATES[0])
+
+    assert client.post('/api/visits/batch', json={'visits': [make_visit()]}).status_code == 201
+    data, digest = get_visit_pdf(db.session.get(Visit, 1))
+    assert b'DejaVuSans' in data
+
+
+def test_missing_configured_font_stops_startup(tmp_path, monkeypatch):
+    monkeypatch.setenv('PDF_FONT_PATH', str(tmp_path / 'NotoNaskhArabic-Regular.ttf'))
+    with pytest.raises(RuntimeError, match='PDF_FONT_PATH'):
+        create_app({'TESTING': True})
@@ -0,0 +1,125 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot queries.
+
+Each test runs the real code path, captures the SQL it sends to SQLite and
+asserts that every table access goes through an index, so a dropped index or
+a rewritten query that stops using one fails here instead of in production.
+"""
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from follow_ups import claim_due_follow_ups
+from models import db, User, Teacher, Supervisor, Visit, visit_page, decode_visit_cursor
+from views import dashboard_stats, dashboard_recent_visits
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+@pytest.fixture
+def data(app):
+    teacher = Teacher(name='أحمد محمد', email='ahmed@school.com', subject='الرياضيات', school='منارات المدينة المنورة')
+    supervisor = Supervisor(name='محمد علي', email='mohamed@edu.sa', specialty='الرياضيات')
+    user = User(username='admin', email='admin@school.com', name='مدير النظام', role='admin')
+    user.set_password('secret')
+    db.session.add_all([teacher, supervisor, user])
+    db.session.flush()
+    
+    start = datetime(2024, 1, 1)
+    db.session.add_all(Visit(
+        visit_date=start + timedelta(days=i % 40),
+        school_name='منارات المدينة المنورة',
+        teacher_id=teacher.id,
+        supervisor_id=supervisor.id,
+        subject='الرياضيات',
+        grade='الأول',
+        lesson_title=f'الدرس {i}',
+        follow_up_date=start + timedelta(days=i % 60) if i % 3 == 0 else None
+    ) for i in range(200))
+    db.session.commit()
+    return {'teacher': teacher, 'supervisor': supervisor}
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+    
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+    
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+
+def query_plans(statements):
+    with db.engine.connect() as conn:
+        return [
+            (statement, [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)])
+            for statement, parameters in statements
+        ]
+
+
+def assert_uses_indexes(statements, sorted_by_index=False):
+    assert statements, 'no SELECT statement was captured'
+    for statement, plan in query_plans(statements):
+        for step in plan:
+            scan = FULL_SCAN.match(step)
+            # Scans of subqueries (co-routines) are fine, scans of tables are not
+            assert not (scan and scan.group(1) in db.metadata.tables), \
+                f'full table scan ({step}) in:\n{statement}\nplan: {plan}'
+            if sorted_by_index:
+                assert 'TEMP B-TREE' not in step, f'sort not served by an index in:\n{statement}\nplan: {plan}'
+
+
+def test_visit_list_first_page(data):
+    with captured_statements() as statements:
+        visit_page({}, None, 50)
+    assert_uses_indexes(statements, sorted_by_index=True)
+
+
+def test_visit_list_next_page_seeks_the_cursor(data):
+    visits, next_cursor = visit_page({}, None, 50)
+    with captured_statements() as statements:
+        visit_page({}, decode_visit_cursor(next_cursor), 50)
+    assert_uses_indexes(statements, sorted_by_index=True)
+    
+    plans = query_plans(statements)
+    assert any('visit_date<' in step for _, plan in plans for step in plan), plans
+
+
+@pytest.mark.parametrize('filters', [
+    {'school': 'منارات المدينة المنورة'},
+    {'supervisor_id': 1, 'date_from': datetime(2024, 1, 5), 'date_to': datetime(2024, 1, 20)},
+    {'date_from': datetime(2024, 1, 5), 'date_to': datetime(2024, 1, 20)},
+])
+def test_filtered_visit_list(data, filters):
+    with captured_statements() as statements:
+        visit_page(filters, None, 50)
+    assert_uses_indexes(statements, sorted_by_index=True)
+
+
+def test_dashboard_queries(data):
+    with captured_statements() as statements:
+        dashboard_stats()
+        dashboard_recent_visits()
+    assert_uses_indexes(statements)
+
+
+@pytest.mark.parametrize('identifier', ['admin', 'admin@school.com'])
+def test_login_lookup(data, identifier):
+    with captured_statements() as statements:
+        assert User.find_user(identifier) is not None
+    assert_uses_indexes(statements)
+
+
+def test_follow_up_claim_is_a_range_seek(data):
+    with captured_statements() as statements:
+        assert claim_due_follow_ups(datetime(2024, 3, 1), datetime(2024, 1, 10), datetime(2024, 1, 20), batch_size=2)
+    assert_uses_indexes(statements, sorted_by_index=True)
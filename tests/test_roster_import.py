@@ -0,0 +1,69 @@
+"""
+The CSV import upserts teachers and supervisors on their email, batch by
+batch, and reports every rejected line instead of stopping.
+"""
+import io
+
+import pytest
+
+from models import db, Teacher, Supervisor
+from roster_import import import_roster
+from search import search_visits
+
+TEACHERS_CSV = (
+    'name,email,subject,school,phone\r\n'
+    'خالد سعيد,Khaled@School.com,العلوم,منارات المدينة المنورة,0500000001\r\n'
+    'أحمد محمد علي,ahmed@school.com,الرياضيات,منارات المدينة المنورة,\r\n'
+    'سارة,not-an-email,العلوم,منارات المدينة المنورة,\r\n'
+    'خالد,khaled@school.com,العلوم,منارات المدينة المنورة,\r\n'
+    'منى أحمد,mona@school.com,,منارات المدينة المنورة,\r\n'
+    'ليلى حسن,laila@school.com,اللغة العربية,منارات المدينة المنورة,\r\n'
+)
+
+
+def test_teachers_are_upserted_and_bad_lines_reported(client, make_visit):
+    client.post('/api/visits/batch', json={'visits': [make_visit()]})
+
+    report = import_roster('teachers', io.StringIO(TEACHERS_CSV, newline=''), batch_size=2)
+
+    assert (report['created'], report['updated']) == (2, 1)
+    assert report['errors'] == [
+        {'line': 4, 'email': 'not-an-email', 'errors': {'email': 'must be an email address'}},
+        {'line': 5, 'email': 'khaled@school.com', 'errors': {'email': 'duplicate of line 2'}},
+        {'line': 6, 'email': 'mona@school.com', 'errors': {'subject': 'required'}}
+    ]
+    assert Teacher.query.count() == 3
+    assert Teacher.query.filter_by(email='khaled@school.com').one().phone == '0500000001'
+    assert db.session.get(Teacher, 1).name == 'أحمد محمد علي'
+    # The renamed teacher's visits are found under the new name
+    assert len(search_visits('علي')[0]) == 1
+
+
+def test_mixed_case_email_updates_the_same_record(client):
+    db.session.add(Supervisor(name='سعد', email='Saad@Edu.sa', specialty='العلوم'))
+    db.session.commit()
+
+    report = import_roster('supervisors', ['name,email,specialty', 'سعد الحربي,SAAD@edu.sa,الرياضيات'])
+
+    assert (report['created'], report['updated']) == (0, 1)
+    supervisor = Supervisor.query.filter_by(email='saad@edu.sa').one()
+    assert (supervisor.name, supervisor.specialty) == ('سعد الحربي', 'الرياضيات')
+    assert Supervisor.query.count() == 2
+
+
+def test_missing_required_column_rejects_the_file(client):
+    with pytest.raises(ValueError, match='missing columns: specialty'):
+        import_roster('supervisors', ['name,email', 'سعد,saad@edu.sa'])
+    assert Supervisor.query.count() == 1
+
+
+def test_cli_import_reports_rejected_lines(client, app, tmp_path):
+    path = tmp_path / 'supervisors.csv'
+    path.write_text('name,email,specialty\nسعد,saad@edu.sa,العلوم\nنورة,,العلوم\n', encoding='utf-8')
+
+    result = app.test_cli_runner().invoke(args=['import-roster', 'supervisors', str(path)])
+
+    assert result.exit_code == 0
+    assert 'line 3 (no email): email: required' in result.output
+    assert '1 created, 0 updated, 1 rejected' in result.output
+    assert Supervisor.query.filter_by(email='saad@edu.sa').one().specialty == 'العلوم'
@@ -0,0 +1,43 @@
+"""
+The visit form pickers look teachers and supervisors up by name prefix in an
+in-memory index, which follows changes to the roster.
+"""
+from models import db, Teacher
+from roster_search import RosterIndex
+
+PEOPLE = [
+    {'id': 1, 'name': 'أحمد محمد', 'email': 'ahmed@school.com', 'school': 'المنارات', 'subject': 'الرياضيات'},
+    {'id': 2, 'name': 'محمود أحمد', 'email': 'mahmoud@school.com', 'school': 'المنارات', 'subject': 'العلوم'},
+    {'id': 3, 'name': 'إبراهيم سالم', 'email': 'ibrahim@school.com', 'school': 'الرواد', 'subject': 'الرياضيات'},
+]
+
+
+def test_every_word_matches_a_name_prefix():
+    index = RosterIndex(PEOPLE)
+
+    assert [p['id'] for p in index.search('احم')] == [1, 2]
+    assert [p['id'] for p in index.search('مح احمد')] == [1, 2]
+    assert [p['id'] for p in index.search('ابراهيم')] == [3]
+    assert [p['id'] for p in index.search('ibra')] == [3]
+    assert index.search('سعيد') == []
+
+
+def test_school_and_subject_filters():
+    index = RosterIndex(PEOPLE)
+
+    assert [p['id'] for p in index.search('', school='المنارات')] == [1, 2]
+    assert [p['id'] for p in index.search('', subject='الرياضيات', limit=1)] == [3]
+    assert [p['id'] for p in index.search('احمد', school='المنارات', subject='العلوم')] == [2]
+
+
+def test_api_follows_roster_changes(client):
+    response = client.get('/api/teachers', query_string={'q': 'أحمد'})
+    assert [p['id'] for p in response.json['results']] == [1]
+
+    db.session.add(Teacher(name='أحمد سالم', email='salem@school.com', subject='العلوم', school='الرواد'))
+    db.session.commit()
+    response = client.get('/api/teachers', query_string={'q': 'احمد', 'school': 'الرواد'})
+    assert [p['name'] for p in response.json['results']] == ['أحمد سالم']
+
+    response = client.get('/api/supervisors', query_string={'q': 'محمد', 'subject': 'الرياضيات'})
+    assert response.json['results'][0]['email'] == 'mohamed@edu.sa'
@@ -0,0 +1,48 @@
+"""
+Search matches Arabic text regardless of diacritics, hamza forms, ta marbuta
+and the definite article, and the index follows visits and teacher renames
+in the same transaction.
+"""
+from arabic import normalize_arabic, search_tokens
+from models import db, Teacher
+from search import search_visits
+
+
+def test_normalization_folds_spelling_variants():
+    assert normalize_arabic('إِدَارَةُ الصَّفِّ') == normalize_arabic('ادارة الصف')
+    assert search_tokens('المدرسة') == search_tokens('مدرسه')
+    assert search_tokens('إلى') == ['الي']
+
+
+def test_batch_visits_are_searchable(client, make_visit):
+    client.post('/api/visits/batch', json={'visits': [
+        make_visit(lesson_title='جمع الكسور'),
+        make_visit(lesson_title='الطرح', feedback_1='إدارةٌ ممتازة لزمن الحصّة')
+    ]})
+
+    visits, has_next = search_visits('ادارة الحصة')
+    assert [v.lesson_title for v in visits] == ['الطرح']
+    assert not has_next
+    assert [v.lesson_title for v in search_visits('كسور')[0]] == ['جمع الكسور']
+
+
+def test_results_are_paginated(client, make_visit):
+    client.post('/api/visits/batch', json={'visits': [make_visit() for _ in range(5)]})
+
+    first, has_next = search_visits('الجمع', page=1, page_size=3)
+    second, has_more = search_visits('الجمع', page=2, page_size=3)
+    assert (len(first), has_next, len(second), has_more) == (3, True, 2, False)
+    assert not {v.id for v in first} & {v.id for v in second}
+
+    response = client.get('/api/search', query_string={'q': 'جمع', 'page_size': 3})
+    assert response.json['next_page'] == 2
+    assert len(response.json['visits']) == 3
+
+
+def test_teacher_rename_is_reindexed(client, make_visit):
+    client.post('/api/visits/batch', json={'visits': [make_visit()]})
+
+    db.session.get(Teacher, 1).name = 'خالد سعيد'
+    db.session.commit()
+    assert len(search_visits('خالد')[0]) == 1
+    assert search_visits('أحمد')[0] == []
@@ -0,0 +1,53 @@
+"""
+The teacher profile reads a summary that is updated with each new visit; a
+full rebuild from the visits must give the same result.
+"""
+import pytest
+
+from models import db, TeacherSummary
+from schemas import SCORE_FIELD_NAMES
+from teacher_history import rebuild_teacher_summaries, ROLLING_WINDOW
+
+
+@pytest.fixture
+def scored_visit(make_visit):
+    def scored(day, score, **overrides):
+        return make_visit(visit_date=f'2024-03-{day:02d}', scores=dict.fromkeys(SCORE_FIELD_NAMES, score), **overrides)
+    return scored
+
+
+def post_visits(client, visits):
+    response = client.post('/api/visits/batch', json={'visits': visits})
+    assert response.status_code == 201
+
+
+def test_summary_follows_new_visits(client, scored_visit):
+    # Offline batches can deliver visits out of date order
+    post_visits(client, [scored_visit(day, 1) for day in (3, 1, 2)])
+    post_visits(client, [scored_visit(day, 3, suggestions=f'توصية {day}') for day in range(4, 4 + ROLLING_WINDOW)])
+
+    profile = client.get('/api/teacher/1').json
+    assert profile['visit_count'] == 3 + ROLLING_WINDOW
+    assert profile['last_visit_date'] == f'2024-03-{3 + ROLLING_WINDOW:02d}'
+    assert [point['date'] for point in profile['history']][:3] == ['2024-03-01', '2024-03-02', '2024-03-03']
+    assert profile['history'][0]['sections']['teaching'] == 1
+    assert profile['history'][-1]['rolling']['teaching'] == 3
+    assert profile['history'][3]['rolling']['teaching'] == round((1 + 1 + 1 + 3) / 4, 2)
+    assert profile['trend']['teaching'] == 2
+    assert profile['averages']['teaching'] == round((3 + 3 * ROLLING_WINDOW) / (3 + ROLLING_WINDOW), 2)
+    assert profile['recommendations'][0]['text'] == f'توصية {3 + ROLLING_WINDOW}'
+
+    assert client.get('/api/teacher/999').status_code == 404
+
+
+def test_rebuild_matches_incremental_summary(client, scored_visit):
+    post_visits(client, [scored_visit(day, day % 5, suggestions='راجع خطة الدرس' if day % 2 else None)
+                         for day in range(1, 11)])
+    incremental = client.get('/api/teacher/1').json
+
+    TeacherSummary.query.delete()
+    db.session.commit()
+    assert client.get('/api/teacher/1').json['history'] == []
+
+    rebuild_teacher_summaries(batch_size=1)
+    assert client.get('/api/teacher/1').json == incremental
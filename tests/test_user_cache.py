@@ -0,0 +1,48 @@
+"""
+Logged-in users are loaded from a per-process cache instead of one user query
+per request; editing or deactivating the account drops the cached copy.
+"""
+import pytest
+from flask import g
+from sqlalchemy import event
+
+from models import db, User
+from views import user_cache
+
+
+@pytest.fixture
+def user_queries(client):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM user' in statement:
+            statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', capture)
+    user_cache.clear()
+
+
+def get(client, url):
+    # The test client's requests share the test's app context, where Flask-Login
+    # keeps the user it loaded; drop it so each request loads the user again
+    g.pop('_login_user', None)
+    return client.get(url)
+
+
+def test_user_is_loaded_once_per_process(client, user_queries):
+    user_cache.clear()
+    for _ in range(3):
+        assert get(client, '/api/teacher/1').status_code == 200
+    assert len(user_queries) == 1
+
+
+def test_deactivated_user_loses_the_session(client, user_queries):
+    assert get(client, '/api/teacher/1').status_code == 200
+
+    db.session.execute(db.select(User).filter_by(username='admin')).scalar_one().is_active = False
+    db.session.commit()
+
+    response = get(client, '/api/teacher/1')
+    assert response.status_code == 302
+    assert '/login' in response.headers['Location']
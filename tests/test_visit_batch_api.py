@@ -0,0 +1,100 @@
+"""
+Visit submissions are validated up front: the offline batch API stores a
+batch all or nothing, never stores the same client_uuid twice, and reports
+invalid visits field by field.
+"""
+import json
+
+from models import Visit, VisitScore, ScoreRollup, EmailJob
+from schemas import SCORE_FIELD_NAMES
+
+
+def test_batch_is_inserted_with_scores_and_rollups(client, make_visit):
+    visits = [make_visit(), make_visit(send_email=True)]
+    response = client.post('/api/visits/batch', json={'visits': visits})
+
+    assert response.status_code == 201
+    assert response.json['created'] == 2
+    assert [v['status'] for v in response.json['visits']] == ['created', 'created']
+    assert Visit.query.count() == 2
+    assert VisitScore.query.count() == 40
+    assert EmailJob.query.count() == 1
+
+    rollup = ScoreRollup.query.filter_by(dimension='teacher', dimension_key='1', section='management').one()
+    assert (rollup.visit_count, rollup.score_sum, rollup.score_count) == (2, 20, 10)
+
+
+def test_resent_batch_is_not_stored_twice(client, make_visit):
+    visits = [make_visit(), make_visit()]
+    first = client.post('/api/visits/batch', json={'visits': visits})
+    second = client.post('/api/visits/batch', json={'visits': visits + [make_visit()]})
+
+    assert second.status_code == 201
+    assert second.json['created'] == 1
+    assert second.json['duplicates'] == 2
+    assert [v['id'] for v in second.json['visits'][:2]] == [v['id'] for v in first.json['visits']]
+    assert Visit.query.count() == 3
+
+    rollup = ScoreRollup.query.filter_by(dimension='school', section='teaching').one()
+    assert rollup.visit_count == 3
+
+
+def test_invalid_visit_rejects_the_whole_batch(client, make_visit):
+    visits = [make_visit(), make_visit(visit_date='10/03/2024', status='done')]
+    visits[1]['scores'].update(teaching_3=5, feedback_2='4')
+    del visits[1]['scores']['feedback_5']
+    response = client.post('/api/visits/batch', json={'visits': visits})
+
+    assert response.status_code == 400
+    assert response.json['visits'] == [{
+        'index': 1,
+        'client_uuid': visits[1]['client_uuid'],
+        'errors': {
+            'visit_date': 'must be a YYYY-MM-DD date',
+            'scores': {'teaching_3': 'must be an integer from 0 to 4', 'feedback_5': 'required'},
+            'status': 'must be one of: مكتملة, معلقة, ملغاة'
+        }
+    }]
+    assert Visit.query.count() == 0
+
+
+def test_unknown_teacher_is_reported(client, make_visit):
+    visits = [make_visit(teacher_id=99), make_visit(supervisor_id=7)]
+    response = client.post('/api/visits/batch', json={'visits': visits})
+
+    assert response.status_code == 400
+    assert [(v['index'], v['errors']) for v in response.json['visits']] == [
+        (0, {'teacher_id': 'unknown teacher'}),
+        (1, {'supervisor_id': 'unknown supervisor'})
+    ]
+
+
+def test_form_scores_are_stored_as_integers(client):
+    form = {name: '3' for name in SCORE_FIELD_NAMES}
+    form.update(visit_date='2024-03-10', school_name='منارات المدينة المنورة', teacher_id='1', supervisor_id='1',
+                subject='الرياضيات', grade='الأول', lesson_title='الجمع', feedback_text_1='تفاعل جيد',
+                supervisor_signature='محمد علي', visit_status='معلقة')
+    response = client.post('/visit/new', data=form)
+
+    assert response.status_code == 302
+    visit = Visit.query.one()
+    assert json.loads(visit.teaching_scores)['teaching_10'] == 3
+    assert visit.status == 'معلقة'
+
+
+def test_rejected_form_is_shown_again_as_typed(client):
+    form = {name: '3' for name in SCORE_FIELD_NAMES}
+    form.update(visit_date='2024-03-10', school_name='منارات المدينة المنورة', teacher_id='1', supervisor_id='1',
+                subject='الرياضيات', grade='الأول', lesson_title='الجمع', feedback_text_1='تفاعل جيد',
+                supervisor_signature='', visit_status='معلقة')
+    response = client.post('/visit/new', data=form)
+
+    assert response.status_code == 400
+    assert Visit.query.count() == 0
+    page = response.get_data(as_text=True)
+    assert 'name="lesson_title" value="الجمع"' in page
+    assert 'name="teaching_10" value="3" checked' in page
+    assert 'تفاعل جيد</textarea>' in page
+    assert '<option value="معلقة" selected>' in page
+    # The e-mail box was left unticked
+    assert 'name="send_email">' in page
@@ -0,0 +1,68 @@
+"""
+The spreadsheet export has one row per visit with the 20 criterion scores
+expanded into their own columns, in CSV and in XLSX.
+"""
+import csv
+import io
+import zipfile
+from xml.etree import ElementTree
+
+from reports import VISIT_EXPORT_COLUMNS
+
+SHEET_NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def test_csv_has_one_column_per_criterion(client, make_visit):
+    client.post('/api/visits/batch', json={'visits': [make_visit(visit_date='2024-03-11'), make_visit()]})
+
+    response = client.get('/visits/export.csv')
+    assert response.status_code == 200
+    assert response.is_streamed
+    rows = list(csv.reader(io.StringIO(response.get_data().decode('utf-8-sig'))))
+
+    assert rows[0] == [label for label, key in VISIT_EXPORT_COLUMNS]
+    assert len(rows[0]) == 13 + 20
+    assert [row[1] for row in rows[1:]] == ['2024-03-10', '2024-03-11']
+    assert rows[1][3:5] == ['أحمد محمد', 'محمد علي']
+    assert rows[1][13:18] == ['4', '0', '2', '2', '2']
+
+
+def test_export_follows_the_visit_filters(client, make_visit):
+    client.post('/api/visits/batch', json={'visits': [make_visit(visit_date='2024-03-11'), make_visit()]})
+
+    response = client.get('/visits/export.csv', query_string={'date_from': '2024-03-11'})
+    assert len(response.get_data().decode('utf-8-sig').splitlines()) == 2
+
+
+def test_xlsx_sheet_holds_numeric_scores(client, make_visit):
+    client.post('/api/visits/batch', json={'visits': [make_visit(lesson_title='الجمع & الطرح')]})
+
+    response = client.get('/visits/export.xlsx')
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as workbook:
+        assert workbook.testzip() is None
+        sheet = ElementTree.fromstring(workbook.read('xl/worksheets/sheet1.xml'))
+
+    rows = sheet.findall('s:sheetData/s:row', SHEET_NS)
+    assert len(rows) == 2
+    cells = rows[1].findall('s:c', SHEET_NS)
+    assert len(cells) == len(VISIT_EXPORT_COLUMNS)
+    assert cells[7].find('s:is/s:t', SHEET_NS).text == 'الجمع & الطرح'
+    assert [cell.find('s:v', SHEET_NS).text for cell in cells[13:15]] == ['4', '0']
+
+
+def test_formula_like_text_is_not_a_formula(client, make_visit):
+    client.post('/api/visits/batch', json={'visits': [make_visit(
+        lesson_title='@SUM(A1:A9)', feedback_1='=HYPERLINK("http://evil.example","اضغط هنا")', suggestions='-2+3'
+    )]})
+
+    csv_row = list(csv.reader(io.StringIO(client.get('/visits/export.csv').get_data().decode('utf-8-sig'))))[1]
+    assert (csv_row[7], csv_row[9], csv_row[11]) == (
+        "'@SUM(A1:A9)", '\'=HYPERLINK("http://evil.example","اضغط هنا")', "'-2+3"
+    )
+    assert csv_row[13:15] == ['4', '0']
+
+    with zipfile.ZipFile(io.BytesIO(client.get('/visits/export.xlsx').get_data())) as workbook:
+        sheet = ElementTree.fromstring(workbook.read('xl/worksheets/sheet1.xml'))
+    cells = sheet.findall('s:sheetData/s:row', SHEET_NS)[1].findall('s:c', SHEET_NS)
+    assert cells[7].find('s:is/s:t', SHEET_NS).text == "'@SUM(A1:A9)"
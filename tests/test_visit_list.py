@@ -0,0 +1,54 @@
+"""
+The visit list pages newest first by (visit_date, id): following the next
+page links, with or without filters, lists every visit exactly once, even
+when a page ends among visits of the same second.
+"""
+import re
+from datetime import datetime
+
+import pytest
+
+from models import db, Visit
+
+# visit id -> (visit_date, school); ids 1 to 4 share one second
+VISITS = {
+    1: (datetime(2024, 3, 10, 9, 0, 0, 200000), 'منارات المدينة المنورة'),
+    2: (datetime(2024, 3, 10, 9, 0, 0, 500000), 'الرواد'),
+    3: (datetime(2024, 3, 10, 9, 0, 0, 500000), 'منارات المدينة المنورة'),
+    4: (datetime(2024, 3, 10, 9, 0, 0, 900000), 'الرواد'),
+    5: (datetime(2024, 3, 10), 'الرواد'),
+    6: (datetime(2024, 3, 11), 'منارات المدينة المنورة'),
+    7: (datetime(2024, 3, 10, 9, 0, 0, 200000), 'الرواد'),
+}
+
+
+@pytest.fixture
+def visits(client, make_visit):
+    batch = [make_visit(school_name=school) for visit_date, school in VISITS.values()]
+    assert client.post('/api/visits/batch', json={'visits': batch}).status_code == 201
+    for visit_id, (visit_date, school) in VISITS.items():
+        db.session.get(Visit, visit_id).visit_date = visit_date
+    db.session.commit()
+
+
+def listed_ids(client, **args):
+    """Visit ids of every page, following the next page links"""
+    ids = []
+    query_string = args
+    while query_string is not None:
+        page = client.get('/visits', query_string=query_string).get_data(as_text=True)
+        ids += [int(visit_id) for visit_id in re.findall(r'/visit/(\d+)/pdf', page)]
+        after = re.search(r'after=([^&"]+)', page)
+        query_string = dict(args, after=after.group(1)) if after else None
+    return ids
+
+
+@pytest.mark.parametrize('page_size', [1, 2, 3, 50])
+def test_pages_list_every_visit_once(client, visits, page_size):
+    assert listed_ids(client, page_size=page_size) == [6, 4, 3, 2, 7, 1, 5]
+
+
+@pytest.mark.parametrize('page_size', [1, 2])
+def test_filtered_pages_list_every_match_once(client, visits, page_size):
+    assert listed_ids(client, page_size=page_size, school='الرواد') == [4, 2, 7, 5]
+    assert listed_ids(client, page_size=page_size, date_to='2024-03-10') == [4, 3, 2, 7, 1, 5]
@@ -0,0 +1,57 @@
+"""
+In-process login throttling.
+
+Failed logins are counted per key (account identifier, client address) over a
+sliding window. A blocked key is rejected before the user lookup and password
+hash, so a brute-force burst costs almost no CPU. Counts are per worker, which
+bounds an attacker at ``max_attempts`` per worker per window.
+"""
+import threading
+import time
+from collections import deque
+
+
+class LoginThrottle:
+    def __init__(self, max_attempts, window_seconds, max_keys=10000):
+        self.max_attempts = max_attempts
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._failures = {}
+        self._lock = threading.Lock()
+    
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window_seconds:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+    
+    def is_blocked(self, key):
+        with self._lock:
+            failures = self._recent(key, time.monotonic())
+            return failures is not None and len(failures) >= self.max_attempts
+    
+    def record_failure(self, key):
+        now = time.monotonic()
+        with self._lock:
+            if key not in self._failures and len(self._failures) >= self.max_keys:
+                self._prune(now)
+            failures = self._recent(key, now) or self._failures.setdefault(key, deque())
+            failures.append(now)
+    
+    def reset(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+    
+    def _prune(self, now):
+        for key in list(self._failures):
+            self._recent(key, now)
+        # Still full of active keys: drop the ones with the oldest latest failure
+        if len(self._failures) >= self.max_keys:
+            by_age = sorted(self._failures, key=lambda k: self._failures[k][-1])
+            for key in by_age[:len(by_age) // 10 + 1]:
+                del self._failures[key]
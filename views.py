@@ -0,0 +1,770 @@
+"""
+Web routes, registered on the application by create_app() in app.py.
+"""
+import json
+import time
+from functools import wraps
+from io import BytesIO, TextIOWrapper
+
+from flask import (Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify,
+                   send_file, stream_with_context, g, session, has_request_context)
+from flask_login import LoginManager, login_user, login_required, logout_user, current_user
+from sqlalchemy import event, select, union
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from cache import TTLCache
+from throttle import LoginThrottle
+from models import (db, RoutingSession, User, Teacher, Supervisor, Visit, EmailJob, VISIT_STATUSES,
+                    SCORE_SECTION_LABELS, ROLLUP_DIMENSIONS, visit_score_rows, save_visit_scores,
+                    rollup_visit_scores, load_analytics, enqueue_visit_email, VISIT_FILTER_FIELDS,
+                    parse_visit_filters, filtered_visits_query, decode_visit_cursor, visit_page,
+                    enqueue_pending_reports, SCORE_SECTIONS, insert_visits)
+from search import index_visits, search_visits
+from roster_import import ROSTERS, import_roster
+from roster_search import roster_index, roster_index_cache
+from schemas import VISIT_SCHEMA, BATCH_VISIT_SCHEMA, SCORE_FIELD_NAMES
+from teacher_history import record_teacher_visits, load_teacher_profile
+from reports import (visit_pdf_fields, visit_pdf_digest, get_visit_pdf, export_visit_reports_zip,
+                     export_visits_spreadsheet)
+
+bp = Blueprint('main', __name__)
+
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
+
+# Logged-in users, cached per process so authenticated requests skip the user query.
+# Entries are detached from the session; edits in this process invalidate them
+# immediately, edits made by other workers show up once the TTL expires.
+user_cache = TTLCache(ttl=0)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    user_cache.invalidate(str(target.id))
+
+# Failed logins per account identifier and per client address
+login_throttle = LoginThrottle(max_attempts=0, window_seconds=0)
+login_ip_throttle = LoginThrottle(max_attempts=0, window_seconds=0)
+
+# Dashboard counters, cached per process and invalidated by the routes that change them
+dashboard_cache = TTLCache(ttl=0)
+
+def configure(app):
+    """Size the per-process caches and throttles from the app config"""
+    user_cache.ttl = app.config['USER_CACHE_TTL']
+    dashboard_cache.ttl = app.config['DASHBOARD_CACHE_TTL']
+    roster_index_cache.ttl = app.config['ROSTER_INDEX_TTL']
+    login_throttle.max_attempts = app.config['LOGIN_MAX_ATTEMPTS']
+    login_ip_throttle.max_attempts = app.config['LOGIN_IP_MAX_ATTEMPTS']
+    login_throttle.window_seconds = login_ip_throttle.window_seconds = app.config['LOGIN_THROTTLE_WINDOW']
+
+# Login manager user loader
+@login_manager.user_loader
+def load_user(user_id):
+    user = user_cache.get(user_id)
+    if user is None:
+        user = db.session.get(User, int(user_id))
+        if user is None:
+            return None
+        db.session.expunge(user)
+        user_cache.set(user_id, user)
+    
+    # Deactivated accounts lose their session on the next request
+    return user if user.is_active else None
+
+def invalidate_dashboard_cache():
+    dashboard_cache.clear()
+
+def dashboard_stats():
+    schools = union(select(Teacher.school), select(Visit.school_name)).subquery()
+    return {
+        'total_visits': Visit.query.count(),
+        'teachers_count': Teacher.query.count(),
+        'supervisors_count': Supervisor.query.count(),
+        'schools_count': db.session.query(db.func.count()).select_from(schools).scalar()
+    }
+
+def dashboard_recent_visits():
+    # Plain dicts, so cached entries never touch a closed session
+    visits = Visit.query.options(joinedload(Visit.teacher)).order_by(Visit.visit_date.desc()).limit(5).all()
+    return [{
+        'id': visit.id,
+        'visit_date': visit.visit_date,
+        'teacher_name': visit.teacher.name,
+        'school_name': visit.school_name,
+        'subject': visit.subject
+    } for visit in visits]
+
+# Role-based access control decorator
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated or current_user.role != 'admin':
+            flash('غير مصرح لك بالوصول إلى هذه الصفحة')
+            return redirect(url_for('.dashboard'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+def read_only(f):
+    """Serve the view from the read replica when one is configured (DATABASE_REPLICA_URL)"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if session.get('read_primary_until', 0) < time.time():
+            g.use_replica = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+@event.listens_for(RoutingSession, 'after_commit')
+def stick_to_primary_after_write(db_session):
+    if has_request_context() and 'replica' in db.engines:
+        session['read_primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+
+# Routes
+@bp.route('/')
+def index():
+    return redirect(url_for('.login'))
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('.dashboard'))
+        
+    if request.method == 'POST':
+        identifier = request.form.get('username') or ''
+        password = request.form.get('password')
+        
+        # Reject brute-force bursts before paying for the lookup and the hash
+        identifier_key = identifier.strip().lower()
+        client_key = request.remote_addr or ''
+        if login_throttle.is_blocked(identifier_key) or login_ip_throttle.is_blocked(client_key):
+            flash('محاولات دخول كثيرة، يرجى المحاولة لاحقاً')
+            return render_template('login.html'), 429
+        
+        user = User.find_user(identifier)
+        
+        if user and user.check_password(password):
+            if not user.is_active:
+                flash('حساب المستخدم غير مفعل')
+                return render_template('login.html')
+            
+            # Upgrade hashes made with outdated parameters while we have the plain password
+            if user.password_needs_rehash():
+                user.set_password(password)
+                db.session.commit()
+            
+            login_throttle.reset(identifier_key)
+            login_user(user)
+            next_page = request.args.get('next')
+            return redirect(next_page or url_for('.dashboard'))
+        else:
+            login_throttle.record_failure(identifier_key)
+            login_ip_throttle.record_failure(client_key)
+            flash('اسم المستخدم/البريد الإلكتروني أو كلمة المرور غير صحيحة')
+    return render_template('login.html')
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    return redirect(url_for('.login'))
+
+@bp.route('/dashboard')
+@login_required
+@read_only
+def dashboard():
+    stats = dashboard_cache.get_or_set('stats', dashboard_stats)
+    recent_visits = dashboard_cache.get_or_set('recent_visits', dashboard_recent_visits)
+    
+    return render_template('dashboard.html', 
+                         recent_visits=recent_visits,
+                         **stats)
+
+# Visit columns taken as-is from a validated VISIT_SCHEMA payload
+VISIT_COLUMNS = ('visit_date', 'school_name', 'teacher_id', 'supervisor_id', 'subject', 'grade', 'lesson_title',
+                 'feedback_1', 'feedback_2', 'suggestions', 'follow_up_date', 'supervisor_signature', 'status',
+                 'client_uuid')
+
+# Labels of the visit_form.html fields, for validation messages
+VISIT_FIELD_LABELS = {
+    'visit_date': 'التاريخ',
+    'school_name': 'المدرسة',
+    'teacher_id': 'اسم المعلم',
+    'supervisor_id': 'المشرف التربوي',
+    'subject': 'المادة',
+    'grade': 'الفصل',
+    'lesson_title': 'عنوان الدرس',
+    'scores': 'بنود التقييم',
+    'feedback_1': 'التغذية الراجعة (1)',
+    'feedback_2': 'التغذية الراجعة (2)',
+    'suggestions': 'التوصيات والمقترحات',
+    'follow_up_date': 'موعد المتابعة',
+    'supervisor_signature': 'توقيع المشرف',
+    'status': 'حالة الزيارة'
+}
+
+def visit_payload_from_form(form):
+    """Map the visit_form.html field names onto a VISIT_SCHEMA payload"""
+    payload = {name: form.get(name) for name in VISIT_COLUMNS}
+    payload.update(
+        feedback_1=form.get('feedback_text_1'),
+        feedback_2=form.get('feedback_text_2'),
+        status=form.get('visit_status'),
+        send_email=form.get('send_email'),
+        scores={name: form.get(name) for name in SCORE_FIELD_NAMES}
+    )
+    return payload
+
+def check_visit_references(visits):
+    """Look up the teachers and supervisors of validated visits, one query per table.
+    
+    Returns (teacher_emails, errors), errors being {index: {field: message}}.
+    """
+    teacher_emails = dict(db.session.query(Teacher.id, Teacher.email).filter(
+        Teacher.id.in_({visit['teacher_id'] for visit in visits})))
+    supervisor_ids = {i for (i,) in db.session.query(Supervisor.id).filter(
+        Supervisor.id.in_({visit['supervisor_id'] for visit in visits}))}
+    
+    errors = {}
+    for index, visit in enumerate(visits):
+        visit_errors = {}
+        if visit['teacher_id'] not in teacher_emails:
+            visit_errors['teacher_id'] = 'unknown teacher'
+        if visit['supervisor_id'] not in supervisor_ids:
+            visit_errors['supervisor_id'] = 'unknown supervisor'
+        if visit_errors:
+            errors[index] = visit_errors
+    return teacher_emails, errors
+
+def visit_row(visit):
+    """Split a validated visit into Visit column values and per-section scores"""
+    row = {name: visit[name] for name in VISIT_COLUMNS}
+    section_scores = {
+        section: {f'{section}_{i}': visit['scores'][f'{section}_{i}'] for i in range(1, count + 1)}
+        for section, count in SCORE_SECTIONS.items()
+    }
+    for section, scores in section_scores.items():
+        row[f'{section}_scores'] = json.dumps(scores)
+    return row, section_scores
+
+@bp.route('/visit/new', methods=['GET', 'POST'])
+@login_required
+def new_visit():
+    status_code = 200
+    if request.method == 'POST':
+        # Validate the whole submission before any write
+        visit, errors = VISIT_SCHEMA.validate(visit_payload_from_form(request.form))
+        if not errors:
+            errors = check_visit_references([visit])[1].get(0, {})
+        
+        if errors:
+            flash('يرجى تصحيح الحقول التالية: ' + '، '.join(VISIT_FIELD_LABELS.get(field, field) for field in errors))
+            status_code = 400
+        else:
+            try:
+                row, section_scores = visit_row(visit)
+                new_visit = Visit(**row)
+                db.session.add(new_visit)
+                db.session.flush()
+                score_rows = visit_score_rows(new_visit.id, section_scores)
+                save_visit_scores(score_rows)
+                rollup_visit_scores(new_visit, score_rows)
+                index_visits([new_visit.id])
+                record_teacher_visits([new_visit.id])
+                db.session.commit()
+                invalidate_dashboard_cache()
+                
+                # Queue the email if requested; worker.py delivers it
+                if visit['send_email']:
+                    enqueue_visit_email(new_visit)
+                    db.session.commit()
+                    flash('تمت جدولة إرسال التقرير إلى البريد الإلكتروني للمعلم')
+                
+                flash('تم حفظ بيانات الزيارة بنجاح')
+                return redirect(url_for('.visit_reports'))
+            
+            except Exception as e:
+                db.session.rollback()
+                flash(f'حدث خطأ أثناء حفظ البيانات: {str(e)}')
+    
+    # The pickers load their options from /api/teachers and /api/supervisors as the
+    # user types; only a choice carried over from a rejected submission is rendered
+    teacher = db.session.get(Teacher, request.form.get('teacher_id', type=int) or 0)
+    supervisor = db.session.get(Supervisor, request.form.get('supervisor_id', type=int) or 0)
+    return render_template('visit_form.html', 
+                          form=request.form,
+                          teacher=teacher, 
+                          supervisor=supervisor), status_code
+
+@bp.route('/api/<any(teachers, supervisors):kind>')
+@login_required
+def roster_lookup(kind):
+    """Typeahead for the visit form pickers: ?q=name prefix&school=...&subject=...&limit=..."""
+    limit = max(1, min(request.args.get('limit', type=int) or 20, current_app.config['ROSTER_LOOKUP_MAX_RESULTS']))
+    people = roster_index(kind).search(
+        request.args.get('q', ''),
+        school=request.args.get('school'),
+        subject=request.args.get('subject'),
+        limit=limit
+    )
+    return jsonify({'results': people})
+
+@bp.route('/api/visits/batch', methods=['POST'])
+@login_required
+def create_visits_batch():
+    """Store visits queued by an offline client, all or nothing, in one round trip.
+    
+    Body: {"visits": [{"client_uuid": ..., "visit_date": "YYYY-MM-DD", ...}, ...]}.
+    Visits whose client_uuid is already stored are reported as duplicates and not
+    inserted again, so a client can safely resend a batch after a lost response.
+    """
+    payload = request.get_json(silent=True)
+    items = payload.get('visits') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected {"visits": [...]} with at least one visit'}), 400
+    if len(items) > current_app.config['VISIT_BATCH_MAX_SIZE']:
+        return jsonify({'error': f"At most {current_app.config['VISIT_BATCH_MAX_SIZE']} visits per batch"}), 400
+    
+    def invalid(errors):
+        return jsonify({'error': 'Invalid visits', 'visits': [{
+            'index': index,
+            'client_uuid': items[index].get('client_uuid') if isinstance(items[index], dict) else None,
+            'errors': visit_errors
+        } for index, visit_errors in sorted(errors.items())]}), 400
+    
+    # Shape and values first, without touching the database
+    visits = []
+    errors = {}
+    seen = set()
+    for index, item in enumerate(items):
+        visit, visit_errors = BATCH_VISIT_SCHEMA.validate(item)
+        if not visit_errors and visit['client_uuid'] in seen:
+            visit_errors = {'client_uuid': 'duplicated in this batch'}
+        if visit_errors:
+            errors[index] = visit_errors
+        else:
+            seen.add(visit['client_uuid'])
+            visits.append(visit)
+    if errors:
+        return invalid(errors)
+    
+    teacher_emails, errors = check_visit_references(visits)
+    if errors:
+        return invalid(errors)
+    
+    # A concurrent resend of the same batch can win the race for a client_uuid;
+    # the retry then finds those visits stored and reports them as duplicates
+    rows = [visit_row(visit) for visit in visits]
+    for attempt in range(2):
+        existing = dict(db.session.query(Visit.client_uuid, Visit.id).filter(Visit.client_uuid.in_(seen)))
+        new_rows = [(row, section_scores) for row, section_scores in rows if row['client_uuid'] not in existing]
+        try:
+            created = insert_visits(new_rows)
+            index_visits(created.values())
+            record_teacher_visits(created.values())
+            jobs = [{
+                'visit_id': created[visit['client_uuid']],
+                'recipient': teacher_emails[visit['teacher_id']],
+                'max_attempts': current_app.config['EMAIL_JOB_MAX_ATTEMPTS']
+            } for visit in visits if visit['send_email'] and visit['client_uuid'] in created]
+            if jobs:
+                db.session.execute(db.insert(EmailJob), jobs)
+            db.session.commit()
+            break
+        except IntegrityError:
+            db.session.rollback()
+            if attempt:
+                raise
+    if created:
+        invalidate_dashboard_cache()
+    
+    results = [{
+        'client_uuid': visit['client_uuid'],
+        'id': created.get(visit['client_uuid']) or existing[visit['client_uuid']],
+        'status': 'created' if visit['client_uuid'] in created else 'duplicate'
+    } for visit in visits]
+    return jsonify({
+        'created': len(created),
+        'duplicates': len(visits) - len(created),
+        'visits': results
+    }), 201 if created else 200
+
+@bp.route('/visits')
+@login_required
+@read_only
+def visit_reports():
+    filters = parse_visit_filters(request.args)
+    filter_args = {field: request.args.get(field) for field in VISIT_FILTER_FIELDS if request.args.get(field)}
+    
+    page_size = request.args.get('page_size', type=int) or current_app.config['VISITS_PAGE_SIZE']
+    page_size = max(1, min(page_size, current_app.config['VISITS_MAX_PAGE_SIZE']))
+    
+    cursor = decode_visit_cursor(request.args.get('after'))
+    visits, next_cursor = visit_page(filters, cursor, page_size)
+    
+    supervisors = Supervisor.query.order_by(Supervisor.name).all()
+    return render_template('visit_reports.html',
+                         visits=visits,
+                         supervisors=supervisors,
+                         statuses=VISIT_STATUSES,
+                         filter_args=filter_args,
+                         page_size=page_size,
+                         is_first_page=cursor is None,
+                         next_cursor=next_cursor)
+
+@bp.route('/visits/send_pending', methods=['POST'])
+@login_required
+def send_pending_reports():
+    """Queue the reports of all visits in the current filter that were not emailed yet"""
+    filters = parse_visit_filters(request.form)
+    filter_args = {field: request.form.get(field) for field in VISIT_FILTER_FIELDS if request.form.get(field)}
+    
+    try:
+        count = enqueue_pending_reports(filters)
+        flash(f'تمت جدولة إرسال {count} تقرير إلى المعلمين')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'حدث خطأ: {str(e)}')
+    
+    return redirect(url_for('.visit_reports', **filter_args))
+
+@bp.route('/visit/<int:visit_id>')
+@login_required
+@read_only
+def visit_details(visit_id):
+    visit = Visit.query.get_or_404(visit_id)
+    
+    # Parse JSON scores
+    management_scores = json.loads(visit.management_scores) if visit.management_scores else {}
+    teaching_scores = json.loads(visit.teaching_scores) if visit.teaching_scores else {}
+    feedback_scores = json.loads(visit.feedback_scores) if visit.feedback_scores else {}
+    
+    email_job = visit.email_jobs.order_by(EmailJob.id.desc()).first()
+    
+    return render_template('visit_details.html', 
+                         visit=visit,
+                         email_job=email_job,
+                         management_scores=management_scores,
+                         teaching_scores=teaching_scores,
+                         feedback_scores=feedback_scores)
+
+@bp.route('/visit/<int:visit_id>/send_email')
+@login_required
+def send_visit_email(visit_id):
+    """إرسال التقرير بالبريد الإلكتروني"""
+    visit = Visit.query.get_or_404(visit_id)
+    
+    try:
+        enqueue_visit_email(visit)
+        db.session.commit()
+        flash('تمت جدولة إرسال التقرير إلى البريد الإلكتروني للمعلم')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'حدث خطأ: {str(e)}')
+    
+    return redirect(url_for('.visit_details', visit_id=visit_id))
+
+@bp.route('/visit/<int:visit_id>/pdf')
+@login_required
+@read_only
+def generate_pdf(visit_id):
+    visit = Visit.query.options(
+        joinedload(Visit.teacher),
+        joinedload(Visit.supervisor)
+    ).filter_by(id=visit_id).first_or_404()
+    
+    # The digest is computed without rendering, so an unchanged PDF costs nothing
+    digest = visit_pdf_digest(visit_pdf_fields(visit))
+    if digest in request.if_none_match:
+        response = current_app.response_class(status=304)
+    else:
+        data, digest = get_visit_pdf(visit)
+        response = send_file(BytesIO(data), as_attachment=True, download_name=f"تقرير_زيارة_{visit_id}.pdf", mimetype='application/pdf')
+    response.set_etag(digest)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route('/visits/export.zip')
+@login_required
+@read_only
+def export_visit_reports():
+    """Download the PDFs of every visit in the current filter as one ZIP archive"""
+    filters = parse_visit_filters(request.args)
+    total = filtered_visits_query(filters).count()
+    if not total:
+        flash('لا توجد زيارات ضمن التصفية الحالية')
+        return redirect(url_for('.visit_reports', **request.args))
+    
+    def log_progress(done, total):
+        if done % 50 == 0 or done == total:
+            current_app.logger.info('Bulk PDF export: %s/%s reports', done, total)
+    
+    archive = export_visit_reports_zip(filters, total, progress=log_progress)
+    return current_app.response_class(
+        stream_with_context(archive),
+        mimetype='application/zip',
+        headers={'Content-Disposition': 'attachment; filename=visit_reports.zip'}
+    )
+
+SPREADSHEET_MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+@bp.route('/visits/export.<any(csv, xlsx):file_format>')
+@login_required
+@read_only
+def export_visits(file_format):
+    """Download every visit in the current filter with its 20 criterion scores as a spreadsheet"""
+    filters = parse_visit_filters(request.args)
+    return current_app.response_class(
+        stream_with_context(export_visits_spreadsheet(filters, file_format)),
+        mimetype=SPREADSHEET_MIMETYPES[file_format],
+        headers={'Content-Disposition': f'attachment; filename=visits.{file_format}'}
+    )
+
+def search_page_args(args):
+    """(query, page, page_size) from the search request args"""
+    page = max(args.get('page', type=int) or 1, 1)
+    page_size = args.get('page_size', type=int) or current_app.config['SEARCH_PAGE_SIZE']
+    return (args.get('q') or '').strip(), page, max(1, min(page_size, current_app.config['VISITS_MAX_PAGE_SIZE']))
+
+@bp.route('/search')
+@login_required
+@read_only
+def search():
+    query, page, page_size = search_page_args(request.args)
+    visits, has_next = search_visits(query, page, page_size) if query else ([], False)
+    return render_template('search.html',
+                         query=query,
+                         visits=visits,
+                         page=page,
+                         page_size=page_size,
+                         has_next=has_next)
+
+@bp.route('/api/search')
+@login_required
+@read_only
+def search_api():
+    query, page, page_size = search_page_args(request.args)
+    if not query:
+        return jsonify({'error': 'Missing search query: q'}), 400
+    visits, has_next = search_visits(query, page, page_size)
+    return jsonify({
+        'query': query,
+        'page': page,
+        'next_page': page + 1 if has_next else None,
+        'visits': [{
+            'id': visit.id,
+            'visit_date': visit.visit_date.strftime('%Y-%m-%d'),
+            'teacher_name': visit.teacher.name,
+            'supervisor_name': visit.supervisor.name,
+            'school_name': visit.school_name,
+            'subject': visit.subject,
+            'lesson_title': visit.lesson_title,
+            'url': url_for('.visit_details', visit_id=visit.id)
+        } for visit in visits]
+    })
+
+def analytics_page_args(args):
+    """(dimension, page, page_size) from the analytics request args; dimension is None for all"""
+    page = max(args.get('page', type=int) or 1, 1)
+    page_size = args.get('page_size', type=int) or current_app.config['ANALYTICS_PAGE_SIZE']
+    return args.get('dimension') or None, page, max(1, min(page_size, current_app.config['VISITS_MAX_PAGE_SIZE']))
+
+@bp.route('/analytics')
+@login_required
+@read_only
+def analytics():
+    dimension, page, page_size = analytics_page_args(request.args)
+    if dimension not in ROLLUP_DIMENSIONS:
+        dimension, page = None, 1
+    return render_template('analytics.html',
+                         analytics=load_analytics((dimension,) if dimension else ROLLUP_DIMENSIONS, page, page_size),
+                         page_size=page_size,
+                         section_labels=SCORE_SECTION_LABELS)
+
+@bp.route('/api/analytics')
+@login_required
+@read_only
+def analytics_api():
+    dimension, page, page_size = analytics_page_args(request.args)
+    if dimension and dimension not in ROLLUP_DIMENSIONS:
+        return jsonify({'error': f'Unknown dimension: {dimension}'}), 400
+    return jsonify(load_analytics((dimension,) if dimension else ROLLUP_DIMENSIONS, page, page_size))
+
+@bp.route('/teachers')
+@login_required
+@read_only
+def teachers_list():
+    teachers = Teacher.query.all()
+    return render_template('teachers.html', teachers=teachers)
+
+@bp.route('/teacher/<int:teacher_id>')
+@login_required
+@read_only
+def teacher_profile(teacher_id):
+    teacher = Teacher.query.get_or_404(teacher_id)
+    return render_template('teacher_profile.html',
+                         profile=load_teacher_profile(teacher),
+                         section_labels=SCORE_SECTION_LABELS)
+
+@bp.route('/api/teacher/<int:teacher_id>')
+@login_required
+@read_only
+def teacher_profile_api(teacher_id):
+    teacher = db.session.get(Teacher, teacher_id)
+    if teacher is None:
+        return jsonify({'error': 'Unknown teacher'}), 404
+    return jsonify(load_teacher_profile(teacher))
+
+@bp.route('/teacher/delete/<int:teacher_id>', methods=['POST'])
+@login_required
+@admin_required
+def delete_teacher(teacher_id):
+    teacher = Teacher.query.get_or_404(teacher_id)
+    
+    # Check if teacher has visits
+    if teacher.visits:
+        flash('لا يمكن حذف المعلم لأنه لديه زيارات مسجلة')
+        return redirect(url_for('.teachers_list'))
+    
+    try:
+        db.session.delete(teacher)
+        db.session.commit()
+        invalidate_dashboard_cache()
+        flash('تم حذف المعلم بنجاح')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'حدث خطأ أثناء حذف المعلم: {str(e)}')
+    
+    return redirect(url_for('.teachers_list'))
+
+@bp.route('/supervisors')
+@login_required
+@read_only
+def supervisors_list():
+    supervisors = Supervisor.query.all()
+    return render_template('supervisors.html', supervisors=supervisors)
+
+@bp.route('/supervisor/delete/<int:supervisor_id>', methods=['POST'])
+@login_required
+@admin_required
+def delete_supervisor(supervisor_id):
+    supervisor = Supervisor.query.get_or_404(supervisor_id)
+    
+    # Check if supervisor has visits
+    if supervisor.visits:
+        flash('لا يمكن حذف المشرف لأنه لديه زيارات مسجلة')
+        return redirect(url_for('.supervisors_list'))
+    
+    try:
+        db.session.delete(supervisor)
+        db.session.commit()
+        invalidate_dashboard_cache()
+        flash('تم حذف المشرف بنجاح')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'حدث خطأ أثناء حذف المشرف: {str(e)}')
+    
+    return redirect(url_for('.supervisors_list'))
+
+@bp.route('/add_teacher', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def add_teacher():
+    if request.method == 'POST':
+        try:
+            teacher_data = {
+                'name': request.form.get('name'),
+                'email': request.form.get('email'),
+                'subject': request.form.get('subject'),
+                'school': request.form.get('school'),
+                'phone': request.form.get('phone'),
+                'grade': request.form.get('grade')
+            }
+            
+            new_teacher = Teacher(**teacher_data)
+            db.session.add(new_teacher)
+            db.session.commit()
+            invalidate_dashboard_cache()
+            
+            flash('تم إضافة المعلم بنجاح')
+            return redirect(url_for('.teachers_list'))
+        
+        except Exception as e:
+            db.session.rollback()
+            flash(f'حدث خطأ أثناء إضافة المعلم: {str(e)}')
+    
+    return render_template('add_teacher.html')
+
+@bp.route('/add_supervisor', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def add_supervisor():
+    if request.method == 'POST':
+        try:
+            supervisor_data = {
+                'name': request.form.get('name'),
+                'email': request.form.get('email'),
+                'specialty': request.form.get('specialty'),
+                'phone': request.form.get('phone')
+            }
+            
+            new_supervisor = Supervisor(**supervisor_data)
+            db.session.add(new_supervisor)
+            db.session.commit()
+            invalidate_dashboard_cache()
+            
+            flash('تم إضافة المشرف بنجاح')
+            return redirect(url_for('.supervisors_list'))
+        
+        except Exception as e:
+            db.session.rollback()
+            flash(f'حدث خطأ أثناء إضافة المشرف: {str(e)}')
+    
+    return render_template('add_supervisor.html')
+
+ROSTER_LABELS = {'teachers': 'المعلمين', 'supervisors': 'المشرفين'}
+
+@bp.route('/<any(teachers, supervisors):kind>/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_roster_csv(kind):
+    """Create or update teachers/supervisors from an uploaded CSV, reporting rejected rows"""
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('يرجى اختيار ملف CSV')
+        else:
+            try:
+                report = import_roster(kind, TextIOWrapper(upload.stream, encoding='utf-8-sig', newline=''),
+                                       current_app.config['IMPORT_BATCH_SIZE'])
+            except UnicodeDecodeError:
+                db.session.rollback()
+                flash('يجب أن يكون الملف بترميز UTF-8')
+            except ValueError as e:
+                db.session.rollback()
+                flash(f'ملف غير صالح: {e}')
+            # Batches committed before a failure stay imported
+            invalidate_dashboard_cache()
+    
+    model, schema = ROSTERS[kind]
+    return render_template('import_roster.html',
+                         kind=kind,
+                         label=ROSTER_LABELS[kind],
+                         columns=schema.names,
+                         required=schema.required,
+                         report=report)
+
+# Error handlers
+@bp.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('404.html'), 404
+
+@bp.app_errorhandler(500)
+def internal_error(error):
+    db.session.rollback()
+    return render_template('500.html'), 500
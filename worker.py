@@ -0,0 +1,146 @@
+"""
+Background worker that delivers queued visit report emails.
+
+Run it next to the web process:
+
+    python worker.py            # poll forever
+    python worker.py --once     # drain the queue once and exit
+
+    # queue and send every report not emailed yet for a supervisor/date range
+    python worker.py --once --send-pending --supervisor-id 3 --date-from 2024-09-01 --date-to 2024-12-31
+
+All messages go through the pooled SMTP session from mailer.get_mailer(), so a
+batch of reports costs a single connect/TLS/login.
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.datastructures import MultiDict
+
+from app import create_app
+from mailer import get_mailer
+from models import db, EmailJob, enqueue_pending_reports, parse_visit_filters
+from reports import deliver_visit_report_email
+
+logger = logging.getLogger('worker')
+
+app = create_app()
+
+
+def backoff_delay(attempts):
+    """Exponential backoff for the given number of failed attempts"""
+    base = app.config['EMAIL_JOB_BACKOFF_SECONDS']
+    return min(base * 2 ** max(attempts - 1, 0), app.config['EMAIL_JOB_BACKOFF_MAX_SECONDS'])
+
+
+def requeue_stale_jobs():
+    """Return jobs stuck in 'sending' (e.g. after a worker crash) to the queue"""
+    cutoff = datetime.utcnow() - timedelta(seconds=app.config['EMAIL_JOB_STALE_SECONDS'])
+    count = EmailJob.query.filter(
+        EmailJob.status == 'sending',
+        EmailJob.updated_at < cutoff
+    ).update({'status': 'pending', 'next_attempt_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def claim_jobs(limit):
+    """Atomically move up to `limit` due jobs from 'pending' to 'sending'.
+    
+    The conditional UPDATE makes claiming safe when several workers poll the
+    same table: a job is only processed by the worker whose update matched.
+    """
+    now = datetime.utcnow()
+    candidate_ids = [job_id for (job_id,) in db.session.query(EmailJob.id).filter(
+        EmailJob.status == 'pending',
+        EmailJob.next_attempt_at <= now
+    ).order_by(EmailJob.next_attempt_at).limit(limit)]
+    
+    claimed = []
+    for job_id in candidate_ids:
+        updated = EmailJob.query.filter_by(id=job_id, status='pending').update({
+            'status': 'sending',
+            'attempts': EmailJob.attempts + 1,
+            'updated_at': now
+        }, synchronize_session=False)
+        if updated:
+            claimed.append(job_id)
+    db.session.commit()
+    return claimed
+
+
+def process_job(job):
+    """Deliver one claimed job and record the outcome"""
+    visit = job.visit
+    try:
+        deliver_visit_report_email(
+            job.recipient,
+            visit.teacher.name,
+            visit.visit_date.strftime('%Y-%m-%d'),
+            visit.supervisor.name,
+            visit.id
+        )
+    except Exception as e:
+        job.last_error = str(e)
+        if job.attempts >= job.max_attempts:
+            job.status = 'dead'
+            logger.error('Email job %s dead after %s attempts: %s', job.id, job.attempts, e)
+        else:
+            job.status = 'pending'
+            job.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_delay(job.attempts))
+            logger.warning('Email job %s failed (attempt %s), retrying: %s', job.id, job.attempts, e)
+    else:
+        job.status = 'sent'
+        job.sent_at = datetime.utcnow()
+        job.last_error = None
+        logger.info('Email job %s sent to %s', job.id, job.recipient)
+    db.session.commit()
+
+
+def run_once(batch_size=20):
+    """Process one batch of due jobs, returning how many were handled"""
+    requeue_stale_jobs()
+    job_ids = claim_jobs(batch_size)
+    for job_id in job_ids:
+        process_job(db.session.get(EmailJob, job_id))
+    return len(job_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deliver queued visit report emails')
+    parser.add_argument('--once', action='store_true', help='process the queue once and exit')
+    parser.add_argument('--batch-size', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=5.0, help='seconds to sleep when the queue is empty')
+    parser.add_argument('--send-pending', action='store_true',
+                        help='first queue every report that was not emailed yet (see the filters below)')
+    parser.add_argument('--supervisor-id')
+    parser.add_argument('--date-from', help='YYYY-MM-DD')
+    parser.add_argument('--date-to', help='YYYY-MM-DD')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    
+    with app.app_context():
+        if args.send_pending:
+            filters = parse_visit_filters(MultiDict({
+                'supervisor_id': args.supervisor_id or '',
+                'date_from': args.date_from or '',
+                'date_to': args.date_to or ''
+            }))
+            logger.info('Queued %s pending reports', enqueue_pending_reports(filters))
+        
+        try:
+            while True:
+                handled = run_once(args.batch_size)
+                if args.once and not handled:
+                    break
+                if not handled:
+                    time.sleep(args.interval)
+        finally:
+            get_mailer().close()
+
+
+if __name__ == '__main__':
+    main()
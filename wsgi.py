@@ -11,4 +11,5 @@ os.environ['FLASK_ENV'] = 'production'
 os.environ['SECRET_KEY'] = 'your-production-secret-key'
 
 # Import and run the Flask app
-from app import app as application
\ No newline at end of file
+from app import create_app
+application = create_app()
\ No newline at end of file